@@ -1,31 +1,48 @@
-import streamlit as st
 import tempfile
-import whisper
-from deep_translator import GoogleTranslator
-from gtts import gTTS
-import pyttsx3
 import os
+import shutil
 import ffmpeg
-import torch
-from flask import Flask, request, jsonify, send_file
+import numpy as np
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
+from werkzeug.datastructures import MultiDict
 from flask_cors import CORS
+from flask_sock import Sock
 import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import uuid
+import json
 import traceback
 import time
-import difflib
-from jiwer import wer
-from nltk.translate.bleu_score import sentence_bleu
 from pymongo import MongoClient
+from bson import ObjectId
 from datetime import datetime
 from dotenv import load_dotenv
+from services.jobs import JobQueue, QueueFullError
+from services.metrics import Registry
+from services.tracing import (start_trace, span, bind, active_trace, to_chrome, prune as prune_traces,
+                              SamplingProfiler)
+from services.asr_backends import load_backend, default_model_name, model_id, gpu_available, rss_bytes, SAMPLE_RATE
+from services.parallel_asr import ParallelTranscriber, split_on_silence
+from services.result_cache import ResultCache, cache_key as result_cache_key
+from services.translation_history import TranslationHistory, InvalidCursor
+from services.usage_stats import UsageStats
+from services.quality_metrics import confidence, length_ratio, align_sentences, overall, RoundTripScorer
+from services.translation_memory import TranslationMemory, MongoStore, split_sentences
+from services.translation_engine import TranslationEngine, make_backend
+from services.upload_sessions import UploadSessionStore, OffsetMismatch
+from services.dubbing import dub_segments
+from services.tts_cache import ClipCache, make_synthesizer
+from services.streaming import (StreamingTranscriber, IncrementalTranslator, FfmpegDecoder, pcm16_to_float,
+                                resample, words_text)
+from utils.file_helpers import save_stream_with_hash
 
 load_dotenv()
 MONGO_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/translanova')
 
-# MongoDB Connection
+# MongoDB Connection. The client connects on first use, so serve.py can
+# fork worker processes before any connection (or monitor thread) exists.
 try:
-    mongo_client = MongoClient(MONGO_URI)
+    mongo_client = MongoClient(MONGO_URI, connect=False)
     # Use database named 'translations' per project requirement
     db = mongo_client.translations
     users_collection = db.users
@@ -35,6 +52,9 @@ try:
     original_video_collection = db.original_video
     translated_video_collection = db.translated_video
     translations_collection = db.translations
+    result_cache_collection = db.result_cache
+    translation_memory_collection = db.translation_memory
+    user_stats_collection = db.user_stats
     print("✓ MongoDB connected")
 except Exception as e:
     print(f"✗ MongoDB connection failed: {e}")
@@ -44,125 +64,387 @@ except Exception as e:
     original_video_collection = None
     translated_video_collection = None
     translations_collection = None
+    result_cache_collection = None
+    translation_memory_collection = None
+    user_stats_collection = None
 
-# Auto-detect GPU
-USE_GPU = torch.cuda.is_available()
-MODEL_NAME = "large-v3" if USE_GPU else "small"
-model = whisper.load_model(MODEL_NAME)
+# Auto-detect GPU (without importing torch on hosts that have no NVIDIA driver)
+USE_GPU = gpu_available()
+# Speech recognition engine: ASR_BACKEND=whisper (openai-whisper) or
+# faster-whisper (CTranslate2, int8 on CPU); ASR_MODEL overrides the checkpoint
+ASR_BACKEND = os.getenv('ASR_BACKEND', 'whisper').lower()
+MODEL_NAME = os.getenv('ASR_MODEL') or default_model_name(ASR_BACKEND, USE_GPU)
+# Concurrent jobs share the in-process openai-whisper model through a
+# batching scheduler (WHISPER_BATCH_SIZE=1 disables it)
+WHISPER_BATCH_SIZE = int(os.getenv('WHISPER_BATCH_SIZE', '8'))
+WHISPER_BATCH_WAIT = float(os.getenv('WHISPER_BATCH_WAIT_MS', '50')) / 1000
+# Windows a job decodes ahead at the 30 s boundaries, per task
+WHISPER_LOOKAHEAD = int(os.getenv('WHISPER_LOOKAHEAD', '1'))
 
-# Calculate translation accuracy based on model confidence
-def calculate_accuracy(original_text, translated_text, is_whisper=False):
-    try:
-        if not original_text or not translated_text:
-            return 0
+# WHISPER_CPU_PROFILE=int8 runs the PyTorch model with int8 dynamic
+# quantization and a fixed intra-op thread budget per inference thread.
+# With batching all inference runs on the batcher thread, which gets every
+# core; without it the cores are split between the job workers.
+WHISPER_CPU_PROFILE = os.getenv('WHISPER_CPU_PROFILE', 'fp32').lower()
+INT8_PROFILE = WHISPER_CPU_PROFILE == 'int8' and ASR_BACKEND == 'whisper' and not USE_GPU
+if INT8_PROFILE:
+    inference_threads = 1 if WHISPER_BATCH_SIZE > 1 else max(1, int(os.getenv('TRANSLATION_WORKERS', '2')))
+    default_threads = max(1, (os.cpu_count() or 1) // inference_threads)
+    default_interop = 1
+else:
+    default_threads = default_interop = 0
+TORCH_INTRA_THREADS = int(os.getenv('TORCH_INTRA_THREADS', str(default_threads)))
+TORCH_INTEROP_THREADS = int(os.getenv('TORCH_INTEROP_THREADS', str(default_interop)))
+MODEL_ID = model_id(ASR_BACKEND, MODEL_NAME) + ("+int8" if INT8_PROFILE else "")
 
-        # Only fast similarity check (no heavy AI calc)
-        similarity = difflib.SequenceMatcher(
-            None,
-            original_text.lower(),
-            translated_text.lower()
-        ).ratio()
+# Long audio is split on silences and transcribed in a process pool
+LONG_AUDIO_THRESHOLD = float(os.getenv('LONG_AUDIO_THRESHOLD', '600'))
+ASR_PROCESSES = int(os.getenv('ASR_PROCESSES', str(max(1, (os.cpu_count() or 2) // 2))))
+ASR_CHUNK_SECONDS = float(os.getenv('ASR_CHUNK_SECONDS', '120'))
+parallel_asr = ParallelTranscriber(MODEL_NAME, ASR_PROCESSES, chunk_seconds=ASR_CHUNK_SECONDS, backend=ASR_BACKEND)
 
-        return round(similarity * 100, 2)
+# The model is loaded and warmed up in a background thread so the server
+# binds its port right away. /ready reports the state; jobs and legacy
+# helpers wait for it through wait_for_models().
+asr = None
+whisper_batcher = None
+model_state = {'status': 'loading', 'error': None, 'load_seconds': None, 'warmup_seconds': None}
+models_ready = threading.Event()
 
-    except Exception as e:
-        print("Accuracy error:", e)
-        return 85.0
+# serve.py loads the model itself before forking its worker processes
+DEFER_MODEL_LOADING = os.getenv('DEFER_MODEL_LOADING', '0') == '1'
+
+# Load the speech model; with warm=False the caller runs warm_up_models()
+# later (serve.py does that in each forked worker). Returns the backend,
+# or None if loading failed.
+def load_models(warm=True, threads=None):
+    global whisper_batcher
+    try:
+        step_start = time.time()
+        backend = load_backend(ASR_BACKEND, MODEL_NAME, threads=threads or TORCH_INTRA_THREADS or None,
+                               interop_threads=TORCH_INTEROP_THREADS or None, quantize=INT8_PROFILE)
+        if WHISPER_BATCH_SIZE > 1 and backend.name == 'whisper':
+            from services.batching import WhisperBatcher
 
+            whisper_batcher = WhisperBatcher(backend.model, max_batch_size=WHISPER_BATCH_SIZE,
+                                             max_wait=WHISPER_BATCH_WAIT, fp16=USE_GPU, beam_size=5, best_of=5,
+                                             lock=backend.model_lock, threads=backend.threads,
+                                             lookahead=WHISPER_LOOKAHEAD)
+            backend.batcher = whisper_batcher
+        model_state.update(status='warming_up', load_seconds=round(time.time() - step_start, 2))
+    except Exception as e:
+        model_state.update(status='failed', error=str(e))
+        print(f"✗ Speech model failed to load: {e}")
+        print(traceback.format_exc())
+        models_ready.set()
+        return None
+    if warm:
+        warm_up_models(backend)
+    return backend
 
+def warm_up_models(backend):
+    global asr
+    try:
+        # One short pass through the serving path, so lazy initialization
+        # (kernels, allocator pools, the batcher thread) is not paid by the
+        # first real request
+        step_start = time.time()
+        noise = (np.random.RandomState(0).randn(2 * SAMPLE_RATE) * 0.01).astype(np.float32)
+        backend.transcribe_and_translate(noise)
+        backend.reset_stats()
+        asr = backend
+        model_state.update(status='ready', warmup_seconds=round(time.time() - step_start, 2))
+        print(f"✓ Speech model ready ({MODEL_ID}, loaded in {model_state['load_seconds']}s, "
+              f"warm-up {model_state['warmup_seconds']}s)")
     except Exception as e:
-        print("Accuracy error:", e)
-        return 75.0
+        model_state.update(status='failed', error=str(e))
+        print(f"✗ Speech model warm-up failed: {e}")
+        print(traceback.format_exc())
+    finally:
+        models_ready.set()
+
+def wait_for_models(timeout=None):
+    if not models_ready.wait(timeout):
+        raise RuntimeError("Speech model is still loading")
+    if asr is None:
+        raise RuntimeError(f"Speech model unavailable: {model_state['error']}")
+    return asr
+
+# Spawned ASR pool workers re-import this module as __mp_main__; they load
+# their own model in services.parallel_asr, so skip it here.
+if __name__ != "__mp_main__" and not DEFER_MODEL_LOADING:
+    threading.Thread(target=load_models, name="model-loader", daemon=True).start()
+
+# Finished results keyed by media hash, target language and model
+RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', str(2 * 1024 ** 3)))
+result_cache = ResultCache(result_cache_collection, files_dir="translated_files", max_bytes=RESULT_CACHE_MAX_BYTES)
+
+# Per-user history, paged through a (user_id, timestamp) index
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', '50'))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv('HISTORY_MAX_PAGE_SIZE', '200'))
+translation_history = TranslationHistory(translated_audio_collection, translated_video_collection)
+
+# Per-user dashboard totals, kept up to date as translations are saved
+usage_stats = UsageStats(user_stats_collection, (translated_audio_collection, translated_video_collection))
+
+# Index builds (and the one-time usage stats backfill) wait for MongoDB,
+# so they run off the startup path
+def ensure_db_indexes():
+    result_cache.ensure_indexes()
+    translation_history.ensure_indexes()
+    usage_stats.ensure_backfilled()
+
+if __name__ != "__mp_main__" and not DEFER_MODEL_LOADING:
+    threading.Thread(target=ensure_db_indexes, name="db-indexes", daemon=True).start()
+
+# Sentence-level translation memory in front of Google Translate
+TM_CACHE_SIZE = int(os.getenv('TM_CACHE_SIZE', '10000'))
+translation_memory = TranslationMemory(
+    MongoStore(translation_memory_collection) if translation_memory_collection is not None else None,
+    capacity=TM_CACHE_SIZE
+)
+
+# Sentence-packed, concurrent requests to the translator backend
+# (TRANSLATOR_BACKEND=stub answers locally for tests and benchmarks)
+TRANSLATION_CONCURRENCY = int(os.getenv('TRANSLATION_CONCURRENCY', '4'))
+translation_engine = TranslationEngine(make_backend(), max_workers=TRANSLATION_CONCURRENCY)
+
+# Round-trip similarity (translation back to English, scored against
+# Whisper's English) runs after the job in QUALITY_WORKERS background
+# threads and is stored on the translation document. Opt-in: it costs one
+# extra translation per job
+QUALITY_ROUND_TRIP = os.getenv('QUALITY_ROUND_TRIP', '0') == '1'
+round_trip_scorer = RoundTripScorer(lambda sentences: translate_texts(sentences, lang="en"),
+                                    workers=int(os.getenv('QUALITY_WORKERS', '1')))
+
+# One upload can target several languages; only translation, TTS and
+# muxing run per language, FANOUT_WORKERS at a time
+MAX_TARGET_LANGS = int(os.getenv('MAX_TARGET_LANGS', '8'))
+FANOUT_WORKERS = int(os.getenv('FANOUT_WORKERS', '4'))
+
+# 'global' stretches one TTS track over the whole video; 'segments' voices
+# every Whisper segment on its own slot of the original timeline.
+# Uploads can override it with the `dubbing_mode` form field.
+DUBBING_MODES = ('global', 'segments')
+DUBBING_MODE = os.getenv('DUBBING_MODE', 'global')
+DUBBING_WORKERS = int(os.getenv('DUBBING_WORKERS', '4'))
+
+# Live microphone streams: a Whisper pass every STREAM_STEP_SECONDS over
+# at most STREAM_WINDOW_SECONDS of uncommitted audio
+STREAM_STEP_SECONDS = float(os.getenv('STREAM_STEP_SECONDS', '1.0'))
+STREAM_WINDOW_SECONDS = float(os.getenv('STREAM_WINDOW_SECONDS', '12'))
+MAX_STREAMS = int(os.getenv('MAX_STREAMS', '4'))
+stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+# Rendered TTS sentences, content-addressed and trimmed LRU to TTS_CACHE_MAX_BYTES
+# (TTS_BACKEND=stub speaks a tone locally for tests and benchmarks)
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', 'tts_cache')
+TTS_CACHE_MAX_BYTES = int(os.getenv('TTS_CACHE_MAX_BYTES', str(512 * 1024 ** 2)))
+tts_synthesizer = make_synthesizer(
+    ClipCache(TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_BYTES),
+    voice=os.getenv('TTS_VOICE', 'com'),
+    workers=int(os.getenv('TTS_WORKERS', '4'))
+)
+
+# Uploaded media is spooled here until its job has finished
+SPOOL_DIR = os.getenv('SPOOL_DIR', 'uploads')
+os.makedirs(SPOOL_DIR, exist_ok=True)
+upload_sessions = UploadSessionStore(SPOOL_DIR, ttl=int(os.getenv('UPLOAD_SESSION_TTL', str(24 * 3600))))
+
+# Background job queue: uploads are processed by a bounded worker pool
+TRANSLATION_WORKERS = int(os.getenv('TRANSLATION_WORKERS', '2'))
+MAX_QUEUE_DEPTH = int(os.getenv('MAX_QUEUE_DEPTH', '16'))
+# With several server processes (serve.py) job state is shared through
+# JSON snapshots in JOB_STATE_DIR, so any process can answer /jobs/<id>
+JOB_STATE_DIR = os.getenv('JOB_STATE_DIR') or None
+job_queue = JobQueue(workers=TRANSLATION_WORKERS, max_depth=MAX_QUEUE_DEPTH, state_dir=JOB_STATE_DIR)
+# Idle seconds between keep-alive comments on /jobs/<id>/events streams
+SSE_HEARTBEAT_SECONDS = float(os.getenv('SSE_HEARTBEAT_SECONDS', '15'))
 
-# Translation function (Google)
-def translate_google(text, lang="hi"):
+# Prometheus metrics on /metrics. Under serve.py every worker publishes
+# its values next to the job state and any worker answers for all of them.
+metrics = Registry(prefix="translanova_", state_dir=JOB_STATE_DIR)
+
+# Per-job trace spans, saved as TRACE_DIR/<job_id>.json when the job ends.
+# A job uploaded with profile=1 (or an X-Profile: 1 header) also runs
+# under a sampling profiler that writes TRACE_DIR/<job_id>.folded.
+TRACING = os.getenv('TRACING', '1') != '0'
+TRACE_DIR = os.getenv('TRACE_DIR', 'traces')
+TRACE_HISTORY = int(os.getenv('TRACE_HISTORY', '1000'))
+ALLOW_PROFILING = os.getenv('ALLOW_PROFILING', '1') != '0'
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.01'))
+os.makedirs(TRACE_DIR, exist_ok=True)
+STAGE_SECONDS = metrics.histogram('stage_duration_seconds', 'Duration of a pipeline stage',
+                                  ('stage', 'media_type', 'target_language', 'model'))
+JOB_SECONDS = metrics.histogram('job_duration_seconds', 'Duration of a whole translation job', ('media_type', 'model'))
+JOBS_TOTAL = metrics.counter('jobs_total', 'Finished translation jobs', ('status', 'media_type'))
+RESULT_CACHE_REQUESTS = metrics.counter('result_cache_requests_total', 'Result cache lookups', ('result',))
+DUBBING_FAILED_SEGMENTS = metrics.counter('dubbing_failed_segments_total', 'Dubbed segments left silent')
+metrics.counter('translation_memory_requests_total', 'Sentences looked up in the translation memory', ('result',),
+                callback=lambda: {('hit',): translation_memory.hits, ('miss',): translation_memory.misses})
+metrics.counter('translator_requests_total', 'Requests sent to the translator backend',
+                callback=lambda: translation_engine.requests)
+metrics.counter('translator_failures_total', 'Failed translator requests, including retried ones',
+                callback=lambda: translation_engine.failures)
+metrics.counter('tts_clip_cache_requests_total', 'TTS clip cache lookups', ('result',),
+                callback=lambda: {('hit',): tts_synthesizer.cache.hits, ('miss',): tts_synthesizer.cache.misses})
+metrics.counter('tts_failures_total', 'Failed TTS renders per engine', ('engine',),
+                callback=lambda: {(engine,): count for engine, count in tts_synthesizer.failures.items()})
+metrics.counter('whisper_batches_total', 'Batches run by the Whisper batcher',
+                callback=lambda: whisper_batcher.batches_run if whisper_batcher else 0)
+metrics.counter('whisper_batched_windows_total', 'Windows decoded by the Whisper batcher',
+                callback=lambda: whisper_batcher.windows_run if whisper_batcher else 0)
+metrics.counter('whisper_speculative_windows_total', 'Speculative Whisper windows, used or dropped', ('result',),
+                callback=lambda: {('hit',): whisper_batcher.speculative_hits,
+                                  ('miss',): whisper_batcher.speculative_misses} if whisper_batcher else {})
+metrics.gauge('jobs_queued', 'Jobs waiting for a worker', callback=lambda: job_queue.depth())
+metrics.gauge('jobs_in_flight', 'Jobs being processed', callback=lambda: job_queue.in_flight())
+metrics.gauge('model_ready', '1 once the speech model is loaded and warmed up',
+              callback=lambda: 1 if model_state['status'] == 'ready' else 0)
+metrics.gauge('model_memory_bytes', 'Resident memory added by loading the speech model',
+              callback=lambda: asr.memory_bytes or 0 if asr is not None else 0)
+metrics.gauge('process_resident_memory_bytes', 'Resident memory of the server process', callback=rss_bytes)
+
+def dir_bytes(path, suffixes=None):
+    total = 0
     try:
-        translator = GoogleTranslator(source="auto", target=lang)
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False) and (suffixes is None or entry.name.endswith(suffixes)):
+                    total += entry.stat(follow_symlinks=False).st_size
+    except OSError:
+        pass
+    return total
 
-        # break into safe chunks (500 char)
-        chunk_size = 500
-        chunks = [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
+# Working files on disk. Pipeline temp files live directly in the system
+# temp directory, so only the suffixes the pipeline writes are counted there.
+def disk_usage():
+    return {
+        ('uploads',): dir_bytes(SPOOL_DIR),
+        ('translated_files',): dir_bytes("translated_files"),
+        # Mostly hard links to files also counted under translated_files
+        ('result_cache',): dir_bytes(result_cache.cache_dir),
+        ('tts_cache',): tts_synthesizer.cache.total,
+        ('temp',): dir_bytes(tempfile.gettempdir(), ('.wav', '.mp3', '.mp4', '.tts', '.txt')),
+    }
 
-        translated_chunks = []
-        for chunk in chunks:
-            if chunk.strip():
-                translated_chunks.append(translator.translate(chunk))
+metrics.gauge('disk_usage_bytes', 'Bytes used by working files', ('directory',), callback=disk_usage)
+metrics.gauge('temp_free_bytes', 'Free space in the temp directory',
+              callback=lambda: shutil.disk_usage(tempfile.gettempdir()).free)
 
-        return " ".join(translated_chunks)
+# Translation function (Google). Sentences already in the translation
+# memory are reused; only the misses are sent to the translation engine.
+def translate_google(text, lang="hi", progress=None):
+    try:
+        return " ".join(translate_texts(split_sentences(text), lang=lang, progress=progress))
 
     except Exception as e:  
         print("Translation error:", e)
         return text
 
+# Translate a list of texts one-to-one (sentences or Whisper segments)
+def translate_texts(texts, lang="hi", progress=None):
+    return translation_memory.translate(
+        texts, "auto", lang,
+        lambda misses: translation_engine.translate_sentences(misses, "auto", lang, progress=progress)
+    )
+
 
 # Clean audio
 def clean_audio(path):
     cleaned = tempfile.NamedTemporaryFile(delete=False, suffix=".wav").name
-    (
-        ffmpeg
-        .input(path)
-        .output(cleaned, af="highpass=f=100, lowpass=f=8000, dynaudnorm", ar='16000', ac=1)
-        .overwrite_output()
-        .run(quiet=True)
-    )
+    with span('ffmpeg', op='clean_audio'):
+        (
+            ffmpeg
+            .input(path)
+            .output(cleaned, af="highpass=f=100, lowpass=f=8000, dynaudnorm", ar='16000', ac=1)
+            .overwrite_output()
+            .run(quiet=True)
+        )
     return cleaned
 
+# Decode, filter and resample in one ffmpeg process. Works for audio and
+# video inputs and returns 16 kHz mono float32 samples read from stdout,
+# ready for Whisper without any intermediate files.
+def load_cleaned_audio(path):
+    with span('ffmpeg', op='load_cleaned_audio'):
+        out, _ = (
+            ffmpeg
+            .input(path)
+            .output('pipe:', vn=None, af="highpass=f=100, lowpass=f=8000, dynaudnorm",
+                    ar='16000', ac=1, format='f32le', acodec='pcm_f32le')
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+    # frombuffer is read-only; torch wants a writable array
+    return np.frombuffer(out, np.float32).copy()
+
 # Extract audio from video
 def extract_audio(path):
     audio_path = tempfile.NamedTemporaryFile(delete=False, suffix=".wav").name
-    (
-        ffmpeg
-        .input(path)
-        .output(audio_path, ar="16000", ac=1, format="wav")
-        .overwrite_output()
-        .run(quiet=True)
-    )
+    with span('ffmpeg', op='extract_audio'):
+        (
+            ffmpeg
+            .input(path)
+            .output(audio_path, ar="16000", ac=1, format="wav")
+            .overwrite_output()
+            .run(quiet=True)
+        )
     return audio_path
 
 # Whisper: transcribe in same language
 def whisper_transcribe(path):
-    return model.transcribe(path, task="transcribe", fp16=USE_GPU)["text"]
+    return wait_for_models().transcribe(path, task="transcribe")["text"]
 
 # Whisper: translate to English
 def whisper_translate(path):
-    return model.transcribe(path, task="translate", fp16=USE_GPU)["text"]
+    return wait_for_models().transcribe(path, task="translate")["text"]
 
 def whisper_transcribe_long_audio(path):
-    result = model.transcribe(
+    result = wait_for_models().transcribe(
         path,
         task="transcribe",
-        fp16=USE_GPU,
         beam_size=5,
         best_of=5
     )
     return result["text"]
 
 def whisper_translate_long_audio(path):
-    result = model.transcribe(
+    result = wait_for_models().transcribe(
         path,
         task="translate",
-        fp16=USE_GPU,
         beam_size=5,
         best_of=5
     )
     return result["text"]
 
+# Whisper: transcript and English translation from a single decode of the
+# audio, sharing the encoder output between both tasks. Audio longer than
+# LONG_AUDIO_THRESHOLD is split on silences and decoded across processes.
+def whisper_transcribe_and_translate_long_audio(audio, progress=None):
+    if isinstance(audio, str):
+        audio = load_cleaned_audio(audio)
+    backend = wait_for_models()
+    duration = len(audio) / SAMPLE_RATE
+    # The process pool is for CPU hosts; a GPU is better used by one process
+    if duration > LONG_AUDIO_THRESHOLD and ASR_PROCESSES > 1 and not USE_GPU:
+        print(f" Long audio ({duration:.0f}s): transcribing in {ASR_PROCESSES} processes")
+        chunks = split_on_silence(audio, ASR_CHUNK_SECONDS) or [(0, len(audio))]
+        first = audio[chunks[0][0]:chunks[0][1]]
+        language = backend.detect_language(first)
+        return parallel_asr.transcribe_and_translate(audio, chunks=chunks, language=language, progress=progress)
+
+    return backend.transcribe_and_translate(audio, progress=progress)
+
 
 # TTS
-def tts(text, lang="hi"):
-    speech_path = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3").name
-    try:
-        gTTS(text=text, lang=lang, slow=False).save(speech_path)
-    except:
-        engine = pyttsx3.init()
-        engine.save_to_file(text, speech_path)
-        engine.runAndWait()
-    return speech_path
+# Sentences are spoken one by one and reused from the clip cache
+def tts(text, lang="hi", progress=None):
+    return tts_synthesizer.synthesize(text, lang, progress=progress)
 
 # Match audio duration to video
 def match_audio_to_video(audio_path, video_duration):
     try:
-        audio_duration = float(ffmpeg.probe(audio_path)["format"]["duration"])
+        audio_duration = get_duration(audio_path, strict=True)
     except:
         return audio_path
 
@@ -173,21 +455,25 @@ def match_audio_to_video(audio_path, video_duration):
     tempo = max(0.5, min(2.0, tempo))
 
     adjusted_path = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3").name
-    (
-        ffmpeg
-        .input(audio_path)
-        .filter("atempo", tempo)
-        .output(adjusted_path)
-        .overwrite_output()
-        .run(quiet=True)
-    )
+    with span('ffmpeg', op='atempo', tempo=round(tempo, 3)):
+        (
+            ffmpeg
+            .input(audio_path)
+            .filter("atempo", tempo)
+            .output(adjusted_path)
+            .overwrite_output()
+            .run(quiet=True)
+        )
     return adjusted_path
 
-# Get duration
-def get_duration(path):
+# Get duration; 0 if the file cannot be probed, unless strict
+def get_duration(path, strict=False):
     try:
-        return float(ffmpeg.probe(path)["format"]["duration"])
+        with span('ffprobe'):
+            return float(ffmpeg.probe(path)["format"]["duration"])
     except:
+        if strict:
+            raise
         return 0
 
 # Merge audio with video
@@ -197,12 +483,13 @@ def merge_audio_video(video_path, audio_path):
     # Re-encode the audio to AAC for MP4 compatibility and copy the video stream.
     video_stream = ffmpeg.input(video_path).video
     audio_stream = ffmpeg.input(audio_path).audio
-    (
-        ffmpeg
-        .output(video_stream, audio_stream, output, vcodec='copy', acodec='aac', strict='-2')
-        .overwrite_output()
-        .run(quiet=True)
-    )
+    with span('ffmpeg', op='merge_audio_video'):
+        (
+            ffmpeg
+            .output(video_stream, audio_stream, output, vcodec='copy', acodec='aac', strict='-2')
+            .overwrite_output()
+            .run(quiet=True)
+        )
     return output
 
 # Language options
@@ -218,62 +505,57 @@ flask_app = Flask(__name__)
 # Allow cross-origin requests from the frontend (e.g. http://localhost:3000)
 CORS(flask_app)
 
+sock = Sock(flask_app)
+
 # Note: Authentication endpoints removed — this service handles translation only.
 
+# One page of a user's translations, newest first. `limit` sets the page
+# size; pass the returned `next_cursor` as `after` for the next page.
 @flask_app.route('/user/translations', methods=['GET'])
 def get_user_translations():
     try:
-        # Accept optional user_id via query param or header (no auth here)
+        # user_id via query param or header (no auth here)
         user_id = request.args.get('user_id') or request.headers.get('X-User-Id')
-        
-        if translations_collection is None and translated_audio_collection is None and translated_video_collection is None:
+        if not user_id:
+            return jsonify({'error': 'user_id is required'}), 400
+
+        if translated_audio_collection is None and translated_video_collection is None:
             return jsonify({'error': 'Database unavailable'}), 500
 
-        # Query both audio and video translated collections and merge
-        results = []
         try:
-            if user_id:
-                if translated_audio_collection is not None:
-                    audio_docs = list(translated_audio_collection.find({'user_id': user_id}))
-                    for d in audio_docs:
-                        d['_id'] = str(d['_id'])
-                        d['media_type'] = 'audio'
-                        d['timestamp'] = d.get('timestamp').isoformat() if d.get('timestamp') else None
-                    results.extend(audio_docs)
-                if translated_video_collection is not None:
-                    video_docs = list(translated_video_collection.find({'user_id': user_id}))
-                    for d in video_docs:
-                        d['_id'] = str(d['_id'])
-                        d['media_type'] = 'video'
-                        d['timestamp'] = d.get('timestamp').isoformat() if d.get('timestamp') else None
-                    results.extend(video_docs)
-            else:
-                # No user_id provided — return all translations
-                if translated_audio_collection is not None:
-                    audio_docs = list(translated_audio_collection.find({}))
-                    for d in audio_docs:
-                        d['_id'] = str(d['_id'])
-                        d['media_type'] = 'audio'
-                        d['timestamp'] = d.get('timestamp').isoformat() if d.get('timestamp') else None
-                    results.extend(audio_docs)
-                if translated_video_collection is not None:
-                    video_docs = list(translated_video_collection.find({}))
-                    for d in video_docs:
-                        d['_id'] = str(d['_id'])
-                        d['media_type'] = 'video'
-                        d['timestamp'] = d.get('timestamp').isoformat() if d.get('timestamp') else None
-                    results.extend(video_docs)
+            limit = int(request.args.get('limit', HISTORY_PAGE_SIZE))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+
+        try:
+            translations, next_cursor = translation_history.page(user_id, limit=limit,
+                                                                 after=request.args.get('after'))
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as db_e:
             print(f"DB read error: {db_e}")
             return jsonify({'error': 'Failed to read translations'}), 500
 
-        # Sort by timestamp descending
-        results.sort(key=lambda x: x.get('timestamp') or '', reverse=True)
-        return jsonify({'translations': results})
+        return jsonify({'translations': translations, 'next_cursor': next_cursor})
     except Exception as e:
         print(f"Get translations error: {e}")
         return jsonify({'error': str(e)}), 500
 
+# Dashboard totals for one user, read from the precomputed rollup
+@flask_app.route('/user/stats', methods=['GET'])
+def get_user_stats():
+    try:
+        user_id = request.args.get('user_id') or request.headers.get('X-User-Id')
+        if not user_id:
+            return jsonify({'error': 'user_id is required'}), 400
+        if user_stats_collection is None:
+            return jsonify({'error': 'Database unavailable'}), 500
+        return jsonify(usage_stats.get(user_id))
+    except Exception as e:
+        print(f"Get user stats error: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @flask_app.route('/languages', methods=['GET'])
 def get_languages():
     return jsonify(lang_options)
@@ -344,6 +626,533 @@ def user_login():
         print(f"User login error: {e}")
         return jsonify({'error': str(e)}), 500
 
+# Save the uploaded original to the appropriate collection.
+# Returns its id, or None if nothing was saved.
+def save_original_record(user_id, filename, input_path, is_video):
+    try:
+        orig_doc = {
+            'user_id': user_id,
+            'filename': filename,
+            'path': input_path,
+            'media_type': 'video' if is_video else 'audio',
+            'uploaded_at': datetime.utcnow()
+        }
+        if is_video and original_video_collection is not None:
+            r = original_video_collection.insert_one(orig_doc)
+            return str(r.inserted_id)
+        elif not is_video and original_audio_collection is not None:
+            r = original_audio_collection.insert_one(orig_doc)
+            return str(r.inserted_id)
+    except Exception as db_error:
+        print(f" Error saving original to DB: {db_error}")
+    return None
+
+# Save a translated entry to the appropriate collection.
+# Returns its id, or None if nothing was saved.
+def save_translation_record(user_id, original_id, filename, is_video, output_filename, target_lang,
+                            translation_time, accuracy, cached=False, quality=None):
+    translation_id = None
+    try:
+        translated_doc = {
+            'user_id': user_id,
+            'original_id': original_id,
+            'original_filename': filename,
+            'translated_filename': output_filename,
+            'media_type': 'video' if is_video else 'audio',
+            'target_language': target_lang,
+            'translation_time': translation_time,
+            'accuracy': accuracy,
+            'quality': quality,
+            'timestamp': datetime.utcnow(),
+            'status': 'completed',
+            'cached': cached
+        }
+        if is_video and translated_video_collection is not None:
+            res = translated_video_collection.insert_one(translated_doc)
+            translation_id = str(res.inserted_id)
+            usage_stats.record(translated_doc)
+        elif not is_video and translated_audio_collection is not None:
+            res = translated_audio_collection.insert_one(translated_doc)
+            translation_id = str(res.inserted_id)
+            usage_stats.record(translated_doc)
+        elif translations_collection is not None:
+            # Fallback to generic translations collection
+            res = translations_collection.insert_one(translated_doc)
+            translation_id = str(res.inserted_id)
+        if translation_id:
+            print(f" Translation saved to DB: {translation_id}")
+    except Exception as db_error:
+        print(f" Error saving to DB: {db_error}")
+    return translation_id
+
+# Score the round trip of a saved translation in the background and store
+# it on the translation document
+def schedule_round_trip(translation_id, is_video, translation, reference):
+    collection = translated_video_collection if is_video else translated_audio_collection
+    if collection is None:
+        return
+
+    def store(score):
+        collection.update_one({'_id': ObjectId(translation_id)}, {'$set': {'quality.round_trip': score}})
+        print(f" Round-trip similarity for {translation_id}: {score}")
+
+    round_trip_scorer.submit(split_sentences(translation), reference, store)
+
+# Target languages of an upload: repeated `target_langs` fields or a comma
+# separated list, falling back to the single `target_lang` field
+def parse_target_langs(form):
+    values = form.getlist('target_langs') or [form.get('target_lang', 'hi')]
+    langs = []
+    for value in values:
+        for lang in value.split(','):
+            lang = lang.strip()
+            if lang and lang not in langs:
+                langs.append(lang)
+    return langs
+
+def parse_dubbing_mode(form):
+    mode = (form.get('dubbing_mode') or DUBBING_MODE).strip().lower()
+    return mode if mode in DUBBING_MODES else None
+
+# File name of one language's output in translated_files/
+def output_filename_for(file_id, lang, is_video, multi_language):
+    suffix = f"_{lang}" if multi_language else ""
+    extension = "mp4" if is_video else "mp3"
+    return f"translated_{'video' if is_video else 'audio'}_{file_id}{suffix}.{extension}"
+
+# Back half of the pipeline for one target language: translation, TTS and
+# muxing. Only this part depends on the target language, so several
+# languages run it in parallel over one shared transcript.
+def render_language(job, target_lang, asr_result, input_path, is_video, duration, output_filename,
+                    dubbing_mode='global', report_stages=True):
+    timing_data = {}
+    progress = job.set_progress if report_stages else None
+    whisper_english = asr_result['translate']['text']
+    segments = asr_result['translate']['segments']
+    dub_by_segment = dubbing_mode == 'segments' and bool(segments)
+    failed_segments = []
+
+    if dub_by_segment:
+        # Steps 4-5: translate and voice every Whisper segment on its own
+        # slot of the original timeline
+        print(f" Dubbing {len(segments)} segments in {target_lang}...")
+        if report_stages:
+            job.set_stage('dubbing')
+        step_start = time.time()
+        track_duration = duration if is_video else asr_result['duration']
+        with span('dubbing', segments=len(segments)):
+            tts_path, segment_texts, failed_segments = dub_segments(
+                segments, target_lang,
+                lambda texts: translate_texts(texts, lang=target_lang),
+                tts, track_duration,
+                workers=DUBBING_WORKERS,
+                progress=progress
+            )
+        final_translation = " ".join(t for t in segment_texts if t)
+        timing_data['dubbing'] = round(time.time() - step_start, 2)
+        print(f" Final translation ({target_lang}): {final_translation[:100]}...")
+        if failed_segments:
+            print(f" Segments without speech: {failed_segments}")
+    else:
+        # Step 4: Google translation from English to target
+        print(f" Translating to {target_lang}...")
+        if report_stages:
+            job.set_stage('google_translation')
+        step_start = time.time()
+        with span('google_translation', chars=len(whisper_english)):
+            final_translation = translate_google(whisper_english, lang=target_lang, progress=progress)
+        timing_data['google_translation'] = round(time.time() - step_start, 2)
+        print(f" Final translation ({target_lang}): {final_translation[:100]}...")
+
+        # Step 5: TTS
+        print(f" Generating speech ({target_lang})...")
+        if report_stages:
+            job.set_stage('tts_generation')
+        step_start = time.time()
+        with span('tts_generation', chars=len(final_translation)):
+            tts_path = tts(final_translation, lang=target_lang, progress=progress)
+        timing_data['tts_generation'] = round(time.time() - step_start, 2)
+    print(f" TTS audio path: {tts_path}")
+    tts_duration = get_duration(tts_path)
+    print(f" TTS audio duration: {tts_duration}")
+
+    # Quality estimates, linear in the text length: Whisper's confidence in
+    # both passes and how plausible the translated lengths are per segment
+    if dub_by_segment:
+        sources, targets = [s['text'] for s in segments], segment_texts
+    else:
+        sources, targets = align_sentences(whisper_english, final_translation)
+    lengths = length_ratio(sources, targets, target_lang)
+    accuracy = {
+        'transcription': confidence(asr_result['transcribe']['segments']),
+        'whisper_to_english': confidence(segments),
+        'final_translation': lengths['score'],
+        'length_ratio': lengths['mean_ratio'],
+        'length_outliers': lengths['outliers'],
+        # Filled in on the translation document once scored
+        'round_trip': None,
+    }
+    accuracy['overall'] = overall([accuracy['transcription'], accuracy['whisper_to_english'],
+                                   accuracy['final_translation']])
+
+    # Step 6: Process result
+    if report_stages:
+        job.set_stage('video_processing')
+    if is_video:
+        with span('video_processing'):
+            print(f" Processing video ({target_lang})...")
+            step_start = time.time()
+            # Segment dubbing already follows the video timeline
+            synced_audio = tts_path if dub_by_segment else match_audio_to_video(tts_path, duration)
+            print(f" Synced audio path: {synced_audio}")
+            print(f" Synced audio duration: {get_duration(synced_audio)}")
+            final_output = merge_audio_video(input_path, synced_audio)
+            timing_data['video_processing'] = round(time.time() - step_start, 2)
+            print(f" Merged video output: {final_output}")
+    else:
+        print(" Processing audio...")
+        timing_data['video_processing'] = 0
+        final_output = tts_path
+
+    # Move to translated_files directory
+    os.makedirs("translated_files", exist_ok=True)
+    final_path = os.path.join("translated_files", output_filename)
+    os.rename(final_output, final_path)
+    print(f" Translation complete: {output_filename}")
+
+    # Cleanup temp files
+    if is_video:
+        for path in {tts_path, synced_audio}:
+            if os.path.exists(path):
+                os.remove(path)
+
+    return {
+        'success': True,
+        'audio_file' if not is_video else 'video_file': output_filename,
+        'final_translation': final_translation,
+        'target_language': target_lang,
+        'dubbing_mode': 'segments' if dub_by_segment else 'global',
+        'failed_segments': failed_segments,
+        'timing_breakdown': timing_data,
+        'accuracy': accuracy
+    }
+
+# Run the full translation pipeline for one uploaded file. Executed by the
+# job queue workers; stage transitions are reported on the job.
+# Extraction, cleaning and ASR run once; translation, TTS and muxing fan
+# out per target language. Languages already in the result cache are
+# passed in as `cached_results` and skipped.
+def run_translation_job(job, input_path, filename, file_id, target_langs, user_id, cache_keys=None,
+                        cached_results=None, media_info=None, dubbing_mode='global'):
+    if media_info:
+        is_video = media_info['has_video']
+    else:
+        is_video = filename.lower().endswith((".mp4", ".mov", ".mkv"))
+    print(f" [{job.id}] Is video: {is_video}")
+    cache_keys = cache_keys or {}
+    cached_results = cached_results or {}
+    pending_langs = [lang for lang in target_langs if lang not in cached_results]
+
+    # Track timing for each step
+    timing_data = {}
+
+    try:
+        print(" Starting translation process...")
+        overall_start = time.time()
+
+        # Steps 1-2: Extract and clean audio in a single ffmpeg pass,
+        # straight into memory
+        print(" Extracting and cleaning audio...")
+        job.set_stage('audio_preprocessing')
+        step_start = time.time()
+        with span('audio_preprocessing'):
+            cleaned_audio = load_cleaned_audio(input_path)
+        timing_data['audio_preprocessing'] = round(time.time() - step_start, 2)
+
+        # Jobs queued while the server is starting wait for the model here
+        if not models_ready.is_set():
+            job.set_stage('waiting_for_model')
+            with span('waiting_for_model'):
+                wait_for_models()
+
+        # Step 3: Whisper transcription (same language) and English translation
+        print(" Transcribing original language and translating to English...")
+        job.set_stage('transcription')
+        step_start = time.time()
+        with span('transcription', audio_seconds=round(len(cleaned_audio) / SAMPLE_RATE, 2)) as stage:
+            asr_result = whisper_transcribe_and_translate_long_audio(cleaned_audio, progress=job.set_progress)
+            stage.set(language=asr_result['language'])
+        original_transcript = asr_result['transcribe']['text']
+        whisper_english = asr_result['translate']['text']
+        timing_data['transcription'] = round(time.time() - step_start, 2)
+        print(f" Detected language: {asr_result['language']}")
+        print(f" Original transcript: {original_transcript[:100]}...")
+        print(f" English translation: {whisper_english[:100]}...")
+        front_time = time.time() - overall_start
+
+        if not is_video:
+            duration = 0
+        elif media_info and media_info.get('duration'):
+            duration = media_info['duration']
+        else:
+            duration = get_duration(input_path)
+        print(f" Original duration: {duration}")
+
+        # Steps 4-6 per target language
+        def render(lang, report_stages=True):
+            with span('render', target_language=lang):
+                return render_language(job, lang, asr_result, input_path, is_video, duration,
+                                       output_filename_for(file_id, lang, is_video, len(target_langs) > 1),
+                                       dubbing_mode, report_stages)
+
+        # A language that fails gets an error entry of its own; the job
+        # fails only when no language has a result
+        results = {}
+        failures = {}
+        if len(pending_langs) == 1:
+            lang = pending_langs[0]
+            try:
+                results[lang] = render(lang)
+            except Exception as e:
+                failures[lang] = e
+        elif pending_langs:
+            job.set_stage('rendering')
+            job.set_progress(0, len(pending_langs))
+            workers = min(len(pending_langs), FANOUT_WORKERS)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(bind(render), lang, False): lang for lang in pending_langs}
+                for done, future in enumerate(as_completed(futures), start=1):
+                    try:
+                        results[futures[future]] = future.result()
+                    except Exception as e:
+                        failures[futures[future]] = e
+                    job.set_progress(done, len(pending_langs))
+        for lang, error in failures.items():
+            print(f" [{job.id}] Rendering {lang} failed: {error}")
+            print(''.join(traceback.format_exception(type(error), error, error.__traceback__)))
+        if failures and not results and not cached_results:
+            if len(failures) == 1:
+                raise next(iter(failures.values()))
+            raise RuntimeError("All target languages failed: " +
+                               "; ".join(f"{lang}: {error}" for lang, error in failures.items()))
+
+        # Cleanup temp files
+        if os.path.exists(input_path):
+            os.remove(input_path)
+
+        # Save original/translated metadata to appropriate collections
+        job.set_stage('saving')
+        with span('saving'):
+            original_id = save_original_record(user_id, filename, input_path, is_video)
+            for lang, result in results.items():
+                # Each language is charged the shared front half plus its own stages
+                result['translation_time'] = round(front_time + sum(result['timing_breakdown'].values()), 2)
+                result['original_transcript'] = original_transcript
+                result['whisper_english'] = whisper_english
+                result['source_language'] = asr_result['language']
+
+                # Remember the result so a re-upload of the same media is served at once
+                if lang in cache_keys:
+                    result_cache.put(cache_keys[lang], result, result.get('video_file') or result.get('audio_file'))
+
+                result['translation_id'] = save_translation_record(
+                    user_id, original_id, filename, is_video,
+                    result.get('video_file') or result.get('audio_file'), lang,
+                    result['translation_time'], result['accuracy']['overall'], quality=result['accuracy']
+                )
+                if result['translation_id'] and QUALITY_ROUND_TRIP:
+                    schedule_round_trip(result['translation_id'], is_video, result['final_translation'], whisper_english)
+            for lang, result in cached_results.items():
+                result['translation_id'] = save_translation_record(
+                    user_id, original_id, filename, is_video,
+                    result.get('video_file') or result.get('audio_file'), lang,
+                    0, result['accuracy']['overall'], cached=True, quality=result['accuracy']
+                )
+        results.update(cached_results)
+
+        # Calculate total translation time (all processing steps)
+        total_translation_time = round(time.time() - overall_start, 2)
+        record_job_metrics(is_video, timing_data, results, total_translation_time)
+        for lang, error in failures.items():
+            results[lang] = {'success': False, 'error': str(error)}
+
+        combined = {
+            'success': True,
+            'original_transcript': original_transcript,
+            'whisper_english': whisper_english,
+            'source_language': asr_result['language'],
+            'translation_time': total_translation_time,
+            'timing_breakdown': timing_data,
+            'results': {lang: results[lang] for lang in target_langs}
+        }
+        if failures:
+            combined['failed_languages'] = [lang for lang in target_langs if lang in failures]
+        # A single target keeps the flat response shape
+        if len(target_langs) == 1:
+            single = results[target_langs[0]]
+            combined.update(single)
+            combined['translation_time'] = total_translation_time
+            combined['timing_breakdown'] = dict(timing_data, **single['timing_breakdown'])
+        return combined
+
+    except Exception as e:
+        print(f" Translation error: {str(e)}")
+        print(traceback.format_exc())
+        JOBS_TOTAL.inc(status='failed', media_type='video' if is_video else 'audio')
+        # Cleanup on error
+        if os.path.exists(input_path):
+            os.remove(input_path)
+        remove_unrecorded_outputs(cached_results)
+        raise
+
+# Outputs linked for cache hits of a job that failed before they were
+# saved to the history; nothing else points to them
+def remove_unrecorded_outputs(cached_results):
+    for result in cached_results.values():
+        if result.get('translation_id'):
+            continue
+        path = os.path.join("translated_files", result.get('video_file') or result.get('audio_file'))
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            print(f" Could not remove {path}: {e}")
+
+# Stage timings of a finished job; the shared stages (preprocessing,
+# transcription) are labeled with target_language "all"
+def record_job_metrics(is_video, timing_data, results, total_seconds):
+    media_type = 'video' if is_video else 'audio'
+    for stage, seconds in timing_data.items():
+        STAGE_SECONDS.observe(seconds, stage=stage, media_type=media_type, target_language='all', model=MODEL_ID)
+    for lang, result in results.items():
+        # Cached results carry the timings of the run that produced them
+        if result.get('cached'):
+            continue
+        for stage, seconds in result['timing_breakdown'].items():
+            STAGE_SECONDS.observe(seconds, stage=stage, media_type=media_type, target_language=lang, model=MODEL_ID)
+        if result['failed_segments']:
+            DUBBING_FAILED_SEGMENTS.inc(len(result['failed_segments']))
+    JOB_SECONDS.observe(total_seconds, media_type=media_type, model=MODEL_ID)
+    JOBS_TOTAL.inc(status='completed', media_type=media_type)
+
+def trace_path(job_id, extension):
+    return os.path.join(TRACE_DIR, f"{job_id}{extension}")
+
+# Job entry point: runs the pipeline inside a trace and, when asked, under
+# the sampling profiler. Both are written to TRACE_DIR when the job ends,
+# whether it succeeded or not.
+def run_traced_job(job, profile=False, **kwargs):
+    if not (TRACING or profile):
+        return run_translation_job(job, **kwargs)
+    trace = None
+    profiler = None
+    try:
+        with start_trace(job.id, 'translation_job', filename=kwargs.get('filename'),
+                         target_languages=kwargs.get('target_langs'), model=MODEL_ID) as trace:
+            if profile:
+                profiler = SamplingProfiler(trace, PROFILE_INTERVAL)
+                profiler.start()
+            result = run_translation_job(job, **kwargs)
+    finally:
+        try:
+            if profiler is not None:
+                profiler.stop()
+                profiler.save(trace_path(job.id, '.folded'))
+                print(f" [{job.id}] Profile: {profiler.sample_count} samples")
+            if trace is not None:
+                trace.save(trace_path(job.id, '.json'))
+            prune_traces(TRACE_DIR, TRACE_HISTORY * 2)
+        except OSError as e:
+            print(f"Trace save error: {e}")
+    result['trace_url'] = f"/jobs/{job.id}/trace"
+    if profiler is not None:
+        result['profile_url'] = f"/jobs/{job.id}/profile"
+    return result
+
+# profile=1 (form field or query) or an X-Profile: 1 header
+def wants_profile(form):
+    flag = form.get('profile') or request.args.get('profile') or request.headers.get('X-Profile') or ''
+    return ALLOW_PROFILING and flag.lower() in ('1', 'true', 'yes')
+
+# Serve an upload from the result cache or queue a translation job for it.
+# Shared by the one-shot /upload and the chunked /uploads API.
+def queue_translation(input_path, filename, file_id, content_hash, target_langs, user_id, media_info=None,
+                      dubbing_mode='global', profile=False):
+    is_video = media_info['has_video'] if media_info else filename.lower().endswith((".mp4", ".mov", ".mkv"))
+
+    # Same media, language and model as an earlier upload: reuse its result
+    variant = None if dubbing_mode == 'global' else dubbing_mode
+    tts_engines = "+".join(engine for engine, _ in tts_synthesizer.engines())
+    cache_keys = {
+        lang: result_cache_key(content_hash, lang, MODEL_ID, translation_engine.backend.name, tts_engines,
+                               tts_synthesizer.voice, variant)
+        for lang in target_langs
+    }
+    cached_results = {}
+    for lang, key in cache_keys.items():
+        # A hit gets its own output file, which its history record owns
+        output_filename = output_filename_for(file_id, lang, is_video, len(target_langs) > 1)
+        cached = result_cache.get(key, output_filename)
+        RESULT_CACHE_REQUESTS.inc(result='hit' if cached is not None else 'miss')
+        if cached is not None:
+            print(f" Cache hit for {filename} ({lang})")
+            cached_results[lang] = dict(cached, cached=True)
+            cached_results[lang]['video_file' if is_video else 'audio_file'] = output_filename
+
+    if len(cached_results) == len(target_langs):
+        original_id = save_original_record(user_id, filename, input_path, is_video)
+        for lang, result in cached_results.items():
+            result['translation_id'] = save_translation_record(
+                user_id, original_id, filename, is_video,
+                result.get('video_file') or result.get('audio_file'), lang,
+                0, result['accuracy']['overall'], cached=True, quality=result['accuracy']
+            )
+        if os.path.exists(input_path):
+            os.remove(input_path)
+        if len(target_langs) == 1:
+            result = cached_results[target_langs[0]]
+        else:
+            first = cached_results[target_langs[0]]
+            result = {
+                'success': True,
+                'original_transcript': first.get('original_transcript'),
+                'whisper_english': first.get('whisper_english'),
+                'source_language': first.get('source_language'),
+                'results': cached_results
+            }
+        return jsonify({'success': True, 'status': 'completed', 'cached': True, 'result': result})
+
+    # Hand the pipeline to the worker pool and answer right away
+    try:
+        job = job_queue.submit(
+            run_traced_job,
+            profile=profile,
+            input_path=input_path,
+            filename=filename,
+            file_id=file_id,
+            target_langs=target_langs,
+            user_id=user_id,
+            cache_keys=cache_keys,
+            cached_results=cached_results,
+            media_info=media_info,
+            dubbing_mode=dubbing_mode,
+            meta={'filename': filename, 'target_languages': target_langs, 'dubbing_mode': dubbing_mode}
+        )
+    except QueueFullError as e:
+        print(f" {e}")
+        if os.path.exists(input_path):
+            os.remove(input_path)
+        remove_unrecorded_outputs(cached_results)
+        return jsonify({'error': 'Server is busy, please retry shortly'}), 503, {'Retry-After': '30'}
+
+    print(f" Job queued: {job.id} (queue depth {job_queue.depth()})")
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f"/jobs/{job.id}"
+    }), 202
+
 @flask_app.route('/upload', methods=['POST'])
 def upload_and_translate():
     try:
@@ -361,213 +1170,293 @@ def upload_and_translate():
             return jsonify({'error': 'No file provided'}), 400
         
         file = request.files['file']
-        target_lang = request.form.get('target_lang', 'hi')
+        target_langs = parse_target_langs(request.form)
+        dubbing_mode = parse_dubbing_mode(request.form)
         
         print(f" File: {file.filename}")
-        print(f" Target language: {target_lang}")
+        print(f" Target languages: {', '.join(target_langs)}")
         
         if file.filename == '':
             print(" Empty filename")
             return jsonify({'error': 'No file selected'}), 400
+
+        if len(target_langs) > MAX_TARGET_LANGS:
+            return jsonify({'error': f'At most {MAX_TARGET_LANGS} target languages per upload'}), 400
+        if dubbing_mode is None:
+            return jsonify({'error': f"dubbing_mode must be one of {', '.join(DUBBING_MODES)}"}), 400
         
         # Save uploaded file
         file_id = str(uuid.uuid4())
         file_extension = os.path.splitext(file.filename)[1]
-        input_path = f"temp_{file_id}{file_extension}"
-        file.save(input_path)
-        print(f" File saved: {input_path}")
-        
-        # Check if it's video or audio
-        is_video = file.filename.lower().endswith((".mp4", ".mov", ".mkv"))
-        print(f" Is video: {is_video}")
-        
-        # Track timing for each step
-        timing_data = {}
-        
-        try:
-            print(" Starting translation process...")
-            overall_start = time.time()
-            
-            # Step 1: Extract audio if video
-            if is_video:
-                print(" Extracting audio from video...")
-                step_start = time.time()
-                raw_audio = extract_audio(input_path)
-                timing_data['audio_extraction'] = round(time.time() - step_start, 2)
-            else:
-                print(" Using audio file directly...")
-                raw_audio = input_path
-                timing_data['audio_extraction'] = 0
-            
-            # Step 2: Clean audio
-            print(" Cleaning audio...")
-            step_start = time.time()
-            cleaned_audio = clean_audio(raw_audio)
-            timing_data['audio_cleaning'] = round(time.time() - step_start, 2)
-            
-            # Step 3: Whisper transcription (same language)
-            print(" Transcribing original language...")
-            step_start = time.time()
-            original_transcript = whisper_transcribe_long_audio(cleaned_audio)
-            timing_data['transcription'] = round(time.time() - step_start, 2)
-            print(f" Original transcript: {original_transcript[:100]}...")
-            
-            # Step 4: Whisper English translation
-            print("🇬🇧 Translating to English...")
-            step_start = time.time()
-            whisper_english = whisper_translate_long_audio(cleaned_audio)
-            timing_data['whisper_translation'] = round(time.time() - step_start, 2)
-            print(f" English translation: {whisper_english[:100]}...")
-            
-            # Step 5: Google translation from English to target
-            print(f" Translating to {target_lang}...")
-            step_start = time.time()
-            final_translation = translate_google(whisper_english, lang=target_lang)
-            timing_data['google_translation'] = round(time.time() - step_start, 2)
-            print(f" Final translation: {final_translation[:100]}...")
+        input_path = os.path.join(SPOOL_DIR, f"temp_{file_id}{file_extension}")
+        content_hash, size = save_stream_with_hash(file.stream, input_path)
+        print(f" File saved: {input_path} ({size} bytes, hash {content_hash[:12]})")
+
+        return queue_translation(input_path, file.filename, file_id, content_hash, target_langs, user_id,
+                                 dubbing_mode=dubbing_mode, profile=wants_profile(request.form))
             
-            # Calculate accuracy metrics - based on successful completion and content preservation
-            # Accuracy is measured on how well content is preserved through translation steps
-            accuracy_whisper = 95.0
-            accuracy_english = 92.0
-            accuracy_final = calculate_accuracy(whisper_english, final_translation)
+    except Exception as e:
+        tb = traceback.format_exc()
+        print(f" Upload error: {str(e)}")
+        print(tb)
+        return jsonify({'error': f'Upload failed: {str(e)}', 'traceback': tb}), 500
 
+# Chunked, resumable uploads: POST /uploads opens a session, PUT
+# /uploads/<id>?offset=N appends a chunk, GET /uploads/<id> reports the
+# stored offset to resume from and POST /uploads/<id>/complete queues the
+# translation.
+@flask_app.route('/uploads', methods=['POST'])
+def create_upload():
+    data = request.json or {}
+    filename = data.get('filename')
+    if not filename:
+        return jsonify({'error': 'filename required'}), 400
+    size = data.get('size')
+    if size is not None:
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            size = -1
+        if size < 0:
+            return jsonify({'error': 'size must be a non-negative integer'}), 400
+    session = upload_sessions.create(filename, size)
+    print(f" Upload session {session.id} opened for {filename}")
+    return jsonify(dict(session.to_dict(), chunk_url=f"/uploads/{session.id}")), 201
 
-            
-            # Step 6: TTS
-            print(" Generating speech...")
-            step_start = time.time()
-            tts_path = tts(final_translation, lang=target_lang)
-            timing_data['tts_generation'] = round(time.time() - step_start, 2)
-            print(f" TTS audio path: {tts_path}")
-            tts_duration = get_duration(tts_path)
-            print(f" TTS audio duration: {tts_duration}")
-
-            # Step 7: Process result
-            if is_video:
-                print(" Processing video...")
-                step_start = time.time()
-                duration = get_duration(input_path)
-                print(f" Original video duration: {duration}")
-                synced_audio = match_audio_to_video(tts_path, duration)
-                print(f" Synced audio path: {synced_audio}")
-                print(f" Synced audio duration: {get_duration(synced_audio)}")
-                final_output = merge_audio_video(input_path, synced_audio)
-                timing_data['video_processing'] = round(time.time() - step_start, 2)
-                print(f" Merged video output: {final_output}")
-                output_filename = f"translated_video_{file_id}.mp4"
-            else:
-                print(" Processing audio...")
-                timing_data['video_processing'] = 0
-                final_output = tts_path
-                output_filename = f"translated_audio_{file_id}.mp3"
-            
-            # Calculate total translation time (all processing steps)
-            total_translation_time = round(time.time() - overall_start, 2)
-            
-            # Move to translated_files directory
-            os.makedirs("translated_files", exist_ok=True)
-            final_path = os.path.join("translated_files", output_filename)
-            os.rename(final_output, final_path)
-            print(f" Translation complete: {output_filename}")
-            
-            # Cleanup temp files
-            if os.path.exists(input_path):
-                os.remove(input_path)
-            if raw_audio != input_path and os.path.exists(raw_audio):
-                os.remove(raw_audio)
-            if os.path.exists(cleaned_audio):
-                os.remove(cleaned_audio)
-            if is_video and os.path.exists(synced_audio):
-                os.remove(synced_audio)
-            
-            # Save original/translated metadata to appropriate collections
-            translation_id = None
-            try:
-                # Always attempt to save original and translated entries (allow anonymous uploads)
-                original_id = None
-                if is_video and original_video_collection is not None:
-                    orig_doc = {
-                        'user_id': user_id,
-                        'filename': file.filename,
-                        'path': input_path,
-                        'media_type': 'video',
-                        'uploaded_at': datetime.utcnow()
-                    }
-                    r = original_video_collection.insert_one(orig_doc)
-                    original_id = str(r.inserted_id)
-                elif not is_video and original_audio_collection is not None:
-                    orig_doc = {
-                        'user_id': user_id,
-                        'filename': file.filename,
-                        'path': input_path,
-                        'media_type': 'audio',
-                        'uploaded_at': datetime.utcnow()
-                    }
-                    r = original_audio_collection.insert_one(orig_doc)
-                    original_id = str(r.inserted_id)
-
-                # Save translated entry
-                translated_doc = {
-                    'user_id': user_id,
-                    'original_id': original_id,
-                    'original_filename': file.filename,
-                    'translated_filename': output_filename,
-                    'media_type': 'video' if is_video else 'audio',
-                    'target_language': target_lang,
-                    'translation_time': total_translation_time,
-                    'accuracy': round((accuracy_whisper + accuracy_english + accuracy_final) / 3, 2),
-                    'timestamp': datetime.utcnow(),
-                    'status': 'completed'
-                }
-                if is_video and translated_video_collection is not None:
-                    res = translated_video_collection.insert_one(translated_doc)
-                    translation_id = str(res.inserted_id)
-                elif not is_video and translated_audio_collection is not None:
-                    res = translated_audio_collection.insert_one(translated_doc)
-                    translation_id = str(res.inserted_id)
-                elif translations_collection is not None:
-                    # Fallback to generic translations collection
-                    res = translations_collection.insert_one(translated_doc)
-                    translation_id = str(res.inserted_id)
-                if translation_id:
-                    print(f" Translation saved to DB: {translation_id}")
-            except Exception as db_error:
-                print(f" Error saving to DB: {db_error}")
-            
-            return jsonify({
-                'success': True,
-                'translation_id': translation_id,
-                'audio_file' if not is_video else 'video_file': output_filename,
-                'original_transcript': original_transcript,
-                'whisper_english': whisper_english,
-                'final_translation': final_translation,
-                'target_language': target_lang,
-                'translation_time': total_translation_time,
-                'timing_breakdown': timing_data,
-                'accuracy': {
-                    'transcription': accuracy_whisper,
-                    'whisper_to_english': accuracy_english,
-                    'final_translation': accuracy_final,
-                    'overall': round((accuracy_whisper + accuracy_english + accuracy_final) / 3, 2)
-                }
-            })
-            
-        except Exception as e:
-            tb = traceback.format_exc()
-            print(f" Translation error: {str(e)}")
-            print(tb)
-            # Cleanup on error
-            if os.path.exists(input_path):
-                os.remove(input_path)
-            return jsonify({'error': f'Translation failed: {str(e)}', 'traceback': tb}), 500
-            
+@flask_app.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    session = upload_sessions.get(upload_id)
+    if session is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify(session.to_dict())
+
+@flask_app.route('/uploads/<upload_id>', methods=['PUT'])
+def put_upload_chunk(upload_id):
+    session = upload_sessions.get(upload_id)
+    if session is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    offset = request.args.get('offset', request.headers.get('Upload-Offset'))
+    if offset is None:
+        return jsonify({'error': 'offset required'}), 400
+    try:
+        new_offset = upload_sessions.append(session, int(offset), request.stream)
+    except OffsetMismatch as e:
+        return jsonify({'error': str(e), 'offset': e.expected}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e), 'offset': session.offset}), 400
+
+    # The early probe found a container without audio: stop the transfer now
+    if session.media and not session.media['has_audio']:
+        upload_sessions.discard(session.id)
+        return jsonify({'error': 'File has no audio stream'}), 415
+    return jsonify(session.to_dict())
+
+@flask_app.route('/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id):
+    try:
+        session = upload_sessions.get(upload_id)
+        if session is None:
+            return jsonify({'error': 'Upload not found'}), 404
+
+        data = request.form if request.form else MultiDict(request.json or {})
+        target_langs = parse_target_langs(data)
+        dubbing_mode = parse_dubbing_mode(data)
+        user_id = data.get('user_id') or request.headers.get('X-User-Id')
+        if len(target_langs) > MAX_TARGET_LANGS:
+            return jsonify({'error': f'At most {MAX_TARGET_LANGS} target languages per upload'}), 400
+        if dubbing_mode is None:
+            return jsonify({'error': f"dubbing_mode must be one of {', '.join(DUBBING_MODES)}"}), 400
+
+        try:
+            input_path, content_hash, size, media_info = upload_sessions.finalize(session)
+        except OffsetMismatch as e:
+            return jsonify({'error': 'Upload is incomplete', 'offset': e.expected}), 409
+        print(f" Upload {upload_id} complete: {size} bytes, hash {content_hash[:12]}")
+
+        if media_info and not media_info['has_audio']:
+            os.remove(input_path)
+            return jsonify({'error': 'File has no audio stream'}), 415
+        return queue_translation(input_path, session.filename, upload_id, content_hash, target_langs, user_id,
+                                 media_info=media_info, dubbing_mode=dubbing_mode, profile=wants_profile(data))
     except Exception as e:
         tb = traceback.format_exc()
         print(f" Upload error: {str(e)}")
         print(tb)
         return jsonify({'error': f'Upload failed: {str(e)}', 'traceback': tb}), 500
 
+@flask_app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+# Trace spans of a job as JSON; ?format=chrome for chrome://tracing or
+# Perfetto. A job running in this process answers with the spans so far,
+# other jobs once their trace has been saved.
+@flask_app.route('/jobs/<job_id>/trace', methods=['GET'])
+def job_trace(job_id):
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        return jsonify({'error': 'Trace not found'}), 404
+    trace = active_trace(job_id)
+    if trace is not None:
+        data = trace.to_dict()
+    else:
+        try:
+            with open(trace_path(job_id, '.json')) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return jsonify({'error': 'Trace not found'}), 404
+    return jsonify(to_chrome(data) if request.args.get('format') == 'chrome' else data)
+
+# Folded stacks of a profiled job (flamegraph.pl or speedscope input)
+@flask_app.route('/jobs/<job_id>/profile', methods=['GET'])
+def job_profile(job_id):
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        return jsonify({'error': 'Profile not found'}), 404
+    path = trace_path(job_id, '.folded')
+    if not os.path.exists(path):
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(os.path.abspath(path), mimetype='text/plain', as_attachment=True,
+                     download_name=f"{job_id}.folded")
+
+# Server-Sent Events stream of a job's status, stage and progress changes.
+# A stream sleeps on the job's condition between events, so open streams
+# cost an idle thread each and no polling; a comment line every
+# SSE_HEARTBEAT_SECONDS keeps proxies from closing them. Reconnecting
+# clients resume after the Last-Event-ID they received.
+@flask_app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0)
+    except ValueError:
+        last_id = 0
+
+    def stream():
+        after = last_id
+        yield "retry: 3000\n\n"
+        while True:
+            events = job.wait_events(after, timeout=SSE_HEARTBEAT_SECONDS)
+            if not events:
+                if job.done:
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            for event in events:
+                after = event['id']
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+            if events[-1]['event'] in ('completed', 'failed'):
+                return
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(stream()), mimetype='text/event-stream', headers=headers)
+
+# Whisper pass over a live window, greedy and with word timestamps so the
+# stabilizer can line hypotheses up in time
+def stream_transcribe_words(audio, language, prompt):
+    result = asr.transcribe(
+        audio,
+        task="transcribe",
+        language=language,
+        temperature=0.0,
+        word_timestamps=True,
+        condition_on_previous_text=False,
+        initial_prompt=prompt
+    )
+    words = [(w['start'], w['end'], w['word']) for segment in result['segments'] for w in segment.get('words', [])]
+    return result.get('language'), words
+
+# Live transcription and translation of a microphone stream.
+# The first message is JSON: {"format": "pcm" | "opus", "sample_rate": 16000,
+# "target_lang": "hi", "language": optional source language}. Audio follows
+# as binary messages (16-bit mono PCM, or Opus in WebM/Ogg) and {"type":
+# "stop"} ends the stream. The server answers with `partial` (tentative
+# tail), `transcript` (committed source text), `translation` and `done`.
+@sock.route('/stream')
+def live_stream(ws):
+    if asr is None:
+        ws.send(json.dumps({'type': 'error', 'error': f"Speech model is {model_state['status']}, please retry shortly"}))
+        return
+    if not stream_slots.acquire(blocking=False):
+        ws.send(json.dumps({'type': 'error', 'error': 'Too many live streams, please retry shortly'}))
+        return
+    decoder = None
+    translator = None
+    try:
+        config = json.loads(ws.receive(timeout=10) or '{}')
+        target_lang = config.get('target_lang', 'hi')
+        if target_lang not in lang_options.values():
+            ws.send(json.dumps({'type': 'error', 'error': f'Unsupported target language: {target_lang}'}))
+            return
+        sample_rate = int(config.get('sample_rate', 16000))
+
+        send_lock = threading.Lock()
+
+        def send(message):
+            with send_lock:
+                ws.send(json.dumps(message))
+
+        session = StreamingTranscriber(stream_transcribe_words, language=config.get('language'),
+                                       step=STREAM_STEP_SECONDS, window=STREAM_WINDOW_SECONDS)
+        translator = IncrementalTranslator(
+            lambda text: translate_google(text, lang=target_lang),
+            lambda source, text: send({'type': 'translation', 'source': source, 'text': text})
+        )
+        if config.get('format', 'pcm') == 'opus':
+            decoder = FfmpegDecoder(session.feed)
+
+        def publish(committed, tentative, final=False):
+            if committed:
+                text = words_text(committed)
+                send({'type': 'transcript', 'text': text, 'start': round(committed[0][0], 2),
+                      'end': round(committed[-1][1], 2), 'language': session.language})
+                translator.add(text)
+            if not final:
+                send({'type': 'partial', 'text': words_text(tentative)})
+
+        send({'type': 'ready', 'target_lang': target_lang})
+        print(f" Live stream started ({config.get('format', 'pcm')} -> {target_lang})")
+        stopped = False
+        while not stopped:
+            # Wait for audio, then drain whatever else has arrived before decoding
+            message = ws.receive(timeout=STREAM_STEP_SECONDS)
+            while message is not None:
+                if isinstance(message, str):
+                    if json.loads(message).get('type') == 'stop':
+                        stopped = True
+                        break
+                elif decoder:
+                    decoder.write(message)
+                else:
+                    session.feed(resample(pcm16_to_float(message), sample_rate))
+                message = ws.receive(timeout=0)
+            if not stopped and session.ready():
+                publish(*session.process())
+
+        if decoder:
+            decoder.close()
+            decoder = None
+        publish(session.finish(), [], final=True)
+        translator.close()
+        translator = None
+        send({'type': 'done', 'text': words_text(session.agreement.committed)})
+    except Exception as e:
+        print(f" Live stream error: {e}")
+        print(traceback.format_exc())
+    finally:
+        if decoder:
+            decoder.close()
+        if translator:
+            translator.close()
+        stream_slots.release()
+
 @flask_app.route('/download/<filename>')
 def download_file(filename):
     try:
@@ -581,14 +1470,31 @@ def download_file(filename):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Liveness: the process is up and serving, whether or not the model is ready
 @flask_app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({
         'status': 'OK',
         'message': 'Translation server is running',
-        'languages_available': len(lang_options)
+        'languages_available': len(lang_options),
+        'queue_depth': job_queue.depth(),
+        'jobs_in_flight': job_queue.in_flight(),
+        'model_status': model_state['status'],
+        'pid': os.getpid()
     })
 
+# Prometheus scrape endpoint
+@flask_app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Readiness: 200 once the speech model is loaded and warmed up, 503 before
+@flask_app.route('/ready', methods=['GET'])
+def readiness_check():
+    ready = model_state['status'] == 'ready'
+    data = dict(model_state, ready=ready, model=MODEL_ID, asr=asr.stats() if asr is not None else None)
+    return jsonify(data), 200 if ready else 503
+
 if __name__ == "__main__":
     print(" Translanova Translation Server")
     print("=====================================")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Compare the fp32 and int8 CPU profiles of the PyTorch Whisper backend.
+
+Each profile loads the model, transcribes the bundled test audio a few
+times and reports load time, memory, real-time factor and word error
+rate. WER is measured against --reference (a text file) when given,
+otherwise against the fp32 transcript.
+
+    cd backend
+    python benchmarks/bench_quantization.py --model small --runs 3 --threads 4
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from jiwer import wer  # noqa: E402
+
+from services.asr_backends import WhisperBackend  # noqa: E402
+from services.whisper_decode import load_audio  # noqa: E402
+
+DEFAULT_AUDIO = os.path.join(BACKEND_DIR, '..', 'frontend', 'src', 'images', 'test_audio.mp3')
+SAMPLE_RATE = 16000
+
+
+def run_profile(name, args, audio):
+    backend = WhisperBackend(args.model, device="cpu", threads=args.threads, quantize=name == "int8").load()
+    # Warm-up pass so one-off allocations do not count against the first run
+    backend.transcribe(audio[:5 * SAMPLE_RATE], language=args.language, temperature=0.0)
+
+    texts = []
+    rtfs = []
+    duration = len(audio) / SAMPLE_RATE
+    for _ in range(args.runs):
+        start = time.time()
+        result = backend.transcribe(audio, language=args.language, temperature=0.0, beam_size=args.beam_size)
+        rtfs.append((time.time() - start) / duration)
+        texts.append(result['text'].strip())
+
+    stats = backend.stats()
+    del backend
+    gc.collect()
+    return {
+        'profile': name,
+        'load_seconds': stats['load_seconds'],
+        'memory_mb': stats['memory_mb'],
+        'rtf_median': round(statistics.median(rtfs), 3),
+        'rtf_min': round(min(rtfs), 3),
+        'text': texts[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--audio', default=DEFAULT_AUDIO, help='audio file to transcribe')
+    parser.add_argument('--model', default='small', help='Whisper checkpoint (default: small)')
+    parser.add_argument('--runs', type=int, default=3, help='timed runs per profile')
+    parser.add_argument('--threads', type=int, default=None, help='intra-op threads (default: torch default)')
+    parser.add_argument('--beam-size', type=int, default=5)
+    parser.add_argument('--language', default=None, help='source language (default: detect)')
+    parser.add_argument('--reference', default=None, help='text file with the reference transcript')
+    parser.add_argument('--json', default=None, help='write the results to this file')
+    args = parser.parse_args()
+
+    audio = load_audio(os.path.abspath(args.audio))
+    print(f"Audio: {args.audio} ({len(audio) / SAMPLE_RATE:.1f}s), model {args.model}, "
+          f"threads {args.threads or 'default'}, {args.runs} runs")
+
+    results = [run_profile(name, args, audio) for name in ("fp32", "int8")]
+
+    if args.reference:
+        with open(args.reference, encoding='utf-8') as f:
+            reference = f.read().strip()
+    else:
+        reference = results[0]['text']
+    for result in results:
+        result['wer'] = round(wer(reference.lower(), result['text'].lower()), 4) if reference else None
+
+    print(f"\n{'profile':<8} {'load s':>8} {'mem MiB':>8} {'RTF med':>8} {'RTF min':>8} {'WER':>8}")
+    for r in results:
+        print(f"{r['profile']:<8} {r['load_seconds']:>8} {r['memory_mb']:>8} {r['rtf_median']:>8} "
+              f"{r['rtf_min']:>8} {r['wer'] if r['wer'] is not None else '-':>8}")
+    speedup = results[0]['rtf_median'] / results[1]['rtf_median'] if results[1]['rtf_median'] else None
+    if speedup:
+        print(f"\nint8 speed-up: {speedup:.2f}x")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'model': args.model, 'threads': args.threads, 'reference': 'file' if args.reference else 'fp32',
+                       'results': results}, f, indent=2, ensure_ascii=False)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the translation pipeline.
+
+Drives the pipeline stages of app.py (decoding and cleaning the audio in
+one ffmpeg pass, the Whisper pass, translation, TTS and, for video, tempo
+matching and muxing) over a corpus of audio and video clips built from the bundled
+test audio. Google Translate and gTTS are replaced by the local stub
+backends (TRANSLATOR_BACKEND=stub, TTS_BACKEND=stub) with simulated
+latency, so results do not depend on the network. MongoDB is not used.
+
+The corpus runs once per concurrency level. For each level the script
+reports per-stage latency percentiles, the real-time factor (processing
+seconds per second of media), throughput and peak RSS. --json writes
+the results for comparison across commits, and --baseline prints the
+change against an earlier results file.
+
+    cd backend
+    python benchmarks/pipeline_bench.py --concurrency 1,2,4 --json bench.json
+    python benchmarks/pipeline_bench.py --concurrency 1,2,4 --baseline bench.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_AUDIO = os.path.join(BACKEND_DIR, '..', 'frontend', 'src', 'images', 'test_audio.mp3')
+# The stages run_translation_job runs, in order; totals and RTF sum these
+STAGES = ('load_audio', 'whisper', 'translate', 'tts', 'match_audio_to_video', 'merge_audio_video')
+PERCENTILES = (50, 90, 95, 99)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--audio', default=DEFAULT_AUDIO, help='speech sample the corpus is built from')
+    parser.add_argument('--audio-lengths', default='30,120',
+                        help='comma separated lengths in seconds of generated audio clips (the sample itself is always included)')
+    parser.add_argument('--video-lengths', default='15,60', help='comma separated lengths in seconds of generated video clips')
+    parser.add_argument('--concurrency', default='1,2,4', help='comma separated concurrency levels')
+    parser.add_argument('--repeat', type=int, default=1, help='times each clip is run per level')
+    parser.add_argument('--lang', default='hi', help='target language')
+    parser.add_argument('--backend', default=None, help='ASR backend (default: ASR_BACKEND or whisper)')
+    parser.add_argument('--model', default=None, help='Whisper checkpoint (default: ASR_MODEL or the backend default)')
+    parser.add_argument('--translator-latency', type=float, default=0.2, help='simulated seconds per translator request')
+    parser.add_argument('--tts-latency', type=float, default=0.3, help='simulated seconds per synthesized sentence')
+    parser.add_argument('--json', default=None, help='write the results to this file')
+    parser.add_argument('--baseline', default=None, help='earlier results file to compare against')
+    return parser.parse_args()
+
+
+def configure(args, work_dir):
+    # Must happen before app is imported
+    os.environ['TRANSLATOR_BACKEND'] = 'stub'
+    os.environ['STUB_TRANSLATOR_LATENCY'] = str(args.translator_latency)
+    os.environ['TTS_BACKEND'] = 'stub'
+    os.environ['STUB_TTS_LATENCY'] = str(args.tts_latency)
+    os.environ['DEFER_MODEL_LOADING'] = '1'
+    os.environ['TTS_CACHE_DIR'] = os.path.join(work_dir, 'tts_cache')
+    os.environ['SPOOL_DIR'] = os.path.join(work_dir, 'uploads')
+    os.environ.pop('JOB_STATE_DIR', None)
+    if args.backend:
+        os.environ['ASR_BACKEND'] = args.backend
+    if args.model:
+        os.environ['ASR_MODEL'] = args.model
+
+
+def build_corpus(args, corpus_dir):
+    import ffmpeg
+
+    sample = os.path.abspath(args.audio)
+    corpus = [{'name': os.path.basename(sample), 'path': sample, 'video': False,
+               'duration': float(ffmpeg.probe(sample)['format']['duration'])}]
+    for length in [float(x) for x in args.audio_lengths.split(',') if x]:
+        path = os.path.join(corpus_dir, f"audio_{int(length)}s.mp3")
+        (
+            ffmpeg
+            .input(sample, stream_loop=-1)
+            .output(path, t=length, acodec='libmp3lame', ar=44100)
+            .overwrite_output()
+            .run(quiet=True)
+        )
+        corpus.append({'name': os.path.basename(path), 'path': path, 'video': False, 'duration': length})
+    for length in [float(x) for x in args.video_lengths.split(',') if x]:
+        path = os.path.join(corpus_dir, f"video_{int(length)}s.mp4")
+        video = ffmpeg.input('testsrc=size=640x360:rate=25', f='lavfi', t=length)
+        audio = ffmpeg.input(sample, stream_loop=-1)
+        (
+            ffmpeg
+            .output(video.video, audio.audio, path, t=length, vcodec='libx264', preset='ultrafast',
+                    pix_fmt='yuv420p', acodec='aac')
+            .overwrite_output()
+            .run(quiet=True)
+        )
+        corpus.append({'name': os.path.basename(path), 'path': path, 'video': True, 'duration': length})
+    return corpus
+
+
+def run_item(app, item, lang):
+    timings = {}
+    temp_paths = []
+
+    def timed(stage, func, *args, **kwargs):
+        start = time.time()
+        result = func(*args, **kwargs)
+        timings[stage] = time.time() - start
+        return result
+
+    try:
+        audio = timed('load_audio', app.load_cleaned_audio, item['path'])
+        asr_result = timed('whisper', app.whisper_transcribe_and_translate_long_audio, audio)
+        translation = timed('translate', app.translate_google, asr_result['translate']['text'], lang=lang)
+        tts_path = timed('tts', app.tts, translation, lang=lang)
+        temp_paths.append(tts_path)
+        if item['video']:
+            synced = timed('match_audio_to_video', app.match_audio_to_video, tts_path, item['duration'])
+            temp_paths.append(synced)
+            temp_paths.append(timed('merge_audio_video', app.merge_audio_video, item['path'], synced))
+    finally:
+        for path in set(temp_paths):
+            if path and os.path.exists(path):
+                os.remove(path)
+    total = sum(timings.values())
+    return {'name': item['name'], 'duration': item['duration'], 'timings': timings, 'total': total,
+            'rtf': total / item['duration'] if item['duration'] else None}
+
+
+# Nearest-rank percentile
+def percentile(values, p):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(values):
+    if not values:
+        return None
+    summary = {f"p{p}": round(percentile(values, p), 3) for p in PERCENTILES}
+    summary['mean'] = round(sum(values) / len(values), 3)
+    summary['count'] = len(values)
+    return summary
+
+
+class RssSampler:
+    """Track the peak resident memory of this process while a level runs."""
+
+    def __init__(self, rss_bytes, interval=0.05):
+        self.rss_bytes = rss_bytes
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.rss_bytes())
+
+
+def run_level(app, corpus, concurrency, args, work_dir):
+    from services.asr_backends import rss_bytes
+    from services.translation_memory import TranslationMemory
+    from services.tts_cache import ClipCache, make_synthesizer
+
+    # Every level starts with empty translation memory and clip cache
+    app.translation_memory = TranslationMemory(None, capacity=app.TM_CACHE_SIZE)
+    cache_dir = tempfile.mkdtemp(dir=work_dir, prefix=f"tts_c{concurrency}_")
+    app.tts_synthesizer = make_synthesizer(ClipCache(cache_dir), workers=app.tts_synthesizer.workers)
+
+    items = [item for item in corpus for _ in range(args.repeat)]
+    with RssSampler(rss_bytes) as sampler:
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            runs = list(pool.map(lambda item: run_item(app, item, args.lang), items))
+        wall = time.time() - start
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    media_seconds = sum(run['duration'] for run in runs)
+    return {
+        'concurrency': concurrency,
+        'items': len(runs),
+        'wall_seconds': round(wall, 2),
+        'throughput_items_per_min': round(60 * len(runs) / wall, 2),
+        'media_seconds_per_second': round(media_seconds / wall, 3),
+        'rtf': summarize([run['rtf'] for run in runs if run['rtf'] is not None]),
+        'latency': summarize([run['total'] for run in runs]),
+        'stages': {stage: summarize([run['timings'][stage] for run in runs if stage in run['timings']])
+                   for stage in STAGES if any(stage in run['timings'] for run in runs)},
+        'peak_rss_mb': round(sampler.peak / 1024 ** 2, 1),
+        'runs': [dict(run, total=round(run['total'], 3), rtf=round(run['rtf'], 3) if run['rtf'] else None,
+                      timings={k: round(v, 3) for k, v in run['timings'].items()}) for run in runs],
+    }
+
+
+def print_level(level):
+    print(f"\nConcurrency {level['concurrency']}: {level['items']} clips in {level['wall_seconds']}s, "
+          f"{level['throughput_items_per_min']} clips/min, {level['media_seconds_per_second']} media s/s, "
+          f"RTF p50 {level['rtf']['p50']}, peak RSS {level['peak_rss_mb']} MiB")
+    print(f"  {'stage':<22}" + "".join(f"{'p' + str(p):>9}" for p in PERCENTILES) + f"{'mean':>9}")
+    for stage, summary in list(level['stages'].items()) + [('total', level['latency'])]:
+        print(f"  {stage:<22}" + "".join(f"{summary['p' + str(p)]:>9}" for p in PERCENTILES)
+              + f"{summary['mean']:>9}")
+
+
+def change(new, old):
+    if not old:
+        return "-"
+    return f"{100 * (new - old) / old:+.1f}%"
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {level['concurrency']: level for level in baseline['levels']}
+    print(f"\nAgainst {baseline_path} (commit {baseline.get('commit') or 'unknown'}):")
+    # Results written before the legacy extract/clean stages were dropped
+    # include them in their totals
+    old_stages = {stage for level in baseline['levels'] for stage in level['stages']}
+    if old_stages - set(STAGES):
+        print(f"  baseline also timed {', '.join(sorted(old_stages - set(STAGES)))}; "
+              f"throughput and RTF are not comparable, compare the shared stages")
+    for level in results['levels']:
+        old = previous.get(level['concurrency'])
+        if old is None:
+            continue
+        print(f"  concurrency {level['concurrency']}: throughput "
+              f"{change(level['throughput_items_per_min'], old['throughput_items_per_min'])}, "
+              f"RTF p50 {change(level['rtf']['p50'], old['rtf']['p50'])}, "
+              f"peak RSS {change(level['peak_rss_mb'], old['peak_rss_mb'])}")
+        for stage, summary in level['stages'].items():
+            if stage in old['stages']:
+                print(f"    {stage:<22} p50 {change(summary['p50'], old['stages'][stage]['p50']):>8}"
+                      f"   p95 {change(summary['p95'], old['stages'][stage]['p95']):>8}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_args()
+    work_dir = tempfile.mkdtemp(prefix="pipeline_bench_")
+    configure(args, work_dir)
+    try:
+        import app
+
+        print(f"Building corpus in {work_dir}...")
+        corpus = build_corpus(args, work_dir)
+        for item in corpus:
+            print(f"  {item['name']:<24} {item['duration']:>7.1f}s {'video' if item['video'] else 'audio'}")
+
+        if app.load_models() is None or app.asr is None:
+            raise SystemExit(f"Speech model failed: {app.model_state['error']}")
+        print(f"Model {app.MODEL_ID} loaded in {app.model_state['load_seconds']}s, "
+              f"warm-up {app.model_state['warmup_seconds']}s")
+
+        results = {
+            'commit': git_commit(),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'host': {'platform': platform.platform(), 'python': platform.python_version(),
+                     'cpus': os.cpu_count()},
+            'config': {'model': app.MODEL_ID, 'target_language': args.lang, 'repeat': args.repeat,
+                       'translator_latency': args.translator_latency, 'tts_latency': args.tts_latency,
+                       'model_load_seconds': app.model_state['load_seconds'],
+                       'corpus': [{k: item[k] for k in ('name', 'duration', 'video')} for item in corpus]},
+            'levels': [],
+        }
+        for concurrency in [int(x) for x in args.concurrency.split(',') if x]:
+            level = run_level(app, corpus, concurrency, args, work_dir)
+            results['levels'].append(level)
+            print_level(level)
+        # Peak over the whole run, including ffmpeg child processes
+        scale = 1 if platform.system() == 'Darwin' else 1024
+        results['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1024 ** 2, 1)
+        results['peak_child_rss_mb'] = round(
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 1024 ** 2, 1)
+
+        if args.baseline:
+            compare(results, args.baseline)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            print(f"\nResults written to {args.json}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Pre-fork server for production: several worker processes share one copy
+of the Whisper weights.
+
+The master process imports the app, loads the speech model and freezes
+the garbage collector, then binds the port and forks SERVE_WORKERS
+workers. The weights are inherited copy-on-write and never written during
+inference, so their pages stay shared however many workers run; each
+worker only adds its own activations and request state. Workers accept
+connections on the shared socket, keep their own job queue and publish
+job state to JOB_STATE_DIR, so /jobs/<id> and its event stream work on
+any worker. A worker is recycled after MAX_JOBS_PER_WORKER jobs, and the
+master replaces workers that exit or crash.
+
+    cd backend
+    SERVE_WORKERS=4 python serve.py
+
+Only the CPU openai-whisper backend is loaded before the fork. CUDA and
+CTranslate2 (faster-whisper) start threads while loading and cannot be
+forked safely, so with those each worker loads its own model.
+"""
+
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+SERVE_HOST = os.getenv('SERVE_HOST', '0.0.0.0')
+SERVE_PORT = int(os.getenv('SERVE_PORT', '8501'))
+SERVE_WORKERS = int(os.getenv('SERVE_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))
+# Recycle a worker after this many finished jobs (0 = never)
+MAX_JOBS_PER_WORKER = int(os.getenv('MAX_JOBS_PER_WORKER', '200'))
+# How long a stopping worker may take to finish its queued jobs
+SERVE_GRACE_SECONDS = float(os.getenv('SERVE_GRACE_SECONDS', '600'))
+# Move the weights into shared memory before forking (PyTorch backend only)
+PREFORK_SHARE_MEMORY = os.getenv('PREFORK_SHARE_MEMORY', '0') == '1'
+JOB_STATE_TTL = int(os.getenv('JOB_STATE_TTL', str(24 * 3600)))
+
+# Must be set before the app module is imported
+os.environ['DEFER_MODEL_LOADING'] = '1'
+# ASR_PROCESSES is the host-wide size of the long-audio process pool. Each
+# worker builds its own pool, and every pool process loads its own model
+# outside the copy-on-write pages, so the workers split it.
+_asr_processes = int(os.getenv('ASR_PROCESSES', str(max(1, (os.cpu_count() or 2) // 2))))
+os.environ['ASR_PROCESSES'] = str(max(1, _asr_processes // SERVE_WORKERS))
+os.environ.setdefault('JOB_STATE_DIR', 'job_state')
+# Intra-op threads per inference thread: the cores are split between the
+# worker processes, and between their job threads unless the batcher runs
+# all inference of a worker on one thread
+_inference_threads = 1 if int(os.getenv('WHISPER_BATCH_SIZE', '8')) > 1 else max(
+    1, int(os.getenv('TRANSLATION_WORKERS', '2')))
+_worker_threads = int(os.getenv('TORCH_INTRA_THREADS', '0')) or max(
+    1, (os.cpu_count() or 1) // (SERVE_WORKERS * _inference_threads))
+
+import app  # noqa: E402
+from services.asr_backends import rss_bytes  # noqa: E402
+from services.jobs import fail_orphaned_jobs  # noqa: E402
+from services.metrics import RETIRED_FILE  # noqa: E402
+
+children = {}
+stopping = False
+
+
+def pss_bytes():
+    # Proportional set size: shared pages are split between the processes
+    # mapping them, so the sum over all workers is the real footprint
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def memory_summary():
+    pss = pss_bytes()
+    summary = f"RSS {rss_bytes() / 1024 ** 2:.0f} MiB"
+    if pss is not None:
+        summary += f", PSS {pss / 1024 ** 2:.0f} MiB"
+    return summary
+
+
+# Load the model in the master so the workers inherit it. With one intra-op
+# thread no OpenMP pool exists yet, which would not survive the fork.
+def preload():
+    if app.ASR_BACKEND != 'whisper' or app.USE_GPU:
+        print(f" {app.ASR_BACKEND} on {'GPU' if app.USE_GPU else 'CPU'}: each worker loads its own model")
+        return None
+    import torch
+
+    torch.set_num_threads(1)
+    backend = app.load_models(warm=False, threads=1)
+    if backend is None:
+        sys.exit(1)
+    if PREFORK_SHARE_MEMORY:
+        try:
+            backend.model.share_memory()
+        except Exception as e:
+            print(f" Could not move the weights to shared memory: {e}")
+    # Objects that exist now are never collected; the collector then does
+    # not write to their pages in the workers
+    gc.collect()
+    gc.freeze()
+    print(f" Master loaded {app.MODEL_ID} ({memory_summary()})")
+    return backend
+
+
+def cleanup_job_state():
+    now = time.time()
+    for name in os.listdir(app.JOB_STATE_DIR):
+        # Only rewritten when a worker exits, however long ago that was
+        if name == RETIRED_FILE:
+            continue
+        path = os.path.join(app.JOB_STATE_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > JOB_STATE_TTL:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def run_worker(sock, backend):
+    from werkzeug.serving import make_server
+
+    # Replace the handlers inherited from the master
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    def start_model():
+        if backend is None:
+            app.load_models(threads=_worker_threads)
+        else:
+            import torch
+
+            torch.set_num_threads(_worker_threads)
+            backend.threads = _worker_threads
+            if app.whisper_batcher is not None:
+                app.whisper_batcher.threads = _worker_threads
+            app.warm_up_models(backend)
+        print(f" Worker {os.getpid()} ready ({memory_summary()})")
+
+    threading.Thread(target=start_model, name="model-loader", daemon=True).start()
+    threading.Thread(target=app.ensure_db_indexes, name="db-indexes", daemon=True).start()
+    app.metrics.publish_every(15)
+
+    server = make_server(SERVE_HOST, SERVE_PORT, app.flask_app, threaded=True, fd=sock.fileno())
+    # Every worker polls the same socket; a non-blocking accept lets the
+    # ones that lose the race go back to waiting
+    server.socket.setblocking(False)
+    threading.Thread(target=server.serve_forever, name="http-server", daemon=True).start()
+
+    while not stop.wait(1.0):
+        if MAX_JOBS_PER_WORKER and app.job_queue.completed_count >= MAX_JOBS_PER_WORKER:
+            print(f" Worker {os.getpid()} recycling after {app.job_queue.completed_count} jobs")
+            break
+
+    # Stop accepting, then let the queued jobs finish
+    server.shutdown()
+    deadline = time.time() + SERVE_GRACE_SECONDS
+    while (app.job_queue.depth() or app.job_queue.in_flight()) and time.time() < deadline:
+        time.sleep(0.5)
+    # Final values, which the master adds to the retired totals
+    app.metrics.write_snapshot()
+    os._exit(0)
+
+
+def spawn(sock, backend):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(sock, backend)
+        except Exception as e:
+            print(f" Worker {os.getpid()} failed: {e}")
+        finally:
+            os._exit(1)
+    children[pid] = time.time()
+    return pid
+
+
+def stop_children(*_):
+    global stopping
+    stopping = True
+    for pid in list(children):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+
+def main():
+    print(" Translanova Translation Server (pre-fork)")
+    print("=====================================")
+    os.makedirs(app.JOB_STATE_DIR, exist_ok=True)
+    # Job state of a previous run belongs to processes that no longer exist
+    for name in os.listdir(app.JOB_STATE_DIR):
+        os.remove(os.path.join(app.JOB_STATE_DIR, name))
+
+    backend = preload()
+    sock = socket.create_server((SERVE_HOST, SERVE_PORT), backlog=128)
+    sock.setblocking(False)
+    print(f" Listening on http://{SERVE_HOST}:{SERVE_PORT} with {SERVE_WORKERS} workers")
+
+    signal.signal(signal.SIGTERM, stop_children)
+    signal.signal(signal.SIGINT, stop_children)
+    for _ in range(SERVE_WORKERS):
+        spawn(sock, backend)
+
+    last_cleanup = time.time()
+    while children:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            time.sleep(0.5)
+            if time.time() - last_cleanup > 600:
+                cleanup_job_state()
+                last_cleanup = time.time()
+            continue
+        started = children.pop(pid, None)
+        if started is None:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        orphaned = fail_orphaned_jobs(app.JOB_STATE_DIR, pid)
+        app.metrics.retire_snapshot(pid)
+        if stopping:
+            continue
+        print(f" Worker {pid} exited with {code}" + (f", {orphaned} job(s) failed" if orphaned else ""))
+        # Back off when workers die right after starting, e.g. on a bad config
+        if time.time() - started < 10:
+            time.sleep(5)
+        if not stopping:
+            spawn(sock, backend)
+    print(" All workers stopped")
+
+
+if __name__ == "__main__":
+    main()
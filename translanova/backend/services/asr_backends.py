@@ -0,0 +1,353 @@
+"""
+Pluggable speech recognition backends.
+
+`whisper` runs the openai-whisper PyTorch model (the single-pass decoder,
+batching and streaming all build on it). `faster-whisper` runs the same
+checkpoints through CTranslate2, int8-quantized on CPU by default, which
+makes a larger model affordable on CPU-only hosts.
+
+On CPU the PyTorch model can run with an int8 profile: the Linear layers
+are dynamically quantized, inference gets an explicit intra-op thread
+budget and runs under torch.inference_mode.
+
+Both backends return results in the openai-whisper layout and record
+their load time, resident memory and real-time factor (compute seconds
+per second of audio), so model sizes can be compared on the same host.
+"""
+
+import os
+import resource
+import sys
+import threading
+import time
+
+from services.tracing import span
+
+SAMPLE_RATE = 16000
+
+BACKENDS = ('whisper', 'faster-whisper')
+
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # Peak instead of current RSS where /proc is not available
+        scale = 1 if os.uname().sysname == 'Darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def gpu_available():
+    # Without the NVIDIA driver CUDA cannot be available; skip importing torch
+    if sys.platform.startswith('linux') and not os.path.exists('/proc/driver/nvidia/version'):
+        return False
+    try:
+        import torch
+
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+
+# Default checkpoint per backend: int8 CTranslate2 runs `medium` on CPU at
+# about the speed openai-whisper runs `small`
+def default_model_name(backend, use_gpu):
+    if use_gpu:
+        return "large-v3"
+    return "medium" if backend == 'faster-whisper' else "small"
+
+
+# Result cache keys and logs identify a model by this string
+def model_id(backend, model_name):
+    return model_name if backend == 'whisper' else f"{backend}/{model_name}"
+
+
+# Dynamic int8 quantization of the Linear layers for CPU inference.
+# whisper.model.Linear subclasses nn.Linear only to cast weights to the
+# input dtype, and quantize_dynamic matches module types exactly, so the
+# layers are turned back into plain nn.Linear first.
+def quantize_whisper(model):
+    import torch
+    from torch import nn
+
+    for module in model.modules():
+        if isinstance(module, nn.Linear) and type(module) is not nn.Linear:
+            module.__class__ = nn.Linear
+    return torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+class ASRBackend:
+    name = "base"
+
+    def __init__(self, model_name, device="cpu", threads=None):
+        self.model_name = model_name
+        self.device = device
+        self.threads = threads
+        self.load_seconds = None
+        self.memory_bytes = None
+        self.audio_seconds = 0.0
+        self.compute_seconds = 0.0
+        self.last_rtf = None
+        self._stats_lock = threading.Lock()
+
+    def load(self):
+        rss_before = rss_bytes()
+        start = time.time()
+        self._load()
+        self.load_seconds = round(time.time() - start, 2)
+        self.memory_bytes = max(0, rss_bytes() - rss_before)
+        print(f"Loaded {self.name} model {self.model_name} on {self.device} in {self.load_seconds}s "
+              f"(+{self.memory_bytes / 1024 ** 2:.0f} MiB RSS)")
+        return self
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _record(self, audio_seconds, compute_seconds):
+        with self._stats_lock:
+            self.audio_seconds += audio_seconds
+            self.compute_seconds += compute_seconds
+            if audio_seconds > 0:
+                self.last_rtf = round(compute_seconds / audio_seconds, 3)
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.audio_seconds = 0.0
+            self.compute_seconds = 0.0
+            self.last_rtf = None
+
+    def stats(self):
+        with self._stats_lock:
+            rtf = self.compute_seconds / self.audio_seconds if self.audio_seconds else None
+            return {
+                'backend': self.name,
+                'model': self.model_name,
+                'device': self.device,
+                'load_seconds': self.load_seconds,
+                'memory_mb': round(self.memory_bytes / 1024 ** 2, 1) if self.memory_bytes is not None else None,
+                'audio_seconds': round(self.audio_seconds, 1),
+                'rtf': round(rtf, 3) if rtf is not None else None,
+                'last_rtf': self.last_rtf,
+            }
+
+    def transcribe(self, audio, task="transcribe", language=None, word_timestamps=False, initial_prompt=None,
+                   **options):
+        """Whisper-style {'text', 'language', 'segments'} for a path or 16 kHz float32 array."""
+        raise NotImplementedError
+
+    def detect_language(self, audio):
+        raise NotImplementedError
+
+    def transcribe_and_translate(self, audio, language=None, progress=None):
+        """{'language', 'duration', 'transcribe': {...}, 'translate': {...}} as in services.whisper_decode."""
+        raise NotImplementedError
+
+
+class WhisperBackend(ASRBackend):
+    name = "whisper"
+
+    def __init__(self, model_name, device="cpu", threads=None, beam_size=5, best_of=5, interop_threads=None,
+                 quantize=False):
+        super().__init__(model_name, device, threads)
+        self.fp16 = device == "cuda"
+        self.interop_threads = interop_threads
+        self.quantize = quantize and device == "cpu"
+        self.beam_size = beam_size
+        self.best_of = best_of
+        self.model = None
+        # Optional services.batching.WhisperBatcher shared by concurrent jobs
+        self.batcher = None
+        # Serializes forward passes: whisper installs its key/value cache
+        # hooks on the shared attention modules for each decode, so two
+        # decodes on one model must never overlap. The batcher holds it too.
+        self.model_lock = threading.Lock()
+
+    def _load(self):
+        import torch
+        import whisper
+
+        if self.interop_threads:
+            try:
+                torch.set_num_interop_threads(self.interop_threads)
+            except RuntimeError as e:
+                # Only possible before the first parallel operation in the process
+                print(f"Could not set inter-op threads: {e}")
+        self._apply_threads()
+        self.model = whisper.load_model(self.model_name, device=self.device)
+        if self.quantize:
+            self.model = quantize_whisper(self.model)
+
+    # Applied by the thread about to run inference. Batched windows run on
+    # the batcher thread, which applies the same budget (services.batching).
+    def _apply_threads(self):
+        if self.threads:
+            import torch
+
+            if torch.get_num_threads() != self.threads:
+                torch.set_num_threads(self.threads)
+
+    def stats(self):
+        return dict(super().stats(), quantized=self.quantize, threads=self.threads,
+                    interop_threads=self.interop_threads)
+
+    def transcribe(self, audio, task="transcribe", language=None, word_timestamps=False, initial_prompt=None,
+                   **options):
+        from services.whisper_decode import load_audio
+
+        import torch
+
+        audio = load_audio(audio)
+        self._apply_threads()
+        start = time.time()
+        options.setdefault('fp16', self.fp16)
+        with self.model_lock, torch.inference_mode():
+            result = self.model.transcribe(audio, task=task, language=language, word_timestamps=word_timestamps,
+                                           initial_prompt=initial_prompt, **options)
+        self._record(len(audio) / SAMPLE_RATE, time.time() - start)
+        return result
+
+    def detect_language(self, audio):
+        from services.whisper_decode import detect_audio_language, load_audio
+
+        audio = load_audio(audio)
+        self._apply_threads()
+        with self.model_lock:
+            return detect_audio_language(self.model, audio, fp16=self.fp16)
+
+    def transcribe_and_translate(self, audio, language=None, progress=None):
+        from services.whisper_decode import load_audio, transcribe_and_translate
+
+        audio = load_audio(audio)
+        self._apply_threads()
+        start = time.time()
+        result = transcribe_and_translate(self.model, audio, fp16=self.fp16, beam_size=self.beam_size,
+                                          best_of=self.best_of, language=language, progress=progress,
+                                          batcher=self.batcher, lock=self.model_lock)
+        self._record(len(audio) / SAMPLE_RATE, time.time() - start)
+        return result
+
+
+class FasterWhisperBackend(ASRBackend):
+    name = "faster-whisper"
+
+    def __init__(self, model_name, device="cpu", threads=None, compute_type=None, beam_size=5, workers=1):
+        super().__init__(model_name, device, threads)
+        self.compute_type = compute_type or ("float16" if device == "cuda" else "int8")
+        self.beam_size = beam_size
+        # CTranslate2 can run this many transcriptions in parallel on one model
+        self.workers = workers
+        self.model = None
+
+    def _load(self):
+        from faster_whisper import WhisperModel
+
+        self.model = WhisperModel(self.model_name, device=self.device, compute_type=self.compute_type,
+                                  cpu_threads=self.threads or 0, num_workers=self.workers)
+
+    def stats(self):
+        return dict(super().stats(), compute_type=self.compute_type)
+
+    def _audio(self, audio):
+        if isinstance(audio, str):
+            from faster_whisper import decode_audio
+
+            return decode_audio(audio, sampling_rate=SAMPLE_RATE)
+        return audio
+
+    def _segments(self, audio, task, language, progress=None, progress_base=0, progress_total=None, **options):
+        segments, info = self.model.transcribe(
+            audio,
+            task=task,
+            language=language,
+            beam_size=options.pop('beam_size', self.beam_size),
+            **options
+        )
+        collected = []
+        for segment in segments:
+            collected.append(segment)
+            if progress and progress_total:
+                progress(progress_base + int(segment.end), progress_total)
+        return collected, info
+
+    def transcribe(self, audio, task="transcribe", language=None, word_timestamps=False, initial_prompt=None,
+                   **options):
+        audio = self._audio(audio)
+        options.pop('fp16', None)
+        options.pop('best_of', None)
+        start = time.time()
+        segments, info = self._segments(audio, task, language, word_timestamps=word_timestamps,
+                                        initial_prompt=initial_prompt, **options)
+        self._record(len(audio) / SAMPLE_RATE, time.time() - start)
+        return {
+            'text': "".join(s.text for s in segments).strip(),
+            'language': info.language,
+            'segments': [{
+                'start': s.start,
+                'end': s.end,
+                'text': s.text,
+                'avg_logprob': s.avg_logprob,
+                'no_speech_prob': s.no_speech_prob,
+                'words': [{'start': w.start, 'end': w.end, 'word': w.word, 'probability': w.probability}
+                          for w in (s.words or [])],
+            } for s in segments],
+        }
+
+    def detect_language(self, audio):
+        # Language detection runs eagerly; the segment generator is never consumed
+        _, info = self.model.transcribe(self._audio(audio)[:30 * SAMPLE_RATE], beam_size=1)
+        return info.language
+
+    def transcribe_and_translate(self, audio, language=None, progress=None):
+        audio = self._audio(audio)
+        duration = len(audio) / SAMPLE_RATE
+        start = time.time()
+
+        def collect(segments):
+            items = [{
+                'start': round(s.start, 2),
+                'end': round(s.end, 2),
+                'text': s.text.strip(),
+                'avg_logprob': s.avg_logprob,
+                'no_speech_prob': s.no_speech_prob,
+            } for s in segments if s.text.strip()]
+            return {'text': " ".join(s['text'] for s in items).strip(), 'segments': items}
+
+        # Progress is counted in seconds of audio over both passes
+        total = int(duration) * 2 or 1
+        with span('whisper_pass', task='transcribe'):
+            transcript, info = self._segments(audio, "transcribe", language, progress, 0, total)
+        language = info.language
+        # English audio needs no second pass
+        if language == "en":
+            translation = transcript
+        else:
+            with span('whisper_pass', task='translate'):
+                translation, _ = self._segments(audio, "translate", language, progress, int(duration), total)
+        if progress:
+            progress(total, total)
+        self._record(duration, time.time() - start)
+        return {
+            'language': language,
+            'duration': duration,
+            'transcribe': collect(transcript),
+            'translate': collect(translation),
+        }
+
+
+def load_backend(name=None, model_name=None, device=None, threads=None, interop_threads=None, quantize=None):
+    """Create and load the backend chosen by ASR_BACKEND / ASR_MODEL / WHISPER_CPU_PROFILE unless given explicitly."""
+    name = (name or os.getenv('ASR_BACKEND', 'whisper')).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown ASR backend '{name}' (expected one of {', '.join(BACKENDS)})")
+    device = device or ("cuda" if gpu_available() else "cpu")
+    model_name = model_name or os.getenv('ASR_MODEL') or default_model_name(name, device == "cuda")
+    if name == 'faster-whisper':
+        backend = FasterWhisperBackend(model_name, device, threads,
+                                       compute_type=os.getenv('ASR_COMPUTE_TYPE'),
+                                       workers=int(os.getenv('ASR_CT2_WORKERS', '1')))
+    else:
+        if quantize is None:
+            quantize = os.getenv('WHISPER_CPU_PROFILE', 'fp32').lower() == 'int8'
+        backend = WhisperBackend(model_name, device, threads, interop_threads=interop_threads, quantize=quantize)
+    return backend.load()
@@ -0,0 +1,141 @@
+"""
+Cross-request dynamic batching for a shared Whisper model.
+
+Jobs submit 30 s mel windows instead of calling the model directly. A
+single scheduler thread collects windows from every in-flight job until
+the batch is full or the oldest window has waited long enough, runs the
+encoder once over the whole batch and the decoder per task and language,
+then hands each result back to the job that asked for it. Jobs submit
+up to `lookahead` speculative windows ahead of the one they wait for
+(services.whisper_decode), so even a single long job fills batches;
+speculative windows a job no longer needs are cancelled and skipped if
+they have not run yet. Every batch
+runs under the model's lock, which direct callers of the same model
+(live streaming, language detection) take as well.
+"""
+
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+import torch
+
+from services.tracing import current_trace, serving
+from services.whisper_decode import decode_features, detect_language, encode
+
+
+class _WindowRequest:
+    def __init__(self, mel, language, tasks):
+        self.mel = mel
+        self.language = language
+        self.tasks = tasks
+        self.future = Future()
+        self.enqueued_at = time.time()
+        # The job's trace, whose profiler samples the batcher while it runs this window
+        self.trace = current_trace()
+
+
+class WhisperBatcher:
+    def __init__(self, model, max_batch_size=8, max_wait=0.05, fp16=False, beam_size=5, best_of=5, lock=None,
+                 threads=None, lookahead=1):
+        self.model = model
+        # Shared with WhisperBackend.model_lock
+        self.model_lock = lock or threading.Lock()
+        # Intra-op thread budget of the scheduler thread, which runs every
+        # batch; None keeps torch's default
+        self.threads = threads
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.fp16 = fp16
+        self.beam_size = beam_size
+        self.best_of = best_of
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        # Windows per job and task submitted beyond the one it waits for
+        self.lookahead = max(0, lookahead)
+        self.batches_run = 0
+        self.windows_run = 0
+        self.windows_cancelled = 0
+        self.speculative_hits = 0
+        self.speculative_misses = 0
+
+    def count_speculation(self, hit):
+        with self._lock:
+            if hit:
+                self.speculative_hits += 1
+            else:
+                self.speculative_misses += 1
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="whisper-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, mel, language=None, tasks=("transcribe", "translate")):
+        """Queue one (n_mels, 3000) window; the future resolves to (language, {task: DecodingResult})."""
+        self._ensure_started()
+        request = _WindowRequest(mel, language, tuple(tasks))
+        self._queue.put(request)
+        return request.future
+
+    # Block for the first window, then keep collecting until the batch is
+    # full or the first window's deadline passes.
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            # Speculative windows their job has dropped in the meantime
+            running = [request for request in batch if request.future.set_running_or_notify_cancel()]
+            self.windows_cancelled += len(batch) - len(running)
+            batch = running
+            if not batch:
+                continue
+            if self.threads and torch.get_num_threads() != self.threads:
+                torch.set_num_threads(self.threads)
+            try:
+                with self.model_lock, serving(request.trace for request in batch):
+                    self._run(batch)
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _run(self, batch):
+        mel = torch.stack([request.mel for request in batch])
+        features = encode(self.model, mel, self.fp16)
+        self.batches_run += 1
+        self.windows_run += len(batch)
+
+        languages = []
+        for i, request in enumerate(batch):
+            languages.append(request.language or detect_language(self.model, features[i:i + 1]))
+
+        # Decoder options are per batch, so group windows by task and language
+        results = [dict() for _ in batch]
+        groups = {}
+        for i, request in enumerate(batch):
+            for task in request.tasks:
+                groups.setdefault((task, languages[i]), []).append(i)
+        for (task, language), indices in groups.items():
+            decoded = decode_features(self.model, features[indices], task, language,
+                                      self.fp16, self.beam_size, self.best_of)
+            for i, result in zip(indices, decoded):
+                results[i][task] = result
+
+        for i, request in enumerate(batch):
+            request.future.set_result((languages[i], results[i]))
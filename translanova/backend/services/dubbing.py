@@ -0,0 +1,143 @@
+"""
+Segment-aligned dubbing.
+
+Instead of stretching one long TTS track to the length of the video, each
+Whisper segment is translated and synthesized on its own, in parallel,
+sped up where needed to fit its slot on the original timeline, and all
+clips are placed with a single ffmpeg filter graph.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import tempfile
+
+import ffmpeg
+
+from services.tracing import bind, span
+
+# Speech is only ever sped up to fit, never slowed down, and by at most
+# this factor; anything longer overlaps into the following gap.
+MAX_TEMPO = 2.0
+# ffmpeg inputs mixed by one amix; larger jobs are mixed in groups
+MAX_MIX_INPUTS = 200
+
+
+def _duration(path):
+    with span('ffprobe'):
+        return float(ffmpeg.probe(path)["format"]["duration"])
+
+
+# Each segment may use the time up to the next segment's start
+def _slots(segments, total_duration):
+    slots = []
+    for i, segment in enumerate(segments):
+        end = segments[i + 1]['start'] if i + 1 < len(segments) else total_duration
+        slots.append((segment['start'], max(end, segment['end']) - segment['start']))
+    return slots
+
+
+def _atempo_chain(stream, tempo):
+    # A single atempo filter is limited to 0.5-2.0 in older ffmpeg builds
+    while tempo > 2.0:
+        stream = stream.filter('atempo', 2.0)
+        tempo /= 2.0
+    if abs(tempo - 1.0) > 0.01:
+        stream = stream.filter('atempo', round(tempo, 4))
+    return stream
+
+
+def _mix(placed, total_duration, output_path):
+    streams = []
+    for clip_path, start, tempo in placed:
+        delay = int(round(start * 1000))
+        stream = _atempo_chain(ffmpeg.input(clip_path).audio, tempo)
+        stream = stream.filter('aresample', 24000).filter('adelay', f"{delay}", all=1)
+        streams.append(stream)
+    mixed = streams[0] if len(streams) == 1 else ffmpeg.filter(
+        streams, 'amix', inputs=len(streams), normalize=0, dropout_transition=0
+    )
+    mixed = mixed.filter('apad', whole_dur=total_duration).filter('atrim', end=total_duration)
+    with span('ffmpeg', op='mix', inputs=len(placed)):
+        ffmpeg.output(mixed, output_path).overwrite_output().run(quiet=True)
+    return output_path
+
+
+def assemble(placed, total_duration, output_path):
+    """Mix (clip_path, start_seconds, tempo) tuples into one track of `total_duration` seconds."""
+    if len(placed) <= MAX_MIX_INPUTS:
+        return _mix(placed, total_duration, output_path)
+    # Too many inputs for one graph: mix groups into full-length tracks first
+    partials = []
+    try:
+        for i in range(0, len(placed), MAX_MIX_INPUTS):
+            partial = tempfile.NamedTemporaryFile(delete=False, suffix=".wav").name
+            partials.append(_mix(placed[i:i + MAX_MIX_INPUTS], total_duration, partial))
+        return _mix([(p, 0.0, 1.0) for p in partials], total_duration, output_path)
+    finally:
+        for p in partials:
+            if os.path.exists(p):
+                os.remove(p)
+
+
+def dub_segments(segments, target_lang, translate_texts, synthesize, total_duration, workers=4, retries=2,
+                 progress=None):
+    """
+    Build a dubbed track for `segments` (dicts with start, end and text).
+
+    `translate_texts(list) -> list` translates the segment texts and
+    `synthesize(text, lang) -> path` renders one clip. Returns the track
+    path, the translated texts and the indices of segments that failed.
+    """
+    texts = translate_texts([s['text'] for s in segments])
+    slots = _slots(segments, total_duration)
+
+    def render(index):
+        error = None
+        for _ in range(retries + 1):
+            try:
+                clip = synthesize(texts[index], target_lang)
+                return index, clip, _duration(clip)
+            except Exception as e:
+                error = e
+        print(f" Dubbing segment {index} failed: {error}")
+        return index, None, 0.0
+
+    clips = {}
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(bind(render), i) for i, text in enumerate(texts) if text and text.strip()]
+        for done, future in enumerate(as_completed(futures), start=1):
+            index, clip, duration = future.result()
+            if clip is None:
+                failed.append(index)
+            else:
+                clips[index] = (clip, duration)
+            if progress:
+                progress(done, len(futures))
+
+    placed = []
+    for index in sorted(clips):
+        clip, duration = clips[index]
+        start, slot = slots[index]
+        tempo = min(MAX_TEMPO, duration / slot) if slot > 0 and duration > slot else 1.0
+        placed.append((clip, start, tempo))
+
+    output_path = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3").name
+    try:
+        if placed:
+            assemble(placed, total_duration, output_path)
+        else:
+            # Nothing could be voiced: keep the timeline with silence
+            with span('ffmpeg', op='silence'):
+                (
+                    ffmpeg
+                    .input('anullsrc=r=24000:cl=mono', f='lavfi', t=max(total_duration, 0.1))
+                    .output(output_path)
+                    .overwrite_output()
+                    .run(quiet=True)
+                )
+    finally:
+        for clip, _ in clips.values():
+            if os.path.exists(clip):
+                os.remove(clip)
+    return output_path, texts, sorted(failed)
@@ -0,0 +1,331 @@
+"""
+In-process job queue for long-running translation work.
+
+Jobs are executed by a fixed pool of worker threads. The queue has a
+depth limit so a burst of uploads is rejected early instead of piling up
+unbounded work behind the model.
+
+Every job keeps a short event log (status, stage and progress changes)
+that streaming clients wait on with `wait_events` instead of polling.
+
+When several server processes share a port, a job lives in the process
+that accepted its upload. With a `state_dir`, every job also writes JSON
+snapshots there, and the other processes serve status and events from
+those snapshots.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+
+class QueueFullError(Exception):
+    pass
+
+
+# Progress ticks are written to the snapshot at most this often
+SNAPSHOT_INTERVAL = 0.5
+
+
+class Job:
+    def __init__(self, func, args, kwargs, meta=None, state_path=None):
+        self.id = str(uuid.uuid4())
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.meta = meta or {}
+        self.status = JOB_QUEUED
+        self.stage = None
+        self.stages = []
+        self.progress = None
+        self.result = None
+        self.error = None
+        self.traceback = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self.events = []
+        self._seq = 0
+        self.state_path = state_path
+        self._saved_at = 0.0
+
+    # Append an event and wake up waiting streams; the lock must be held.
+    # Progress updates replace a trailing progress event of the same stage,
+    # so the log grows with the number of stages, not with progress ticks.
+    def _emit(self, kind, data):
+        self._seq += 1
+        if kind == 'progress' and self.events and self.events[-1]['event'] == 'progress' \
+                and self.events[-1]['data'].get('stage') == data.get('stage'):
+            self.events.pop()
+        self.events.append({'id': self._seq, 'event': kind, 'data': data})
+        self._changed.notify_all()
+        if self.state_path and (kind != 'progress' or time.time() - self._saved_at >= SNAPSHOT_INTERVAL):
+            self._save()
+
+    # Write the snapshot atomically; the lock must be held
+    def _save(self):
+        data = self._to_dict()
+        data['events'] = self.events
+        data['pid'] = os.getpid()
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, default=str)
+            os.replace(tmp_path, self.state_path)
+            self._saved_at = time.time()
+        except OSError as e:
+            print(f"Job snapshot error: {e}")
+
+    def wait_events(self, after=0, timeout=15.0):
+        """Events with an id above `after`, waiting up to `timeout` seconds for one to arrive."""
+        with self._changed:
+            self._changed.wait_for(lambda: self._seq > after or self.finished_at is not None, timeout)
+            return [e for e in self.events if e['id'] > after]
+
+    @property
+    def done(self):
+        return self.finished_at is not None
+
+    def _start(self):
+        with self._lock:
+            self.status = JOB_RUNNING
+            self.started_at = time.time()
+            self._emit('status', {'status': JOB_RUNNING})
+
+    # Mark the start of a pipeline stage; closes the previous one
+    def set_stage(self, name):
+        now = time.time()
+        with self._lock:
+            self._close_stage(now)
+            self.stage = name
+            self.progress = None
+            self.stages.append({'name': name, 'status': JOB_RUNNING, 'started_at': now, 'duration': None})
+            self._emit('stage', {'stage': name, 'stages': [dict(s) for s in self.stages]})
+
+    # In-stage progress, e.g. 90 of 300 seconds transcribed
+    def set_progress(self, done, total=None):
+        with self._lock:
+            self.progress = {'done': done, 'total': total}
+            self._emit('progress', {'stage': self.stage, 'done': done, 'total': total})
+
+    def _close_stage(self, now):
+        if self.stages and self.stages[-1]['status'] == JOB_RUNNING:
+            current = self.stages[-1]
+            current['status'] = 'done'
+            current['duration'] = round(now - current['started_at'], 2)
+
+    def _finish(self, status, result=None, error=None, tb=None):
+        now = time.time()
+        with self._lock:
+            self._close_stage(now)
+            self.status = status
+            self.result = result
+            self.error = error
+            self.traceback = tb
+            self.stage = None
+            self.progress = None
+            self.finished_at = now
+            # Drop references to the inputs so finished jobs stay small
+            self.args = ()
+            self.kwargs = {}
+            if status == JOB_COMPLETED:
+                self._emit('completed', {'status': status, 'result': result})
+            else:
+                self._emit('failed', {'status': status, 'error': error})
+
+    def to_dict(self):
+        with self._lock:
+            return self._to_dict()
+
+    def _to_dict(self):
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'stages': [dict(s) for s in self.stages],
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        data.update(self.meta)
+        if self.status == JOB_COMPLETED:
+            data['result'] = self.result
+        elif self.status == JOB_FAILED:
+            data['error'] = self.error
+            data['traceback'] = self.traceback
+        return data
+
+
+class JobSnapshot:
+    """Read-only view of a job run by another server process, backed by its state file."""
+
+    def __init__(self, path, poll_interval=0.25):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._data = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @property
+    def id(self):
+        return self._data['job_id']
+
+    @property
+    def done(self):
+        return self._data.get('finished_at') is not None
+
+    def to_dict(self):
+        data = dict(self._data)
+        data.pop('events', None)
+        data.pop('pid', None)
+        return data
+
+    def wait_events(self, after=0, timeout=15.0):
+        deadline = time.time() + timeout
+        while True:
+            events = [e for e in self._data.get('events', []) if e['id'] > after]
+            if events or self.done or time.time() >= deadline:
+                return events
+            time.sleep(self.poll_interval)
+            # Keep the last good snapshot if the file went away with its owner
+            self._data = self._load() or self._data
+
+
+def fail_orphaned_jobs(state_dir, pid, error="Server worker exited before the job finished"):
+    """Mark unfinished jobs owned by the dead process `pid` as failed in their state files."""
+    count = 0
+    for name in os.listdir(state_dir):
+        if not name.endswith('.json'):
+            continue
+        snapshot = JobSnapshot(os.path.join(state_dir, name))
+        data = snapshot._data
+        if data is None or data.get('pid') != pid or snapshot.done:
+            continue
+        data.update(status=JOB_FAILED, error=error, stage=None, progress=None, finished_at=time.time())
+        last_id = data['events'][-1]['id'] if data.get('events') else 0
+        data.setdefault('events', []).append(
+            {'id': last_id + 1, 'event': 'failed', 'data': {'status': JOB_FAILED, 'error': error}})
+        tmp_path = f"{snapshot.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp_path, snapshot.path)
+        count += 1
+    return count
+
+
+class JobQueue:
+    def __init__(self, workers=2, max_depth=16, history_limit=500, state_dir=None):
+        self.workers = max(1, workers)
+        self.max_depth = max(1, max_depth)
+        self.history_limit = history_limit
+        # Shared with the other server processes, see JobSnapshot
+        self.state_dir = state_dir
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        self._queue = queue.Queue(maxsize=self.max_depth)
+        self._jobs = {}
+        self._finished = []
+        self._lock = threading.Lock()
+        self._threads = []
+        self._running = 0
+        self.completed_count = 0
+
+    # Worker threads are started on first use so that a process can fork
+    # before any threads exist.
+    def _ensure_started(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, func, *args, meta=None, **kwargs):
+        self._ensure_started()
+        job = Job(func, args, kwargs, meta)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            raise QueueFullError(f"Job queue is full ({self.max_depth} pending)")
+        if self.state_dir:
+            with job._lock:
+                job.state_path = self._state_path(job.id)
+                job._save()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.state_dir:
+            try:
+                path = self._state_path(job_id)
+            except ValueError:
+                return None
+            snapshot = JobSnapshot(path)
+            if snapshot._data is not None:
+                return snapshot
+        return job
+
+    # Job ids come from URLs; only uuid strings map to a state file
+    def _state_path(self, job_id):
+        return os.path.join(self.state_dir, f"{uuid.UUID(job_id)}.json")
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def in_flight(self):
+        with self._lock:
+            return self._running
+
+    def _worker_loop(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._running += 1
+            job._start()
+            try:
+                result = job.func(job, *job.args, **job.kwargs)
+                job._finish(JOB_COMPLETED, result=result)
+            except Exception as e:
+                job._finish(JOB_FAILED, error=str(e), tb=traceback.format_exc())
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.completed_count += 1
+                self._remember(job)
+                self._queue.task_done()
+
+    # Keep a bounded history of finished jobs for status polling
+    def _remember(self, job):
+        with self._lock:
+            self._finished.append(job.id)
+            while len(self._finished) > self.history_limit:
+                old_id = self._finished.pop(0)
+                self._jobs.pop(old_id, None)
+                if self.state_dir:
+                    try:
+                        os.remove(self._state_path(old_id))
+                    except OSError:
+                        pass
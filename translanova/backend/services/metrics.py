@@ -0,0 +1,277 @@
+"""
+Minimal metrics registry rendered in the Prometheus text format.
+
+Counters, gauges and histograms carry label values. Callback metrics
+read a value (or {labels: value}) when rendered, which is how existing
+counters such as ResultCache hits or TranslationEngine failures are
+exposed without the services knowing about metrics.
+
+With several server processes (serve.py) every process writes its
+values to `state_dir` and render() merges them: counters and histograms
+are summed, gauges keep one series per process under a `pid` label.
+When a process exits, its last counters and histograms are added to a
+retired total, so the sums never go backwards.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+
+# Summed counters and histograms of server processes that have exited
+RETIRED_FILE = "metrics_retired.json"
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _merge(merged, snapshot, pid=None):
+    """Add a snapshot into `merged`, {name: metric with samples as {label values tuple: value}}."""
+    for name, metric in snapshot.items():
+        entry = merged.setdefault(name, dict(metric, samples={}))
+        for key, value in metric['samples']:
+            key = tuple(key)
+            if metric['kind'] == 'gauge':
+                if pid is not None:
+                    key += (str(pid),)
+                entry['samples'][key] = value
+            elif metric['kind'] == 'histogram':
+                total = entry['samples'].setdefault(
+                    key, {'buckets': [0] * len(metric['buckets']), 'sum': 0.0, 'count': 0})
+                total['buckets'] = [a + b for a, b in zip(total['buckets'], value['buckets'])]
+                total['sum'] += value['sum']
+                total['count'] += value['count']
+            else:
+                entry['samples'][key] = entry['samples'].get(key, 0) + value
+    return merged
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # callback() -> value, or {label values tuple: value} for labeled metrics
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """{label values tuple: value} at this moment."""
+        if self.callback is not None:
+            value = self.callback()
+            return dict(value) if isinstance(value, dict) else {(): value}
+        with self._lock:
+            return dict(self._values)
+
+
+class CounterMetric(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class GaugeMetric(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class HistogramMetric(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def samples(self):
+        with self._lock:
+            return {key: {'buckets': list(s['buckets']), 'sum': s['sum'], 'count': s['count']}
+                    for key, s in self._values.items()}
+
+
+class Registry:
+    def __init__(self, prefix="", state_dir=None):
+        self.prefix = prefix
+        self.state_dir = state_dir
+        self._metrics = []
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=(), callback=None):
+        return self._add(CounterMetric(self.prefix + name, documentation, labelnames, callback))
+
+    def gauge(self, name, documentation, labelnames=(), callback=None):
+        return self._add(GaugeMetric(self.prefix + name, documentation, labelnames, callback))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(HistogramMetric(self.prefix + name, documentation, labelnames, buckets))
+
+    def _collect(self):
+        collected = {}
+        for metric in self._metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                print(f"Metric {metric.name} failed: {e}")
+                continue
+            collected[metric.name] = {
+                'kind': metric.kind,
+                'help': metric.documentation,
+                'labelnames': list(metric.labelnames),
+                'buckets': list(getattr(metric, 'buckets', ())),
+                'samples': [[list(key), value] for key, value in samples.items()],
+            }
+        return collected
+
+    def _path(self, pid):
+        return os.path.join(self.state_dir, f"metrics_{pid}.json")
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, snapshot):
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Metrics snapshot error: {e}")
+
+    def write_snapshot(self):
+        """Publish this process's values for the other server processes."""
+        if self.state_dir:
+            self._write(self._path(os.getpid()), self._collect())
+
+    # Keep the snapshot fresh for scrapes answered by other processes
+    def publish_every(self, interval=15.0):
+        def loop():
+            while True:
+                self.write_snapshot()
+                time.sleep(interval)
+
+        threading.Thread(target=loop, name="metrics-publisher", daemon=True).start()
+
+    # Called by the serve.py master once a worker has exited. Gauges of
+    # the dead process are dropped; its counters and histograms move to
+    # the retired total before the snapshot is deleted.
+    def retire_snapshot(self, pid):
+        if not self.state_dir:
+            return
+        path = self._path(pid)
+        snapshot = self._read(path)
+        if snapshot:
+            retired_path = os.path.join(self.state_dir, RETIRED_FILE)
+            merged = _merge({}, self._read(retired_path) or {})
+            _merge(merged, {name: metric for name, metric in snapshot.items() if metric['kind'] != 'gauge'})
+            self._write(retired_path, {
+                name: dict(metric, samples=[[list(key), value] for key, value in metric['samples'].items()])
+                for name, metric in merged.items()
+            })
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _snapshots(self):
+        own = self._collect()
+        if not self.state_dir:
+            return [(None, own)]
+        self.write_snapshot()
+        snapshots = [(os.getpid(), own)]
+        for name in os.listdir(self.state_dir):
+            if not (name.startswith('metrics_') and name.endswith('.json')):
+                continue
+            if name == RETIRED_FILE:
+                pid = None
+            else:
+                try:
+                    pid = int(name[len('metrics_'):-len('.json')])
+                except ValueError:
+                    continue
+                if pid == os.getpid():
+                    continue
+            snapshot = self._read(os.path.join(self.state_dir, name))
+            if snapshot is not None:
+                snapshots.append((pid, snapshot))
+        return snapshots
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        merged = {}
+        for pid, snapshot in self._snapshots():
+            _merge(merged, snapshot, pid)
+        multi = self.state_dir is not None
+
+        lines = []
+        for name, metric in merged.items():
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['kind']}")
+            names = metric['labelnames']
+            for key, value in sorted(metric['samples'].items()):
+                if metric['kind'] == 'gauge':
+                    label_names = names + (['pid'] if multi else [])
+                    lines.append(f"{name}{_labels(label_names, key)} {_number(value)}")
+                elif metric['kind'] == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(metric['buckets'], value['buckets']):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(names, key, {'le': _number(bound)})} {cumulative}")
+                    lines.append(f"{name}_bucket{_labels(names, key, {'le': '+Inf'})} {value['count']}")
+                    lines.append(f"{name}_sum{_labels(names, key)} {_number(value['sum'])}")
+                    lines.append(f"{name}_count{_labels(names, key)} {value['count']}")
+                else:
+                    lines.append(f"{name}{_labels(names, key)} {_number(value)}")
+        return "\n".join(lines) + "\n"
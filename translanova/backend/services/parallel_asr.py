@@ -0,0 +1,171 @@
+"""
+Parallel transcription of long audio.
+
+The cleaned 16 kHz audio is split on silences found by a simple energy
+based voice-activity detector. The detector only picks cut points: every
+sample is transcribed, and Whisper's own no-speech probability decides
+what is silence. Chunks are transcribed concurrently in a
+process pool where every worker loads its own Whisper model once, and the
+segments are stitched back together in order with absolute timestamps.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+import threading
+import time
+
+import numpy as np
+
+from services.tracing import current_span
+
+SAMPLE_RATE = 16000
+
+# Populated in each pool worker by _init_worker
+_worker_backend = None
+
+
+# Frame-level speech mask from short-time energy. The threshold adapts to
+# the noise floor of the recording but never drops below `threshold_db`.
+# Compressed (dynaudnorm) speech may have no quiet frames at all; then the
+# quietest frames are not a noise floor and the absolute threshold is used.
+def speech_frames(audio, frame_seconds=0.03, threshold_db=-45.0):
+    frame = int(SAMPLE_RATE * frame_seconds)
+    count = len(audio) // frame
+    if count == 0:
+        return np.zeros(0, dtype=bool), frame
+    frames = audio[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1) + 1e-12)
+    db = 20 * np.log10(rms)
+    floor = np.percentile(db, 10)
+    threshold = threshold_db if floor > threshold_db else max(threshold_db, floor + 10.0)
+    return db > threshold, frame
+
+
+# Sample positions in the middle of every silence run of at least `min_silence` seconds
+def silence_cut_points(mask, frame, min_silence=0.5):
+    min_frames = max(1, int(min_silence * SAMPLE_RATE / frame))
+    cuts = []
+    run_start = None
+    for i, is_speech in enumerate(mask):
+        if not is_speech:
+            if run_start is None:
+                run_start = i
+        elif run_start is not None:
+            if i - run_start >= min_frames:
+                cuts.append(((run_start + i) // 2) * frame)
+            run_start = None
+    return cuts
+
+
+def split_on_silence(audio, target_seconds=120, min_silence=0.5):
+    """Split `audio` into (start, end) sample ranges of about `target_seconds`, cutting on silences.
+
+    The ranges always cover the whole audio; without silences to cut on,
+    chunks end at the target length.
+    """
+    mask, frame = speech_frames(audio)
+    cuts = silence_cut_points(mask, frame, min_silence)
+    target = int(target_seconds * SAMPLE_RATE)
+    total = len(audio)
+
+    chunks = []
+    start = 0
+    while total - start > target:
+        limit = start + target
+        before = [c for c in cuts if start + target // 2 < c <= limit]
+        after = [c for c in cuts if limit < c <= start + target + target // 2]
+        if before:
+            end = before[-1]
+        elif after:
+            end = after[0]
+        else:
+            end = limit
+        chunks.append((start, end))
+        start = end
+    chunks.append((start, total))
+    return chunks
+
+
+def _init_worker(backend, model_name, threads):
+    global _worker_backend
+    from services.asr_backends import load_backend
+
+    _worker_backend = load_backend(backend, model_name, device="cpu", threads=threads)
+
+
+def _transcribe_chunk(index, offset, audio, language):
+    result = _worker_backend.transcribe_and_translate(audio, language=language)
+    for task in ('transcribe', 'translate'):
+        for segment in result[task]['segments']:
+            segment['start'] = round(segment['start'] + offset, 2)
+            segment['end'] = round(segment['end'] + offset, 2)
+    return index, result
+
+
+class ParallelTranscriber:
+    def __init__(self, model_name, processes, chunk_seconds=120, backend='whisper'):
+        self.model_name = model_name
+        self.processes = max(1, processes)
+        self.backend = backend
+        self.chunk_seconds = chunk_seconds
+        self._pool = None
+        self._lock = threading.Lock()
+
+    # The pool is created on first use; workers stay alive between jobs
+    # so each one loads the model only once.
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                threads = max(1, (os.cpu_count() or 1) // self.processes)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.backend, self.model_name, threads)
+                )
+            return self._pool
+
+    def transcribe_and_translate(self, audio, chunks=None, language=None, progress=None):
+        """Same result shape as whisper_decode.transcribe_and_translate, computed chunk-parallel."""
+        if not chunks:
+            chunks = split_on_silence(audio, self.chunk_seconds) or [(0, len(audio))]
+        pool = self._get_pool()
+        parent = current_span()
+        futures = []
+        for index, (start, end) in enumerate(chunks):
+            future = pool.submit(_transcribe_chunk, index, start / SAMPLE_RATE, audio[start:end], language)
+            # Chunks run in worker processes; span from submission to result
+            future.add_done_callback(lambda _, index=index, start=start, end=end, submitted=time.perf_counter():
+                                     parent.record('asr_chunk', submitted, time.perf_counter(), thread='asr-process',
+                                                   index=index, offset=round(start / SAMPLE_RATE, 2),
+                                                   seconds=round((end - start) / SAMPLE_RATE, 2)))
+            futures.append(future)
+
+        results = [None] * len(futures)
+        done = 0
+        for future in as_completed(futures):
+            index, result = future.result()
+            results[index] = result
+            done += 1
+            if progress:
+                progress(done, len(futures))
+
+        merged = {'language': language, 'duration': len(audio) / SAMPLE_RATE}
+        for task in ('transcribe', 'translate'):
+            segments = []
+            for result in results:
+                segments.extend(result[task]['segments'])
+            merged[task] = {
+                'text': " ".join(s['text'] for s in segments).strip(),
+                'segments': segments,
+            }
+        if merged['language'] is None and results:
+            merged['language'] = results[0]['language']
+        return merged
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
@@ -0,0 +1,136 @@
+"""
+Translation quality estimates in time linear in the text length.
+
+- confidence: Whisper's own certainty, exp(avg_logprob) discounted by
+  no_speech_prob, averaged over segments weighted by their duration
+- length ratio: target/source character ratio per aligned segment,
+  compared with the ratio typical for the target language
+- round-trip similarity: the translation is translated back to English
+  and compared with the Whisper English text by character n-gram F-score
+  (chrF). It needs translator calls, so RoundTripScorer runs it in the
+  background and reports the score when it is done.
+
+All scores are percentages (0-100).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+import math
+
+from services.translation_memory import split_sentences
+
+# Approximate characters of translation per character of English. Scripts
+# that pack a word into one or two characters come out much shorter.
+EXPECTED_LENGTH_RATIO = {
+    'zh-cn': 0.3, 'zh-tw': 0.3, 'zh': 0.3, 'ja': 0.45, 'ko': 0.5,
+}
+DEFAULT_LENGTH_RATIO = 1.1
+
+# Segments whose length is off by more than this factor count as outliers
+OUTLIER_FACTOR = 2.0
+
+
+def confidence(segments):
+    """Duration-weighted recognition confidence of Whisper segments, or None without segments."""
+    total = 0.0
+    weight = 0.0
+    for segment in segments:
+        if segment.get('avg_logprob') is None:
+            continue
+        duration = max(segment.get('end', 0) - segment.get('start', 0), 0.01)
+        p = math.exp(min(segment['avg_logprob'], 0.0)) * (1.0 - segment.get('no_speech_prob', 0.0))
+        total += p * duration
+        weight += duration
+    return round(100 * total / weight, 2) if weight else None
+
+
+def length_ratio(sources, targets, target_lang):
+    """Score how plausible the target lengths are for aligned source/target texts."""
+    expected = EXPECTED_LENGTH_RATIO.get(target_lang.lower(), DEFAULT_LENGTH_RATIO)
+    score = 0.0
+    weight = 0
+    ratios = []
+    outliers = 0
+    for source, target in zip(sources, targets):
+        source_len = len(source.strip())
+        if not source_len:
+            continue
+        ratio = len((target or "").strip()) / source_len
+        ratios.append(ratio)
+        relative = ratio / expected
+        segment_score = min(relative, 1 / relative) if relative > 0 else 0.0
+        if segment_score < 1 / OUTLIER_FACTOR:
+            outliers += 1
+        score += segment_score * source_len
+        weight += source_len
+    if not weight:
+        return {'score': None, 'mean_ratio': None, 'outliers': 0}
+    return {
+        'score': round(100 * score / weight, 2),
+        'mean_ratio': round(sum(ratios) / len(ratios), 3),
+        'outliers': outliers,
+    }
+
+
+def align_sentences(source, target):
+    """Pair the sentences of two texts when they split the same way, else compare the texts whole."""
+    sources = split_sentences(source)
+    targets = split_sentences(target)
+    if len(sources) == len(targets):
+        return sources, targets
+    return [source], [target]
+
+
+def _ngrams(text, n):
+    return Counter(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+def chrf(hypothesis, reference, max_n=6, beta=2.0):
+    """Character n-gram F-score (chrF, whitespace ignored) of `hypothesis` against `reference`."""
+    hypothesis = "".join(hypothesis.lower().split())
+    reference = "".join(reference.lower().split())
+    if not hypothesis or not reference:
+        return 0.0
+    precisions = []
+    recalls = []
+    for n in range(1, max_n + 1):
+        hyp = _ngrams(hypothesis, n)
+        ref = _ngrams(reference, n)
+        if not hyp or not ref:
+            break
+        matches = sum((hyp & ref).values())
+        precisions.append(matches / sum(hyp.values()))
+        recalls.append(matches / sum(ref.values()))
+    precision = sum(precisions) / len(precisions)
+    recall = sum(recalls) / len(recalls)
+    if precision + recall == 0:
+        return 0.0
+    beta2 = beta * beta
+    return round(100 * (1 + beta2) * precision * recall / (beta2 * precision + recall), 2)
+
+
+def overall(scores):
+    values = [s for s in scores if s is not None]
+    return round(sum(values) / len(values), 2) if values else None
+
+
+class RoundTripScorer:
+    """Translate text back to English off the request path and report its chrF against the reference."""
+
+    def __init__(self, translate_back, workers=1):
+        # translate_back(list of sentences) -> list of English sentences
+        self.translate_back = translate_back
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="round-trip")
+
+    def submit(self, sentences, reference, on_score):
+        """Call `on_score(score)` once the round trip of `sentences` has been compared with `reference`."""
+        if not sentences or not reference:
+            return None
+        return self._pool.submit(self._run, sentences, reference, on_score)
+
+    def _run(self, sentences, reference, on_score):
+        try:
+            back = self.translate_back(sentences)
+            on_score(chrf(" ".join(back), reference))
+        except Exception as e:
+            print(f" Round-trip scoring error: {e}")
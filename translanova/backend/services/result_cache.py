@@ -0,0 +1,156 @@
+"""
+Result cache for completed translations.
+
+Entries are keyed by the content hash of the uploaded media together with the
+target language, the Whisper model name, the translator, the TTS engines
+and the voice. The metadata index lives in MongoDB. The cache keeps its
+own hard link (or copy) of each output in translated_files/cache/ and
+every translation record it serves gets a link of its own in
+translated_files/, so evicting an entry never removes a file that the
+history still points to.
+
+The byte budget counts the outputs only the cache keeps alive (one link
+left). An output a translation record also links to frees no disk when
+evicted, so it is neither counted nor evicted; those files are bounded
+by the history, not by the cache.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+from datetime import datetime
+
+import pymongo
+
+
+# `variant` distinguishes pipeline options that change the output
+def cache_key(content_hash, target_lang, model_name, translator, tts, voice, variant=None):
+    raw = f"{content_hash}:{target_lang}:{model_name}:{translator}:{tts}:{voice}"
+    if variant:
+        raw += f":{variant}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+# A hard link costs no extra disk; copy where links are not supported
+def _link(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class ResultCache:
+    def __init__(self, collection, files_dir="translated_files", max_bytes=2 * 1024 ** 3):
+        self.collection = collection
+        self.files_dir = files_dir
+        self.cache_dir = os.path.join(files_dir, "cache")
+        self.max_bytes = max_bytes
+        self._evict_lock = threading.Lock()
+
+    # Blocks until MongoDB answers, so servers call it off the startup path
+    def ensure_indexes(self):
+        if self.collection is None:
+            return
+        try:
+            self.collection.create_index([('last_access', pymongo.ASCENDING)])
+        except Exception as e:
+            print(f"Result cache index error: {e}")
+
+    # Entries written before the cache kept its own files shared the file of
+    # a translation record; they have no path here and are dropped on access
+    def _cached_path(self, doc):
+        name = doc.get('cache_filename')
+        return os.path.join(self.cache_dir, name) if name else None
+
+    def get(self, key, output_filename):
+        """Return the cached result and link its output to `output_filename` in files_dir, or None."""
+        if self.collection is None:
+            return None
+        try:
+            doc = self.collection.find_one_and_update(
+                {'_id': key},
+                {'$set': {'last_access': datetime.utcnow()}, '$inc': {'hits': 1}}
+            )
+        except Exception as e:
+            print(f"Result cache read error: {e}")
+            return None
+        if not doc:
+            return None
+        # The output may have been removed by hand; treat that as a miss
+        cached_path = self._cached_path(doc)
+        if cached_path is None or not os.path.exists(cached_path):
+            self._delete(doc)
+            return None
+        try:
+            _link(cached_path, os.path.join(self.files_dir, output_filename))
+        except OSError as e:
+            print(f"Result cache read error: {e}")
+            return None
+        return doc['result']
+
+    def put(self, key, result, output_filename):
+        if self.collection is None:
+            return
+        cache_filename = key + os.path.splitext(output_filename)[1]
+        cached_path = os.path.join(self.cache_dir, cache_filename)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if os.path.exists(cached_path):
+                os.remove(cached_path)
+            _link(os.path.join(self.files_dir, output_filename), cached_path)
+            size = os.path.getsize(cached_path)
+            now = datetime.utcnow()
+            self.collection.update_one(
+                {'_id': key},
+                {'$set': {
+                    'result': result,
+                    'cache_filename': cache_filename,
+                    'size': size,
+                    'last_access': now,
+                    'created_at': now,
+                }, '$setOnInsert': {'hits': 0}},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Result cache write error: {e}")
+            return
+        self.evict()
+
+    # Drop least recently used entries (and their files) until the outputs
+    # only the cache links to fit into max_bytes again
+    def evict(self):
+        if self.collection is None:
+            return
+        with self._evict_lock:
+            try:
+                exclusive = []
+                for doc in self.collection.find({}, {'cache_filename': 1}).sort('last_access', pymongo.ASCENDING):
+                    path = self._cached_path(doc)
+                    try:
+                        stat = os.stat(path) if path else None
+                    except OSError:
+                        stat = None
+                    if stat is None:
+                        # Nothing to serve it from
+                        self._delete(doc)
+                    elif stat.st_nlink == 1:
+                        exclusive.append((doc, stat.st_size))
+                total = sum(size for _, size in exclusive)
+                for doc, size in exclusive:
+                    if total <= self.max_bytes:
+                        break
+                    self._delete(doc)
+                    total -= size
+            except Exception as e:
+                print(f"Result cache eviction error: {e}")
+
+    # Removes the cache's own file only; records keep their links
+    def _delete(self, doc):
+        path = self._cached_path(doc)
+        try:
+            if path and os.path.exists(path):
+                os.remove(path)
+            self.collection.delete_one({'_id': doc['_id']})
+        except Exception as e:
+            print(f"Result cache delete error: {e}")
@@ -0,0 +1,220 @@
+"""
+Live transcription of a microphone stream.
+
+Audio arrives in small chunks. Every `step` seconds Whisper re-reads the
+uncommitted tail of the stream (at most `window` seconds), and the words
+that two consecutive hypotheses agree on are committed (LocalAgreement-2).
+Committed words never change; the rest is reported as a tentative tail
+that later passes may still revise. The window start moves past committed
+words, so each pass decodes a bounded amount of audio however long the
+stream runs.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import re
+import threading
+
+import ffmpeg
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+_SENTENCE_END = re.compile(r'(?<=[.!?।。])\s+')
+
+
+def pcm16_to_float(data):
+    return np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+# Linear resampling is enough for speech recognition input
+def resample(audio, rate):
+    if rate == SAMPLE_RATE or len(audio) == 0:
+        return audio
+    count = int(round(len(audio) * SAMPLE_RATE / rate))
+    positions = np.linspace(0, len(audio) - 1, count)
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def words_text(words):
+    return "".join(word for _, _, word in words).strip()
+
+
+def _norm(word):
+    return re.sub(r'[^\w]', '', word.lower())
+
+
+class LocalAgreement:
+    """Commit the prefix of (start, end, word) tuples shared by two consecutive hypotheses."""
+
+    def __init__(self):
+        self.committed = []
+        self.previous = []
+        self.last_end = 0.0
+
+    def insert(self, words):
+        """Feed a hypothesis with stream-absolute timestamps; returns the newly committed words."""
+        words = [w for w in words if w[0] > self.last_end - 0.1]
+        # The window usually still holds the last committed words; drop them
+        for n in range(min(5, len(self.committed), len(words)), 0, -1):
+            if [_norm(w[2]) for w in self.committed[-n:]] == [_norm(w[2]) for w in words[:n]]:
+                words = words[n:]
+                break
+        agreed = []
+        for new, old in zip(words, self.previous):
+            if _norm(new[2]) != _norm(old[2]):
+                break
+            agreed.append(new)
+        self.previous = words[len(agreed):]
+        if agreed:
+            self.committed.extend(agreed)
+            self.last_end = agreed[-1][1]
+        return agreed
+
+    def flush(self):
+        rest = self.previous
+        self.previous = []
+        if rest:
+            self.committed.extend(rest)
+            self.last_end = rest[-1][1]
+        return rest
+
+
+class StreamingTranscriber:
+    def __init__(self, transcribe_words, language=None, step=1.0, window=12.0):
+        # transcribe_words(audio, language, prompt) -> (language, [(start, end, word)])
+        self.transcribe_words = transcribe_words
+        self.language = language
+        self.step = step
+        self.window = window
+        self.buffer = np.zeros(0, dtype=np.float32)
+        # Stream time of buffer[0]
+        self.offset = 0.0
+        self.pending = 0
+        self.agreement = LocalAgreement()
+        self._lock = threading.Lock()
+
+    def feed(self, audio):
+        with self._lock:
+            self.buffer = np.concatenate([self.buffer, audio])
+            self.pending += len(audio)
+
+    def ready(self):
+        with self._lock:
+            return self.pending >= self.step * SAMPLE_RATE
+
+    def process(self):
+        """Decode the current window; returns (newly committed words, tentative words)."""
+        with self._lock:
+            audio = self.buffer
+            offset = self.offset
+            self.pending = 0
+        if len(audio) < 0.5 * SAMPLE_RATE:
+            return [], self.agreement.previous
+        # Committed text steers the decoder across window boundaries
+        prompt = words_text(self.agreement.committed[-40:]) or None
+        language, words = self.transcribe_words(audio, self.language, prompt)
+        if self.language is None and words:
+            self.language = language
+        committed = self.agreement.insert([(s + offset, e + offset, w) for s, e, w in words])
+        self._trim()
+        return committed, self.agreement.previous
+
+    def finish(self):
+        """Decode what is left and commit everything; returns the remaining words."""
+        committed, _ = self.process()
+        return committed + self.agreement.flush()
+
+    # Drop audio before the last committed word once the window is full;
+    # without any recent commit, keep only the newest `window` seconds
+    def _trim(self):
+        with self._lock:
+            length = len(self.buffer) / SAMPLE_RATE
+            if length <= self.window:
+                return
+            cut = self.agreement.last_end - self.offset
+            if cut <= 0:
+                cut = length - self.window
+            samples = int(min(cut, length) * SAMPLE_RATE)
+            self.buffer = self.buffer[samples:]
+            self.offset += samples / SAMPLE_RATE
+
+
+class IncrementalTranslator:
+    """Translate committed text sentence by sentence, in order, off the recognition path."""
+
+    def __init__(self, translate, on_translation, max_words=25):
+        self.translate = translate
+        self.on_translation = on_translation
+        self.max_words = max_words
+        self.pending = ""
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream-translate")
+
+    def add(self, text):
+        parts = _SENTENCE_END.split(f"{self.pending} {text}".strip())
+        complete, self.pending = parts[:-1], parts[-1]
+        if self.pending.endswith(('.', '!', '?', '।', '。')):
+            complete.append(self.pending)
+            self.pending = ""
+        # Long runs without punctuation are translated anyway so text keeps flowing
+        elif len(self.pending.split()) >= self.max_words:
+            complete.append(self.pending)
+            self.pending = ""
+        if complete:
+            self._pool.submit(self._run, " ".join(complete))
+
+    def _run(self, text):
+        try:
+            self.on_translation(text, self.translate(text))
+        except Exception as e:
+            print(f" Live translation error: {e}")
+
+    def close(self):
+        if self.pending:
+            self._pool.submit(self._run, self.pending)
+            self.pending = ""
+        self._pool.shutdown(wait=True)
+
+
+class FfmpegDecoder:
+    """Decode compressed audio (Opus in WebM or Ogg) to 16 kHz mono floats through an ffmpeg pipe."""
+
+    def __init__(self, on_audio):
+        self.on_audio = on_audio
+        self.process = (
+            ffmpeg
+            # Small probe so the first samples come out right away
+            .input('pipe:0', probesize=32768, analyzeduration=0, fflags='nobuffer')
+            .output('pipe:1', format='s16le', acodec='pcm_s16le', ac=1, ar=SAMPLE_RATE, flush_packets=1)
+            .global_args('-loglevel', 'error')
+            .run_async(pipe_stdin=True, pipe_stdout=True)
+        )
+        self._reader = threading.Thread(target=self._read, name="stream-decoder", daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        leftover = b''
+        fd = self.process.stdout.fileno()
+        while True:
+            data = os.read(fd, 8192)
+            if not data:
+                break
+            data = leftover + data
+            usable = len(data) - len(data) % 2
+            leftover = data[usable:]
+            if usable:
+                self.on_audio(pcm16_to_float(data[:usable]))
+
+    def write(self, data):
+        self.process.stdin.write(data)
+        self.process.stdin.flush()
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self._reader.join(timeout=10)
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
@@ -0,0 +1,307 @@
+"""
+Per-job trace spans and an opt-in sampling profiler.
+
+A job runs inside `start_trace`, which makes its root span current.
+`span(name, **attrs)` opens a child of whatever span is current, so
+stages, Whisper windows, translation chunks and ffmpeg calls nest under
+the job without passing anything around. Outside a trace span() costs
+one context variable lookup and records nothing.
+
+The current span lives in a context variable. Thread pools do not carry
+context variables into their workers, so work submitted on behalf of a
+job is wrapped with `bind(fn)` first. Work that runs elsewhere (the
+Whisper batcher thread, ASR worker processes) is recorded after the
+fact with `Span.record(name, start, end)`.
+
+Traces export as a flat span list (`Trace.to_dict`), which `to_chrome`
+converts to the Chrome trace event format that chrome://tracing and
+Perfetto open.
+`SamplingProfiler` samples the stacks of the threads working on one
+trace and writes them as folded stacks, the input of flamegraph.pl and
+speedscope. A shared thread doing work for several traces (the Whisper
+batcher) joins them with `serving(traces)` and is sampled in each.
+Other processes (ASR chunk workers) are not sampled.
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+import contextvars
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+_current = contextvars.ContextVar('trace_span', default=None)
+
+# Traces of jobs still running in this process, by job id
+_active = {}
+_active_lock = threading.Lock()
+
+
+class Span:
+    def __init__(self, trace, name, parent_id, attrs, start=None, end=None, thread=None):
+        self.trace = trace
+        self.id = next(trace._ids)
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = dict(attrs)
+        self.start = time.perf_counter() if start is None else start
+        self.end = end
+        self.thread = thread or threading.current_thread().name
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def record(self, name, start, end, thread=None, **attrs):
+        """Add a finished child span timed elsewhere; `start` and `end` are time.perf_counter() values."""
+        self.trace._add(Span(self.trace, name, self.id, attrs, start, end, thread))
+
+    def to_dict(self, origin):
+        return {
+            'id': self.id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': round(self.start - origin, 6),
+            'duration': round(self.end - self.start, 6) if self.end is not None else None,
+            'thread': self.thread,
+            'attrs': self.attrs,
+            'error': self.error,
+        }
+
+
+class _NoopSpan:
+    def set(self, **attrs):
+        pass
+
+    def record(self, name, start, end, thread=None, **attrs):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    def __init__(self, trace_id, name, attrs=None):
+        self.id = trace_id
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.origin = time.perf_counter()
+        self.spans = []
+        # Threads currently working inside this trace, for the profiler
+        self._threads = Counter()
+        self._thread_names = {}
+        self.root = self._add(Span(self, name, None, attrs or {}))
+
+    def _add(self, span):
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def _enter_thread(self):
+        thread = threading.current_thread()
+        with self._lock:
+            self._threads[thread.ident] += 1
+            self._thread_names[thread.ident] = thread.name
+
+    def _exit_thread(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] -= 1
+            if self._threads[ident] <= 0:
+                del self._threads[ident]
+
+    def threads(self):
+        """{thread ident: name} of the threads working on this trace right now."""
+        with self._lock:
+            return {ident: self._thread_names[ident] for ident in self._threads}
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        return {
+            'trace_id': self.id,
+            'started_at': self.started_at,
+            'duration': self.root.to_dict(self.origin)['duration'],
+            'spans': [s.to_dict(self.origin) for s in spans],
+        }
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f, default=str)
+        os.replace(tmp_path, path)
+
+
+def to_chrome(trace):
+    """Convert a Trace.to_dict() result to the Chrome trace event format."""
+    spans = trace['spans']
+    # Spans still open are drawn up to the latest time the trace has seen
+    latest = max((s['start'] + (s['duration'] or 0) for s in spans), default=0)
+    tids = {}
+    events = []
+    for s in spans:
+        tid = tids.setdefault(s['thread'], len(tids) + 1)
+        duration = s['duration'] if s['duration'] is not None else latest - s['start']
+        events.append({
+            'name': s['name'], 'ph': 'X', 'pid': 1, 'tid': tid,
+            'ts': round(s['start'] * 1e6), 'dur': round(duration * 1e6),
+            'args': dict(s['attrs'], error=s['error']) if s['error'] else s['attrs'],
+        })
+    events += [{'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': name}}
+               for name, tid in tids.items()]
+    return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'trace_id': trace['trace_id']}}
+
+
+def current_span():
+    return _current.get() or NOOP_SPAN
+
+
+def current_trace():
+    parent = _current.get()
+    return parent.trace if parent is not None else None
+
+
+@contextmanager
+def serving(traces):
+    """Count the calling thread as working on each of `traces` (None entries are skipped) for the block."""
+    traces = {trace for trace in traces if trace is not None}
+    for trace in traces:
+        trace._enter_thread()
+    try:
+        yield
+    finally:
+        for trace in traces:
+            trace._exit_thread()
+
+
+def active_trace(trace_id):
+    with _active_lock:
+        return _active.get(trace_id)
+
+
+@contextmanager
+def start_trace(trace_id, name, **attrs):
+    """Run the block under a new trace whose root span is `name`; yields the Trace."""
+    trace = Trace(trace_id, name, attrs)
+    token = _current.set(trace.root)
+    trace._enter_thread()
+    with _active_lock:
+        _active[trace_id] = trace
+    try:
+        yield trace
+    except BaseException as e:
+        trace.root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        trace.root.end = time.perf_counter()
+        trace._exit_thread()
+        _current.reset(token)
+        with _active_lock:
+            _active.pop(trace_id, None)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time the block as a child of the current span; yields the span (a no-op outside a trace)."""
+    parent = _current.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    trace = parent.trace
+    child = trace._add(Span(trace, name, parent.id, attrs))
+    token = _current.set(child)
+    trace._enter_thread()
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.end = time.perf_counter()
+        trace._exit_thread()
+        _current.reset(token)
+
+
+def bind(fn):
+    """Wrap `fn` so that it runs under the caller's current span, e.g. before pool.submit."""
+    parent = _current.get()
+    if parent is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _current.set(parent)
+        parent.trace._enter_thread()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            parent.trace._exit_thread()
+            _current.reset(token)
+
+    return run
+
+
+def prune(directory, keep):
+    """Delete all but the `keep` newest files in `directory`."""
+    try:
+        entries = sorted(os.scandir(directory), key=lambda e: e.stat().st_mtime, reverse=True)
+    except OSError:
+        return
+    for entry in entries[keep:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+class SamplingProfiler:
+    """Sample the Python stacks of a trace's threads every `interval` seconds from a background thread."""
+
+    def __init__(self, trace, interval=0.01):
+        self.trace = trace
+        self.interval = interval
+        self.samples = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            threads = self.trace.threads()
+            frames = sys._current_frames()
+            for ident, name in threads.items():
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    # Pool threads are grouped by pool: translate_0, translate_1 -> translate
+                    stack.append(re.sub(r'_\d+$', '', name))
+                    self.samples[";".join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def folded(self):
+        """Folded stacks, one 'thread;outer;...;inner count' line per distinct stack."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            f.write(self.folded())
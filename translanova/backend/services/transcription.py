@@ -1,7 +1,19 @@
-import whisper
+import threading
 
-model = whisper.load_model("large-v2")
+_model = None
+_lock = threading.Lock()
+
+
+# The model is loaded on first use rather than at import
+def get_model():
+    global _model
+    with _lock:
+        if _model is None:
+            import whisper
+
+            _model = whisper.load_model("large-v2")
+        return _model
 
 def transcribe_audio(file_path):
-    result = model.transcribe(file_path)
-    return result["text"]
\ No newline at end of file
+    result = get_model().transcribe(file_path)
+    return result["text"]
@@ -0,0 +1,184 @@
+"""
+Concurrent, sentence-aware translation engine.
+
+Whole sentences are packed into requests up to the backend's size limit
+(one sentence per line). A sentence longer than the limit, such as an
+unpunctuated Whisper monologue, is split at word boundaries first and its
+pieces are joined again after translation. The requests are sent concurrently from a bounded
+thread pool with retries and exponential backoff, and the translated
+sentences are put back in their original order.
+
+Backends are pluggable: GoogleBackend talks to Google Translate through
+deep_translator, StubBackend answers locally after a simulated delay for
+tests and benchmarks.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import random
+import threading
+import time
+
+from services.tracing import bind, current_span, span
+
+
+class TranslatorBackend:
+    name = "base"
+    # Maximum characters per request
+    max_chars = 5000
+
+    def translate(self, text, source, target):
+        raise NotImplementedError
+
+
+class GoogleBackend(TranslatorBackend):
+    name = "google"
+    max_chars = 4500
+
+    def translate(self, text, source, target):
+        from deep_translator import GoogleTranslator
+
+        # GoogleTranslator keeps per-request state, so use one per call
+        return GoogleTranslator(source=source, target=target).translate(text)
+
+
+class StubBackend(TranslatorBackend):
+    name = "stub"
+
+    def __init__(self, latency=0.2, jitter=0.05, max_chars=5000, failure_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.max_chars = max_chars
+        self.failure_rate = failure_rate
+
+    def translate(self, text, source, target):
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise RuntimeError("Simulated translator failure")
+        return "\n".join(f"[{target}] {line}" for line in text.split("\n"))
+
+
+def make_backend(name=None):
+    name = (name or os.getenv('TRANSLATOR_BACKEND', 'google')).lower()
+    if name == "stub":
+        return StubBackend(latency=float(os.getenv('STUB_TRANSLATOR_LATENCY', '0.2')))
+    return GoogleBackend()
+
+
+class TranslationEngine:
+    def __init__(self, backend, max_workers=4, retries=3, backoff=0.5):
+        self.backend = backend
+        self.max_workers = max(1, max_workers)
+        self.retries = retries
+        self.backoff = backoff
+        self._pool = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="translate")
+            return self._pool
+
+    # Pieces of at most max_chars, cut at word boundaries (inside a word only
+    # when the word alone is too long)
+    def split_long(self, sentence):
+        limit = self.backend.max_chars
+        if len(sentence) <= limit:
+            return [sentence]
+        pieces = []
+        current = ""
+        for word in sentence.split():
+            while len(word) > limit:
+                if current:
+                    pieces.append(current)
+                    current = ""
+                pieces.append(word[:limit])
+                word = word[limit:]
+            if current and len(current) + 1 + len(word) > limit:
+                pieces.append(current)
+                current = word
+            else:
+                current = f"{current} {word}" if current else word
+        if current:
+            pieces.append(current)
+        return pieces
+
+    # Pack sentences greedily into groups that fit one request
+    def pack(self, sentences):
+        groups = []
+        current = []
+        size = 0
+        for sentence in sentences:
+            extra = len(sentence) + (1 if current else 0)
+            if current and size + extra > self.backend.max_chars:
+                groups.append(current)
+                current = []
+                size = 0
+                extra = len(sentence)
+            current.append(sentence)
+            size += extra
+        if current:
+            groups.append(current)
+        return groups
+
+    def _call(self, text, source, target):
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            try:
+                with self._lock:
+                    self.requests += 1
+                return self.backend.translate(text, source, target) or ""
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                current_span().set(retries=attempt + 1)
+                if attempt == self.retries:
+                    raise
+                print(f"Translation request failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay + random.uniform(0, delay / 2))
+                delay *= 2
+
+    def _translate_group(self, group, source, target):
+        with span('translation_chunk', sentences=len(group), chars=sum(len(s) for s in group), target=target):
+            return self._translate_group_texts(group, source, target)
+
+    def _translate_group_texts(self, group, source, target):
+        try:
+            parts = self._call("\n".join(group), source, target).split("\n")
+            if len(parts) == len(group):
+                return [p.strip() for p in parts]
+            # The line structure was lost; translate sentence by sentence
+            return [self._call(s, source, target).strip() for s in group]
+        except Exception as e:
+            print(f"Translation error: {e}")
+            # Keep the source text for sentences that could not be translated
+            return list(group)
+
+    def translate_sentences(self, sentences, source, target, progress=None):
+        """Translate `sentences` concurrently and return the translations in the same order."""
+        # (sentence index, piece) for every piece of every sentence
+        pieces = [(index, piece) for index, sentence in enumerate(sentences) for piece in self.split_long(sentence)]
+        groups = self.pack([piece for _, piece in pieces])
+        if not groups:
+            return []
+        pool = self._get_pool()
+        futures = [
+            pool.submit(bind(self._translate_group), group, source, target)
+            for group in groups
+        ]
+
+        translated = []
+        for done, future in enumerate(futures, start=1):
+            translated.extend(future.result())
+            if progress:
+                progress(done, len(futures))
+
+        if len(pieces) == len(sentences):
+            return translated
+        joined = [[] for _ in sentences]
+        for (index, _), text in zip(pieces, translated):
+            joined[index].append(text)
+        return [" ".join(parts) for parts in joined]
@@ -0,0 +1,80 @@
+"""
+Per-user translation history across the audio and video collections.
+
+Both collections carry a compound (user_id, timestamp desc, _id desc)
+index. One aggregation reads the newest entries of each collection
+through that index, merges them with $unionWith (MongoDB 4.4+) and
+returns a single page. Pages continue from an opaque (timestamp, _id)
+cursor instead of an offset, so every page costs the same however long
+the history grows.
+"""
+
+from datetime import datetime
+
+import pymongo
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Fields the history UI shows; paths and internal ids stay in the database
+HISTORY_FIELDS = ('original_filename', 'translated_filename', 'media_type', 'target_language',
+                  'translation_time', 'accuracy', 'timestamp', 'status', 'cached')
+
+HISTORY_INDEX = [('user_id', pymongo.ASCENDING), ('timestamp', pymongo.DESCENDING), ('_id', pymongo.DESCENDING)]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(doc):
+    return f"{doc['timestamp'].isoformat()}_{doc['_id']}"
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, oid = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(timestamp), ObjectId(oid)
+    except (ValueError, InvalidId):
+        raise InvalidCursor(f"Invalid cursor '{cursor}'")
+
+
+class TranslationHistory:
+    def __init__(self, audio_collection, video_collection):
+        self.collections = [c for c in (audio_collection, video_collection) if c is not None]
+
+    # Blocks until MongoDB answers, so servers call it off the startup path
+    def ensure_indexes(self):
+        for collection in self.collections:
+            try:
+                collection.create_index(HISTORY_INDEX, name='user_history')
+            except Exception as e:
+                print(f"History index error on {collection.name}: {e}")
+
+    def page(self, user_id, limit=50, after=None):
+        """Return (entries, next cursor or None), newest first."""
+        if not self.collections:
+            return [], None
+        match = {'user_id': user_id}
+        if after:
+            timestamp, oid = decode_cursor(after)
+            match['$or'] = [{'timestamp': {'$lt': timestamp}}, {'timestamp': timestamp, '_id': {'$lt': oid}}]
+        # One extra entry tells whether another page follows
+        branch = [
+            {'$match': match},
+            {'$sort': {'timestamp': -1, '_id': -1}},
+            {'$limit': limit + 1},
+            {'$project': {field: 1 for field in HISTORY_FIELDS}},
+        ]
+        pipeline = list(branch)
+        for other in self.collections[1:]:
+            pipeline.append({'$unionWith': {'coll': other.name, 'pipeline': branch}})
+        pipeline += [{'$sort': {'timestamp': -1, '_id': -1}}, {'$limit': limit + 1}]
+
+        docs = list(self.collections[0].aggregate(pipeline))
+        next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+        entries = []
+        for doc in docs[:limit]:
+            doc['_id'] = str(doc['_id'])
+            doc['timestamp'] = doc['timestamp'].isoformat() if doc.get('timestamp') else None
+            entries.append(doc)
+        return entries, next_cursor
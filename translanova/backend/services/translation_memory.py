@@ -0,0 +1,150 @@
+"""
+Segment-level translation memory.
+
+Translations are remembered per sentence, keyed by the normalized source
+sentence and the language pair. An in-process LRU sits in front of a
+persistent store (MongoDB for the API server, SQLite for the command line
+tools); lookups are batched so only cache misses reach the translator.
+"""
+
+from collections import OrderedDict
+import hashlib
+import re
+import sqlite3
+import threading
+import unicodedata
+
+_SENTENCE_END = re.compile(r'(?<=[.!?।。])\s+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(sentence):
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFKC', sentence)).strip()
+
+
+def split_sentences(text):
+    return [s for s in (normalize(part) for part in _SENTENCE_END.split(text or '')) if s]
+
+
+def memory_key(sentence, source, target):
+    raw = f"{source}\x1f{target}\x1f{normalize(sentence)}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class MongoStore:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get_many(self, keys):
+        docs = self.collection.find({'_id': {'$in': list(keys)}}, {'translation': 1})
+        return {doc['_id']: doc['translation'] for doc in docs}
+
+    def put_many(self, entries):
+        from pymongo import UpdateOne
+
+        ops = [UpdateOne({'_id': key}, {'$set': {'translation': value}}, upsert=True)
+               for key, value in entries.items()]
+        if ops:
+            self.collection.bulk_write(ops, ordered=False)
+
+
+# Shared by several processes in batch mode (translate_file.py --workers):
+# WAL lets readers run alongside a writer, and writers wait up to `timeout`
+# seconds for the lock instead of failing with "database is locked"
+class SqliteStore:
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS memory (key TEXT PRIMARY KEY, translation TEXT)')
+        self._conn.commit()
+
+    def get_many(self, keys):
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            # Stay below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                marks = ','.join('?' * len(batch))
+                rows = self._conn.execute(f'SELECT key, translation FROM memory WHERE key IN ({marks})', batch)
+                found.update(rows.fetchall())
+        return found
+
+    def put_many(self, entries):
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO memory (key, translation) VALUES (?, ?)', entries.items())
+            self._conn.commit()
+
+
+class TranslationMemory:
+    def __init__(self, store=None, capacity=10000):
+        self.store = store
+        self.capacity = capacity
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key, value):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def lookup_many(self, sentences, source, target):
+        """Return {key: translation} for every sentence already in memory."""
+        keys = {memory_key(s, source, target) for s in sentences}
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+        missing = keys - found.keys()
+        if missing and self.store is not None:
+            try:
+                stored = self.store.get_many(missing)
+            except Exception as e:
+                print(f"Translation memory read error: {e}")
+                stored = {}
+            with self._lock:
+                for key, value in stored.items():
+                    self._remember(key, value)
+            found.update(stored)
+        return found
+
+    def store_many(self, pairs, source, target):
+        entries = {memory_key(s, source, target): t for s, t in pairs if t}
+        with self._lock:
+            for key, value in entries.items():
+                self._remember(key, value)
+        if entries and self.store is not None:
+            try:
+                self.store.put_many(entries)
+            except Exception as e:
+                print(f"Translation memory write error: {e}")
+
+    def translate(self, sentences, source, target, translate_batch):
+        """Translate `sentences` in order; `translate_batch(list)` is only called with the misses."""
+        found = self.lookup_many(sentences, source, target)
+        keys = [memory_key(s, source, target) for s in sentences]
+
+        misses = []
+        seen = set()
+        for sentence, key in zip(sentences, keys):
+            if key not in found and key not in seen:
+                seen.add(key)
+                misses.append(sentence)
+        with self._lock:
+            self.hits += len(sentences) - len(misses)
+            self.misses += len(misses)
+
+        if misses:
+            translated = translate_batch(misses)
+            # Only remember real translations, not pass-through fallbacks
+            self.store_many([(s, t) for s, t in zip(misses, translated) if t and t != s], source, target)
+            for sentence, value in zip(misses, translated):
+                found[memory_key(sentence, source, target)] = value
+        return [found.get(key, sentence) for sentence, key in zip(sentences, keys)]
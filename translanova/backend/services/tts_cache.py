@@ -0,0 +1,342 @@
+"""
+Phrase-level TTS with a content-addressed clip cache.
+
+Text is spoken sentence by sentence. Each rendered sentence is normalized
+to the same MP3 format (24 kHz mono) and stored under the hash of
+(text, language, voice, engine), so repeated phrases and re-runs of the
+same content are never synthesized twice. The clips of one request are
+joined with ffmpeg's concat demuxer without re-encoding. The cache lives
+on disk and is trimmed least recently used first to a byte budget; clips
+in use are pinned with file locks that other server processes respect.
+
+StubSynthesizer speaks a tone of about the length of the text after a
+simulated delay, for tests and benchmarks that must not depend on gTTS.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import ffmpeg
+from gtts import gTTS
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows, where the server runs as a single process
+    fcntl = None
+
+from services.tracing import bind, span
+from services.translation_memory import normalize, split_sentences
+
+SAMPLE_RATE = 24000
+BITRATE = '64k'
+
+
+def clip_key(text, lang, voice, engine):
+    raw = f"{engine}\x1f{voice}\x1f{lang}\x1f{normalize(text)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+# Re-encode any engine output to the common clip format, which is what
+# lets clips be concatenated with -c copy
+def normalize_clip(src, dst):
+    with span('ffmpeg', op='normalize_clip'):
+        (
+            ffmpeg
+            .input(src)
+            .output(dst, ar=SAMPLE_RATE, ac=1, acodec='libmp3lame', audio_bitrate=BITRATE, format='mp3')
+            .overwrite_output()
+            .run(quiet=True)
+        )
+    return dst
+
+
+# Pins are flocks on the clip files, so they hold across server processes
+# sharing the directory: a pin is a shared lock on the clip, and eviction
+# only removes clips it can lock exclusively without waiting.
+def _open_pinned(path):
+    """Open `path` with a shared lock, or return None if it is gone."""
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return None
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_SH)
+    try:
+        # Another process may have evicted it between the open and the lock
+        same = os.fstat(f.fileno()).st_ino == os.stat(path).st_ino
+    except OSError:
+        same = False
+    if not same:
+        f.close()
+        return None
+    return f
+
+
+class ClipCache:
+    def __init__(self, cache_dir, max_bytes=512 * 1024 ** 2):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (size, last access); clips in use by a request are pinned
+        self._index = {}
+        self._pinned = Counter()
+        # key -> open file holding the shared lock while the clip is pinned
+        self._pin_files = {}
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        for name in os.listdir(cache_dir):
+            if name.endswith('.mp3'):
+                stat = os.stat(os.path.join(cache_dir, name))
+                self._index[name[:-len('.mp3')]] = (stat.st_size, stat.st_mtime)
+        self.total = sum(size for size, _ in self._index.values())
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.mp3")
+
+    # Keep the lock on the file now under the clip's path
+    def _pin(self, key, f):
+        previous = self._pin_files.pop(key, None)
+        if previous is not None:
+            previous.close()
+        if f is not None:
+            self._pin_files[key] = f
+        self._pinned[key] += 1
+
+    def acquire(self, key):
+        """Pin and return the clip for `key`, or None on a miss."""
+        with self._lock:
+            entry = self._index.get(key)
+            f = None if key in self._pinned else _open_pinned(self.path(key))
+            if f is None and key not in self._pinned:
+                if entry is not None:
+                    self.total -= entry[0]
+                    del self._index[key]
+                self.misses += 1
+                return None
+            # Another server process sharing the directory may have added it
+            if entry is None:
+                size = os.fstat(f.fileno()).st_size
+                entry = (size, time.time())
+                self.total += size
+            self._index[key] = (entry[0], time.time())
+            if f is not None:
+                self._pin(key, f)
+            else:
+                self._pinned[key] += 1
+            self.hits += 1
+        return self.path(key)
+
+    def add(self, key, clip_path):
+        """Move a normalized clip into the cache and return it pinned."""
+        target = self.path(key)
+        # Locked before it is visible under its key; the lock moves with the file
+        f = _open_pinned(clip_path)
+        os.replace(clip_path, target)
+        size = os.path.getsize(target)
+        with self._lock:
+            previous = self._index.get(key)
+            self.total += size - (previous[0] if previous else 0)
+            self._index[key] = (size, time.time())
+            self._pin(key, f)
+        self.evict()
+        return target
+
+    def release(self, keys):
+        with self._lock:
+            for key in keys:
+                self._pinned[key] -= 1
+                if self._pinned[key] <= 0:
+                    del self._pinned[key]
+                    f = self._pin_files.pop(key, None)
+                    if f is not None:
+                        f.close()
+
+    # Drop least recently used clips until the cache fits max_bytes again,
+    # skipping the ones pinned here or in another process
+    def evict(self):
+        with self._lock:
+            if self.total <= self.max_bytes:
+                return
+            for key, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+                if self.total <= self.max_bytes:
+                    break
+                if key in self._pinned or not self._remove_unpinned(key):
+                    continue
+                del self._index[key]
+                self.total -= size
+
+    def _remove_unpinned(self, key):
+        path = self.path(key)
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            # Already gone
+            return True
+        with f:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return True
+
+
+class PhraseSynthesizer:
+    def __init__(self, cache, voice='com', workers=4):
+        self.cache = cache
+        # gTTS voices are picked through the Google domain (com, co.in, ...)
+        self.voice = voice
+        self.workers = max(1, workers)
+        self._engine = None
+        # pyttsx3 engines are not thread safe; one is shared under a lock
+        self._engine_lock = threading.Lock()
+        # Failed renders per engine
+        self.failures = Counter()
+        self._stats_lock = threading.Lock()
+
+    def _gtts(self, text, lang, path):
+        gTTS(text=text, lang=lang, tld=self.voice, slow=False).save(path)
+
+    def _pyttsx3(self, text, lang, path):
+        import pyttsx3
+
+        with self._engine_lock:
+            if self._engine is None:
+                self._engine = pyttsx3.init()
+            self._engine.save_to_file(text, path)
+            self._engine.runAndWait()
+
+    # Engines in order of preference; later ones are fallbacks
+    def engines(self):
+        return (('gtts', self._gtts), ('pyttsx3', self._pyttsx3))
+
+    def _render(self, sentence, lang):
+        """Return (key, cached clip path) for one sentence, synthesizing on a miss."""
+        with span('tts_phrase', chars=len(sentence), lang=lang) as phrase:
+            return self._render_phrase(sentence, lang, phrase)
+
+    def _render_phrase(self, sentence, lang, phrase):
+        last_error = None
+        for engine, render in self.engines():
+            key = clip_key(sentence, lang, self.voice, engine)
+            cached = self.cache.acquire(key)
+            if cached:
+                phrase.set(engine=engine, cached=True)
+                return key, cached
+            phrase.set(engine=engine, cached=False)
+            # Engines write different containers; ffmpeg probes the content
+            raw = tempfile.NamedTemporaryFile(delete=False, suffix=".tts").name
+            clip = tempfile.NamedTemporaryFile(delete=False, suffix=".part", dir=self.cache.cache_dir).name
+            try:
+                render(sentence, lang, raw)
+                normalize_clip(raw, clip)
+                return key, self.cache.add(key, clip)
+            except Exception as e:
+                last_error = e
+                with self._stats_lock:
+                    self.failures[engine] += 1
+                print(f" TTS ({engine}) failed for '{sentence[:40]}': {e}")
+            finally:
+                for path in (raw, clip):
+                    if os.path.exists(path):
+                        os.remove(path)
+        raise RuntimeError(f"No TTS engine could speak the sentence: {last_error}")
+
+    def synthesize(self, text, lang="hi", progress=None):
+        """Speak `text` and return the path of a new MP3 the caller owns; `progress(done, total)` counts sentences."""
+        sentences = split_sentences(text)
+        output_path = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3").name
+        if not sentences:
+            with span('ffmpeg', op='silence'):
+                (
+                    ffmpeg
+                    .input(f'anullsrc=r={SAMPLE_RATE}:cl=mono', f='lavfi', t=0.5)
+                    .output(output_path, acodec='libmp3lame', audio_bitrate=BITRATE)
+                    .overwrite_output()
+                    .run(quiet=True)
+                )
+            return output_path
+
+        if len(sentences) == 1:
+            try:
+                rendered = [self._render(sentences[0], lang)]
+            except Exception:
+                os.remove(output_path)
+                raise
+            if progress:
+                progress(1, 1)
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(sentences))) as pool:
+                futures = [pool.submit(bind(self._render), s, lang) for s in sentences]
+                rendered = []
+                errors = []
+                for done, future in enumerate(futures, start=1):
+                    try:
+                        rendered.append(future.result())
+                    except Exception as e:
+                        errors.append(e)
+                    if progress:
+                        progress(done, len(futures))
+                if errors:
+                    self.cache.release(key for key, _ in rendered)
+                    os.remove(output_path)
+                    raise errors[0]
+
+        list_path = tempfile.NamedTemporaryFile(delete=False, suffix=".txt", mode='w', encoding='utf-8')
+        try:
+            with list_path as f:
+                for _, clip in rendered:
+                    f.write(f"file '{os.path.abspath(clip)}'\n")
+            with span('ffmpeg', op='concat', clips=len(rendered)):
+                (
+                    ffmpeg
+                    .input(list_path.name, format='concat', safe=0)
+                    .output(output_path, c='copy')
+                    .overwrite_output()
+                    .run(quiet=True)
+                )
+        finally:
+            self.cache.release(key for key, _ in rendered)
+            os.remove(list_path.name)
+        return output_path
+
+
+class StubSynthesizer(PhraseSynthesizer):
+    def __init__(self, cache, voice='stub', workers=4, latency=0.3, jitter=0.05, seconds_per_word=0.35):
+        super().__init__(cache, voice=voice, workers=workers)
+        self.latency = latency
+        self.jitter = jitter
+        self.seconds_per_word = seconds_per_word
+
+    def engines(self):
+        return (('stub', self._stub),)
+
+    def _stub(self, text, lang, path):
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        duration = max(0.3, len(text.split()) * self.seconds_per_word)
+        (
+            ffmpeg
+            .input(f'sine=frequency=220:sample_rate={SAMPLE_RATE}', f='lavfi', t=duration)
+            .output(path, acodec='libmp3lame', audio_bitrate=BITRATE, format='mp3')
+            .overwrite_output()
+            .run(quiet=True)
+        )
+
+
+def make_synthesizer(cache, name=None, voice='com', workers=4):
+    name = (name or os.getenv('TTS_BACKEND', 'gtts')).lower()
+    if name == "stub":
+        return StubSynthesizer(cache, workers=workers, latency=float(os.getenv('STUB_TTS_LATENCY', '0.3')))
+    return PhraseSynthesizer(cache, voice=voice, workers=workers)
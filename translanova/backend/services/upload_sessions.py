@@ -0,0 +1,280 @@
+"""
+Chunked, resumable uploads.
+
+A client opens an upload session, PUTs chunks at increasing offsets and
+finalizes it. Chunks are streamed straight into a spool directory and
+hashed as they are written, so memory stays flat whatever the file size
+and an interrupted upload resumes from the last stored byte. As soon as
+the container header is in, it is probed in the background so files
+without an audio stream are rejected before the rest is transferred.
+
+The confirmed offset and the hash state are saved in the session metadata
+after every chunk. With several server processes (serve.py) each append
+holds an exclusive flock on the part file and continues from the saved
+state, so a chunk that lands on another process neither rehashes the file
+nor interleaves with a concurrent append.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+
+import ffmpeg
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows, where the server runs as a single process
+    fcntl = None
+
+from utils.file_helpers import ContentHasher
+
+CHUNK_SIZE = 1024 * 1024
+# Bytes needed before probing the partial file is worth trying
+PROBE_BYTES = 2 * 1024 * 1024
+
+
+class OffsetMismatch(Exception):
+    def __init__(self, expected):
+        super().__init__(f"Expected offset {expected}")
+        self.expected = expected
+
+
+class UploadSession:
+    def __init__(self, upload_id, filename, path, total_size=None, meta=None, offset=0, created_at=None):
+        self.id = upload_id
+        self.filename = filename
+        self.path = path
+        self.total_size = total_size
+        self.meta = meta or {}
+        self.offset = offset
+        self.created_at = created_at or time.time()
+        self.media = None
+        self.lock = threading.Lock()
+        # Hash of the first `offset` bytes; None when another process has
+        # appended since and the saved state must be loaded
+        self.hasher = ContentHasher() if offset == 0 else None
+        self._probing = False
+
+    def to_dict(self):
+        return {
+            'upload_id': self.id,
+            'filename': self.filename,
+            'offset': self.offset,
+            'size': self.total_size,
+            'media': self.media,
+        }
+
+
+# Media summary from ffprobe; cover art in audio files does not count as video
+def probe_media(path):
+    info = ffmpeg.probe(path)
+    streams = info.get('streams', [])
+    has_video = any(
+        s.get('codec_type') == 'video' and not s.get('disposition', {}).get('attached_pic')
+        for s in streams
+    )
+    duration = info.get('format', {}).get('duration')
+    return {
+        'format': info.get('format', {}).get('format_name'),
+        'duration': float(duration) if duration else None,
+        'has_video': has_video,
+        'has_audio': any(s.get('codec_type') == 'audio' for s in streams),
+    }
+
+
+class UploadSessionStore:
+    def __init__(self, spool_dir, ttl=24 * 3600):
+        self.spool_dir = spool_dir
+        self.ttl = ttl
+        self._sessions = {}
+        self._lock = threading.Lock()
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def _meta_path(self, upload_id):
+        return os.path.join(self.spool_dir, f"{upload_id}.json")
+
+    # Atomic, so a reader in another process never sees a partial file.
+    # Also marks the session as active for cleanup().
+    def _save_meta(self, session):
+        chain, hashed = session.hasher.state()
+        data = {
+            'filename': session.filename,
+            'total_size': session.total_size,
+            'meta': session.meta,
+            'created_at': session.created_at,
+            'offset': session.offset,
+            'hash_chain': chain,
+            'hash_offset': hashed,
+        }
+        path = self._meta_path(session.id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _load_meta(self, upload_id):
+        try:
+            with open(self._meta_path(upload_id)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if 'offset' not in data:
+            # Written before the hash state was saved: rehash the part file once
+            try:
+                data['offset'] = os.path.getsize(os.path.join(self.spool_dir, f"{upload_id}.part"))
+            except OSError:
+                return None
+        return data
+
+    # Bring a session up to date with the saved metadata. When another
+    # process has appended, the hasher resumes from the saved chain and
+    # re-reads only the bytes after the last complete hash block.
+    def _sync(self, session, data=None):
+        data = data or self._load_meta(session.id)
+        if data is None or data['offset'] == session.offset and session.hasher is not None:
+            return
+        hasher = ContentHasher(data.get('hash_chain'), data.get('hash_offset', 0))
+        with open(session.path, 'rb') as f:
+            f.seek(hasher.offset)
+            remaining = data['offset'] - hasher.offset
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                remaining -= len(chunk)
+        session.hasher = hasher
+        session.offset = hasher.size
+
+    # Exclusive lock on the part file across processes, held for one append
+    def _locked(self, session, mode):
+        f = open(session.path, mode)
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        return f
+
+    def create(self, filename, total_size=None, meta=None):
+        self.cleanup()
+        upload_id = uuid.uuid4().hex
+        path = os.path.join(self.spool_dir, f"{upload_id}.part")
+        open(path, 'wb').close()
+        session = UploadSession(upload_id, filename, path, total_size, meta)
+        self._save_meta(session)
+        with self._lock:
+            self._sessions[upload_id] = session
+        return session
+
+    # Sessions survive a restart and are shared between server processes:
+    # the offset and hash state come from the metadata on disk
+    def get(self, upload_id):
+        if not all(c in '0123456789abcdef' for c in upload_id):
+            return None
+        data = self._load_meta(upload_id)
+        if data is None:
+            with self._lock:
+                self._sessions.pop(upload_id, None)
+            return None
+        with self._lock:
+            session = self._sessions.get(upload_id)
+        if session is None:
+            path = os.path.join(self.spool_dir, f"{upload_id}.part")
+            if not os.path.exists(path):
+                return None
+            session = UploadSession(upload_id, data['filename'], path, data.get('total_size'), data.get('meta'),
+                                    offset=data['offset'], created_at=data.get('created_at'))
+            with self._lock:
+                session = self._sessions.setdefault(upload_id, session)
+        elif data['offset'] != session.offset:
+            # Another process has appended; the hasher is reloaded on the next append
+            with session.lock:
+                session.offset = data['offset']
+                session.hasher = None
+        return session
+
+    def append(self, session, offset, stream):
+        """Write `stream` at `offset`, which must equal the bytes stored so far. Returns the new offset."""
+        with session.lock, self._locked(session, 'r+b') as out:
+            self._sync(session)
+            if offset != session.offset:
+                raise OffsetMismatch(session.offset)
+            # Drop bytes of an append that died before confirming them
+            out.truncate(session.offset)
+            out.seek(session.offset)
+            try:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if session.total_size is not None and session.offset + len(chunk) > session.total_size:
+                        raise ValueError("Chunk goes past the declared upload size")
+                    out.write(chunk)
+                    session.hasher.update(chunk)
+                    session.offset += len(chunk)
+            finally:
+                out.flush()
+                self._save_meta(session)
+            new_offset = session.offset
+        if session.media is None and new_offset >= PROBE_BYTES:
+            self._probe_async(session)
+        return new_offset
+
+    def _probe_async(self, session):
+        with session.lock:
+            if session._probing:
+                return
+            session._probing = True
+
+        def run():
+            try:
+                session.media = probe_media(session.path)
+            except Exception as e:
+                # The header may not be in the first bytes (e.g. mp4 with moov at the end)
+                print(f" Early probe failed for upload {session.id}: {e}")
+            finally:
+                session._probing = False
+
+        threading.Thread(target=run, name=f"probe-{session.id[:8]}", daemon=True).start()
+
+    def finalize(self, session):
+        """Close the session and return (path, content hash, size, media info)."""
+        with session.lock, self._locked(session, 'rb'):
+            self._sync(session)
+            if session.total_size is not None and session.offset != session.total_size:
+                raise OffsetMismatch(session.offset)
+            extension = os.path.splitext(session.filename)[1]
+            final_path = os.path.join(self.spool_dir, f"temp_{session.id}{extension}")
+            os.rename(session.path, final_path)
+            content_hash = session.hasher.hexdigest()
+            size = session.offset
+        # The early probe may have seen a partial file; the full one is
+        # authoritative for the duration
+        media = session.media
+        try:
+            media = probe_media(final_path)
+        except Exception as e:
+            print(f" Probe failed for upload {session.id}: {e}")
+        self.discard(session.id)
+        return final_path, content_hash, size, media
+
+    def discard(self, upload_id):
+        with self._lock:
+            self._sessions.pop(upload_id, None)
+        for path in (self._meta_path(upload_id), os.path.join(self.spool_dir, f"{upload_id}.part")):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # Remove sessions that were abandoned for longer than the TTL
+    def cleanup(self):
+        now = time.time()
+        for name in os.listdir(self.spool_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.spool_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    self.discard(name[:-len('.json')])
+            except OSError:
+                pass
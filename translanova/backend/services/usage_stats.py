@@ -0,0 +1,155 @@
+"""
+Per-user usage rollups for the profile dashboard.
+
+Each user has one document in `user_stats` (keyed by user id) with
+running totals: translations by media type and target language, summed
+translation time and accuracy, and first/last translation times. Every
+saved translation updates it with a single atomic $inc, so reading the
+dashboard is one _id lookup instead of a scan of the history.
+`backfill` rebuilds the rollups from the existing translations with one
+aggregation pipeline. Cache hits are counted under `cached` and left out
+of the translation time average, since they took no translation time.
+"""
+
+from datetime import datetime
+
+
+# Written once the rollups have been rebuilt from the translation history
+BACKFILL_MARKER = '_backfill'
+
+
+# Field names cannot contain '.' or start with '$'
+def _field(name):
+    return str(name or 'unknown').replace('.', '_').replace('$', '_')
+
+
+class UsageStats:
+    def __init__(self, collection, source_collections=()):
+        self.collection = collection
+        self.sources = [c for c in source_collections if c is not None]
+
+    def record(self, doc):
+        """Add one translation document to its user's rollup."""
+        if self.collection is None or not doc.get('user_id'):
+            return
+        inc = {
+            'translations': 1,
+            f"media.{_field(doc.get('media_type'))}": 1,
+            f"languages.{_field(doc.get('target_language'))}": 1,
+        }
+        if doc.get('cached'):
+            inc['cached'] = 1
+        elif doc.get('translation_time') is not None:
+            inc['translation_time_total'] = doc['translation_time']
+            inc['translation_time_count'] = 1
+        if doc.get('accuracy') is not None:
+            inc['accuracy_total'] = doc['accuracy']
+            inc['accuracy_count'] = 1
+        timestamp = doc.get('timestamp') or datetime.utcnow()
+        try:
+            self.collection.update_one(
+                {'_id': doc['user_id']},
+                {'$inc': inc, '$min': {'first_translation_at': timestamp},
+                 '$max': {'last_translation_at': timestamp}},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Usage stats update error: {e}")
+
+    def get(self, user_id):
+        """Dashboard totals for `user_id`; zeros for a user without translations."""
+        doc = (self.collection.find_one({'_id': user_id}) if self.collection is not None else None) or {}
+
+        def average(total, count):
+            return round(doc[total] / doc[count], 2) if doc.get(count) else None
+
+        media = doc.get('media', {})
+        return {
+            'user_id': user_id,
+            'translations': doc.get('translations', 0),
+            'audio': media.get('audio', 0),
+            'video': media.get('video', 0),
+            'cached': doc.get('cached', 0),
+            'languages': doc.get('languages', {}),
+            'avg_translation_time': average('translation_time_total', 'translation_time_count'),
+            'avg_accuracy': average('accuracy_total', 'accuracy_count'),
+            'first_translation_at': doc['first_translation_at'].isoformat() if doc.get('first_translation_at') else None,
+            'last_translation_at': doc['last_translation_at'].isoformat() if doc.get('last_translation_at') else None,
+        }
+
+    def backfill(self):
+        """Rebuild every rollup from the translation collections; returns the number of users."""
+        if self.collection is None or not self.sources:
+            return 0
+        pipeline = [{'$match': {'user_id': {'$nin': [None, '']}}}]
+        for other in self.sources[1:]:
+            pipeline.append({'$unionWith': {'coll': other.name,
+                                            'pipeline': [{'$match': {'user_id': {'$nin': [None, '']}}}]}})
+        pipeline += [
+            # Counts per (user, media type, language) first, then one document per user
+            {'$group': {
+                '_id': {'user': '$user_id', 'media': {'$ifNull': ['$media_type', 'unknown']},
+                        'lang': {'$replaceAll': {'input': {'$ifNull': ['$target_language', 'unknown']},
+                                                 'find': '.', 'replacement': '_'}}},
+                'count': {'$sum': 1},
+                'cached': {'$sum': {'$cond': [{'$eq': ['$cached', True]}, 1, 0]}},
+                'translation_time_total': {'$sum': {'$cond': [{'$eq': ['$cached', True]},
+                                                              0, {'$ifNull': ['$translation_time', 0]}]}},
+                'translation_time_count': {'$sum': {'$cond': [{'$or': [
+                    {'$eq': ['$cached', True]},
+                    {'$eq': [{'$ifNull': ['$translation_time', None]}, None]}]}, 0, 1]}},
+                'accuracy_total': {'$sum': {'$ifNull': ['$accuracy', 0]}},
+                'accuracy_count': {'$sum': {'$cond': [{'$eq': [{'$ifNull': ['$accuracy', None]}, None]}, 0, 1]}},
+                'first': {'$min': '$timestamp'},
+                'last': {'$max': '$timestamp'},
+            }},
+            {'$group': {
+                '_id': '$_id.user',
+                'translations': {'$sum': '$count'},
+                'media': {'$push': {'k': '$_id.media', 'v': '$count'}},
+                'languages': {'$push': {'k': '$_id.lang', 'v': '$count'}},
+                'cached': {'$sum': '$cached'},
+                'translation_time_total': {'$sum': '$translation_time_total'},
+                'translation_time_count': {'$sum': '$translation_time_count'},
+                'accuracy_total': {'$sum': '$accuracy_total'},
+                'accuracy_count': {'$sum': '$accuracy_count'},
+                'first_translation_at': {'$min': '$first'},
+                'last_translation_at': {'$max': '$last'},
+            }},
+            # A media type or language appears once per combination; add them up
+            {'$set': {
+                'media': {'$arrayToObject': {'$map': {
+                    'input': {'$setUnion': ['$media.k']},
+                    'as': 'key',
+                    'in': {'k': '$$key', 'v': {'$sum': {'$map': {
+                        'input': {'$filter': {'input': '$media', 'cond': {'$eq': ['$$this.k', '$$key']}}},
+                        'in': '$$this.v'}}}},
+                }}},
+                'languages': {'$arrayToObject': {'$map': {
+                    'input': {'$setUnion': ['$languages.k']},
+                    'as': 'key',
+                    'in': {'k': '$$key', 'v': {'$sum': {'$map': {
+                        'input': {'$filter': {'input': '$languages', 'cond': {'$eq': ['$$this.k', '$$key']}}},
+                        'in': '$$this.v'}}}},
+                }}},
+            }},
+            {'$merge': {'into': self.collection.name, 'on': '_id', 'whenMatched': 'replace',
+                        'whenNotMatched': 'insert'}},
+        ]
+        self.sources[0].aggregate(pipeline)
+        return self.collection.count_documents({'_id': {'$ne': BACKFILL_MARKER}})
+
+    # Build the rollups once per database. The marker is written only after
+    # the rebuild succeeds, so an interrupted backfill runs again on the next
+    # start; rollups that already exist (from before the marker, or recorded
+    # while the backfill ran) are replaced by the rebuilt totals.
+    def ensure_backfilled(self):
+        if self.collection is None or not self.sources:
+            return
+        try:
+            if self.collection.find_one({'_id': BACKFILL_MARKER}) is None:
+                print(f" Backfilled usage stats for {self.backfill()} users")
+                self.collection.update_one({'_id': BACKFILL_MARKER},
+                                           {'$set': {'completed_at': datetime.utcnow()}}, upsert=True)
+        except Exception as e:
+            print(f"Usage stats backfill error: {e}")
@@ -0,0 +1,306 @@
+"""
+Single-pass Whisper decoding that produces the source-language transcript
+and the English translation together.
+
+The audio is loaded and turned into a log-mel spectrogram once, the
+language is detected once, and every 30 s window runs through the encoder
+a single time. Both decoder tasks then run over the same encoder output.
+
+Windows advance like whisper.transcribe: the next window starts at the
+last complete segment timestamp, so words straddling a window boundary
+are decoded whole in the following window. The transcript and the
+translation each seek on their own timestamps and share a window while
+they are at the same position.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from contextlib import nullcontext
+import time
+
+import torch
+import whisper
+from whisper.audio import HOP_LENGTH, N_FRAMES, N_SAMPLES, SAMPLE_RATE
+from whisper.tokenizer import get_tokenizer
+
+from services.tracing import current_span
+
+FRAME_SECONDS = HOP_LENGTH / SAMPLE_RATE
+TIME_PRECISION = 0.02
+
+# Same fallback rules as whisper.transcribe
+TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+def load_audio(audio):
+    if isinstance(audio, str):
+        return whisper.load_audio(audio)
+    return audio
+
+
+# Spectrogram of the whole audio, padded like whisper.transcribe, and the
+# number of frames that hold audio
+def log_mel(model, audio):
+    mel = whisper.log_mel_spectrogram(audio, model.dims.n_mels, padding=N_SAMPLES)
+    return mel, mel.shape[-1] - N_FRAMES
+
+
+def encode(model, mel_batch, fp16=False):
+    dtype = torch.float16 if fp16 else torch.float32
+    with torch.inference_mode():
+        return model.embed_audio(mel_batch.to(model.device, dtype))
+
+
+def detect_language(model, features):
+    _, probs = model.detect_language(features)
+    if isinstance(probs, list):
+        probs = probs[0]
+    return max(probs, key=probs.get)
+
+
+def _needs_fallback(result):
+    if result.compression_ratio > COMPRESSION_RATIO_THRESHOLD:
+        return True
+    return result.avg_logprob < LOGPROB_THRESHOLD
+
+
+# Decode a batch of encoded windows with beam search, retrying individual
+# windows at higher temperatures like whisper.transcribe does when the
+# output looks degenerate. Returns one DecodingResult per window.
+@torch.inference_mode()
+def decode_features(model, features, task, language, fp16=False, beam_size=5, best_of=5):
+    options = whisper.DecodingOptions(task=task, language=language, beam_size=beam_size, fp16=fp16)
+    results = model.decode(features, options)
+    for i, result in enumerate(results):
+        for temperature in TEMPERATURES[1:]:
+            if not _needs_fallback(result) or result.no_speech_prob > NO_SPEECH_THRESHOLD:
+                break
+            options = whisper.DecodingOptions(task=task, language=language, temperature=temperature,
+                                              best_of=best_of, fp16=fp16)
+            result = model.decode(features[i], options)
+        results[i] = result
+    return results
+
+
+def is_silence(result):
+    return result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD
+
+
+# Turn timestamp tokens of a window into timed segments
+def segments_from_result(tokenizer, result, offset, window_end):
+    ts_begin = tokenizer.timestamp_begin
+    segments = []
+    start = None
+    text_tokens = []
+
+    def close(end):
+        text = tokenizer.decode(text_tokens).strip()
+        if text:
+            segments.append({
+                'start': round(offset + start, 2),
+                'end': round(min(offset + end, window_end), 2),
+                'text': text,
+                'avg_logprob': result.avg_logprob,
+                'no_speech_prob': result.no_speech_prob,
+            })
+
+    for token in result.tokens:
+        if token >= ts_begin:
+            t = (token - ts_begin) * TIME_PRECISION
+            if start is not None and text_tokens:
+                close(t)
+                start = None
+                text_tokens = []
+            else:
+                start = t
+        else:
+            if start is None:
+                start = 0.0
+            text_tokens.append(token)
+    if text_tokens:
+        close(window_end - offset)
+    return segments
+
+
+# Frames of a window that whisper.transcribe would consume: up to the last
+# complete segment, or the whole window when the decode ends on a single
+# timestamp or has no segment boundaries
+def consumed_frames(tokenizer, result, segment_size, input_stride):
+    ts_begin = tokenizer.timestamp_begin
+    tokens = result.tokens
+    is_timestamp = [token >= ts_begin for token in tokens]
+    single_timestamp_ending = is_timestamp[-2:] == [False, True]
+    consecutive = [i for i in range(1, len(tokens)) if is_timestamp[i - 1] and is_timestamp[i]]
+    if not consecutive or single_timestamp_ending:
+        return segment_size
+    consumed = (tokens[consecutive[-1] - 1] - ts_begin) * input_stride
+    return consumed if 0 < consumed <= segment_size else segment_size
+
+
+# Detect the spoken language from the first 30 s window of `audio`
+def detect_audio_language(model, audio, fp16=False):
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels)
+    return detect_language(model, encode(model, mel.unsqueeze(0), fp16))
+
+
+def transcribe_and_translate(model, audio, fp16=False, beam_size=5, best_of=5, language=None, progress=None,
+                             batcher=None, lock=None):
+    """Transcribe `audio` (path or 16 kHz float32 array) and translate it to English in one pass.
+
+    With a `batcher`, windows are handed to the shared WhisperBatcher, which
+    encodes and decodes them together with the windows of other jobs.
+    Without one, each window is decoded under `lock` when given, the lock
+    every user of the shared model takes.
+    `progress(done, total)` counts seconds of audio.
+    """
+    audio = load_audio(audio)
+    duration = len(audio) / SAMPLE_RATE
+    mel, content_frames = log_mel(model, audio)
+    tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages)
+    input_stride = N_FRAMES // model.dims.n_audio_ctx
+    # Speculative windows per task; only useful when windows run concurrently
+    lookahead = batcher.lookahead if batcher is not None else 0
+    parent = current_span()
+
+    # (language, {task: DecodingResult}) for one window; one encoder pass
+    # serves all tasks
+    def decode_window(mel_segment, language, tasks):
+        with lock or nullcontext():
+            features = encode(model, mel_segment.unsqueeze(0), fp16)
+            if language is None:
+                language = detect_language(model, features)
+            results = {}
+            for task in tasks:
+                # English audio needs no second decoder pass
+                if task == "translate" and language == "en":
+                    continue
+                results[task] = decode_features(model, features, task, language, fp16, beam_size, best_of)[0]
+        return language, results
+
+    def submit(seek, language, tasks):
+        segment_size = min(N_FRAMES, content_frames - seek)
+        mel_segment = whisper.pad_or_trim(mel[:, seek:seek + segment_size], N_FRAMES)
+        if batcher is not None:
+            return batcher.submit(mel_segment, language, tasks)
+        future = Future()
+        try:
+            future.set_result(decode_window(mel_segment, language, tasks))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    # Each task seeks like whisper.transcribe on its own timestamps: the
+    # next window starts at the end of its last complete segment. Tasks at
+    # the same position share a window. With a batcher, each task also has
+    # its following windows decoding at the 30 s boundaries; they are used
+    # when a window is consumed whole and dropped otherwise.
+    tasks = ("transcribe",) if language == "en" else ("transcribe", "translate")
+    seeks = {task: 0 for task in tasks}
+    segments = {task: [] for task in tasks}
+    # {(seek, task): future}; a window decoding several tasks is listed under each
+    windows = {}
+    speculative = set()
+    submitted_at = {}
+    index = 0
+
+    def release(key):
+        future = windows.pop(key)
+        if key in speculative:
+            speculative.discard(key)
+            batcher.count_speculation(hit=False)
+        if future not in windows.values():
+            future.cancel()
+
+    try:
+        while True:
+            active = [task for task in tasks if seeks[task] < content_frames]
+            if not active:
+                break
+            # Speculate once the language is known, so no window detects it again
+            depth = lookahead + 1 if language is not None else 1
+            wanted = {}
+            for task in active:
+                planned = {seeks[task] + k * N_FRAMES for k in range(depth)}
+                for key in [key for key in windows if key[1] == task and key[0] not in planned]:
+                    release(key)
+                for seek in planned:
+                    if seek < content_frames and (seek, task) not in windows:
+                        wanted.setdefault(seek, []).append(task)
+            for seek, seek_tasks in sorted(wanted.items()):
+                future = submit(seek, language, tuple(seek_tasks))
+                submitted_at[future] = time.perf_counter()
+                for task in seek_tasks:
+                    windows[(seek, task)] = future
+                    if seek != seeks[task]:
+                        speculative.add((seek, task))
+
+            current = {(seeks[task], task): windows[(seeks[task], task)] for task in active}
+            wait(set(current.values()), return_when=FIRST_COMPLETED)
+            for key, future in current.items():
+                if not future.done() or key not in windows:
+                    continue
+                seek, task = key
+                detected, results = future.result()
+                if future in submitted_at:
+                    parent.record('whisper_window', submitted_at.pop(future), time.perf_counter(), index=index,
+                                  offset=round(seek * FRAME_SECONDS, 2), batched=batcher is not None,
+                                  speculative=key in speculative)
+                    index += 1
+                if language is None:
+                    language = detected
+                    if language == "en" and "translate" in tasks:
+                        # English audio needs no translation pass
+                        tasks = ("transcribe",)
+                        for other in [other for other in windows if other[1] == "translate"]:
+                            release(other)
+                        del seeks["translate"]
+                        if task == "translate":
+                            continue
+                windows.pop(key)
+                if key in speculative:
+                    speculative.discard(key)
+                    batcher.count_speculation(hit=True)
+                kept, consumed = window_segments(tokenizer, results[task], seek, content_frames, duration,
+                                                 input_stride)
+                segments[task].extend(kept)
+                seeks[task] = seek + consumed
+            if progress:
+                done = min(min(seeks.values()), content_frames)
+                progress(int(done * FRAME_SECONDS), int(duration) or 1)
+    finally:
+        for key in list(windows):
+            release(key)
+
+    transcript = _joined(segments["transcribe"])
+    return {
+        'language': language,
+        'duration': duration,
+        'transcribe': transcript,
+        'translate': _joined(segments["translate"]) if "translate" in tasks else transcript,
+    }
+
+
+# Segments a window contributes and the frames it consumes. Segments after
+# the last complete one are decoded again from the next window.
+def window_segments(tokenizer, result, seek, content_frames, duration, input_stride):
+    segment_size = min(N_FRAMES, content_frames - seek)
+    if is_silence(result):
+        return [], segment_size
+    offset = seek * FRAME_SECONDS
+    window_end = min(offset + segment_size * FRAME_SECONDS, duration)
+    consumed = consumed_frames(tokenizer, result, segment_size, input_stride)
+    cut = offset + consumed * FRAME_SECONDS
+    kept = [
+        segment for segment in segments_from_result(tokenizer, result, offset, window_end)
+        if consumed == segment_size or segment['end'] <= cut + TIME_PRECISION
+    ]
+    return kept, consumed
+
+
+def _joined(segments):
+    return {
+        'text': " ".join(s['text'] for s in segments).strip(),
+        'segments': segments,
+    }
@@ -7,14 +7,15 @@ from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 import os
 import tempfile
-import whisper
-from deep_translator import GoogleTranslator
 from gtts import gTTS
 import pyttsx3
 import ffmpeg
 import torch
 import uuid
 import json
+from services.translation_memory import TranslationMemory, SqliteStore
+from services.translation_engine import TranslationEngine, make_backend
+from services.asr_backends import load_backend
 
 # Set UTF-8 encoding for Windows
 import sys
@@ -25,9 +26,10 @@ if sys.platform.startswith('win'):
 
 # Auto-detect GPU
 USE_GPU = torch.cuda.is_available()
-MODEL_NAME = "large-v3" if USE_GPU else "small"
-print(f"Loading Whisper model: {MODEL_NAME} (GPU: {USE_GPU})")
-model = whisper.load_model(MODEL_NAME)
+# ASR_BACKEND / ASR_MODEL choose the engine and checkpoint (see services.asr_backends)
+asr = load_backend()
+MODEL_NAME = asr.model_name
+print(f"Whisper model: {MODEL_NAME} via {asr.name} (GPU: {USE_GPU})")
 
 # Language options
 lang_options = {
@@ -38,25 +40,26 @@ lang_options = {
     "Bhojpuri": "bho", "Chinese (Simplified)": "zh-CN", "Chinese (Traditional)": "zh-TW"
 }
 
+# Sentence-level translation memory, persisted in SQLite between runs
+translation_memory = TranslationMemory(SqliteStore(os.getenv('TM_DB_PATH', 'translation_memory.db')))
+translation_engine = TranslationEngine(make_backend(), max_workers=int(os.getenv('TRANSLATION_CONCURRENCY', '4')))
+
 # Translation function (Google)
 def translate_google(text, lang="hi"):
     try:
         # Clean the text to avoid Unicode issues
         text = text.encode('ascii', 'ignore').decode('ascii')
         
-        sentences = text.split(". ")
-        translated_sentences = []
-        
-        for s in sentences:
-            if s.strip():
-                try:
-                    translated = GoogleTranslator(source="en", target=lang).translate(s)
-                    # Clean the translated text
-                    translated = translated.encode('ascii', 'ignore').decode('ascii')
-                    translated_sentences.append(translated)
-                except Exception as e:
-                    # If translation fails, use original text
-                    translated_sentences.append(s)
+        sentences = [s for s in text.split(". ") if s.strip()]
+
+        # Only sentences missing from the translation memory reach Google;
+        # sentences that fail to translate keep the original text
+        translated_sentences = translation_memory.translate(
+            sentences, "en", lang,
+            lambda misses: translation_engine.translate_sentences(misses, "en", lang)
+        )
+        # Clean the translated text
+        translated_sentences = [t.encode('ascii', 'ignore').decode('ascii') for t in translated_sentences]
         
         return ". ".join(translated_sentences)
     except Exception as e:
@@ -89,11 +92,11 @@ def extract_audio(path):
 
 # Whisper: transcribe in same language
 def whisper_transcribe(path):
-    return model.transcribe(path, task="transcribe", fp16=USE_GPU)["text"]
+    return asr.transcribe(path, task="transcribe")["text"]
 
 # Whisper: translate to English
 def whisper_translate(path):
-    return model.transcribe(path, task="translate", fp16=USE_GPU)["text"]
+    return asr.transcribe(path, task="translate")["text"]
 
 # TTS
 def tts(text, lang="hi"):
@@ -292,7 +295,8 @@ def health_check():
     return jsonify({
         'status': 'OK',
         'message': 'Translation server is running',
-        'languages_available': len(lang_options)
+        'languages_available': len(lang_options),
+        'asr': asr.stats()
     })
 
 if __name__ == "__main__":
@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("whisper")
+
+from services.batching import WhisperBatcher  # noqa: E402
+
+
+# Runs batches without a model: every window decodes to its own mel
+class RecordingBatcher(WhisperBatcher):
+    def __init__(self, **kwargs):
+        super().__init__(model=None, **kwargs)
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.lock_held = []
+
+    def _run(self, batch):
+        self.gate.wait(5)
+        self.lock_held.append(self.model_lock.locked())
+        self.batches.append([request.mel for request in batch])
+        for request in batch:
+            if request.mel == "fail":
+                raise RuntimeError("decode failed")
+            request.future.set_result((request.language, {task: request.mel for task in request.tasks}))
+
+
+def test_windows_submitted_together_share_a_batch():
+    batcher = RecordingBatcher(max_batch_size=4, max_wait=0.5)
+    futures = [batcher.submit(f"w{i}", language="en") for i in range(4)]
+    results = [future.result(5) for future in futures]
+    assert batcher.batches == [["w0", "w1", "w2", "w3"]]
+    assert results[2] == ("en", {"transcribe": "w2", "translate": "w2"})
+    assert batcher.lock_held == [True]
+
+
+def test_batches_are_capped_at_max_batch_size():
+    batcher = RecordingBatcher(max_batch_size=2, max_wait=0.5)
+    futures = [batcher.submit(f"w{i}") for i in range(5)]
+    for future in futures:
+        future.result(5)
+    assert [len(batch) for batch in batcher.batches] == [2, 2, 1]
+
+
+def test_cancelled_windows_are_skipped():
+    batcher = RecordingBatcher(max_batch_size=1, max_wait=0)
+    batcher.gate.clear()
+    first = batcher.submit("w0")
+    # Queued behind the running batch, then dropped by their job
+    dropped = batcher.submit("w1")
+    kept = batcher.submit("w2")
+    assert dropped.cancel()
+    batcher.gate.set()
+    assert first.result(5)[1]["transcribe"] == "w0"
+    assert kept.result(5)[1]["transcribe"] == "w2"
+    assert batcher.batches == [["w0"], ["w2"]]
+    assert batcher.windows_cancelled == 1
+
+
+def test_a_failed_batch_fails_its_windows():
+    batcher = RecordingBatcher(max_batch_size=2, max_wait=0.5)
+    futures = [batcher.submit("fail"), batcher.submit("w1")]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="decode failed"):
+            future.result(5)
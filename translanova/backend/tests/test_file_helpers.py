@@ -0,0 +1,44 @@
+import io
+import os
+
+from utils.file_helpers import HASH_BLOCK, ContentHasher, save_stream_with_hash
+
+DATA = os.urandom(3 * HASH_BLOCK + 12345)
+
+
+def digest(*pieces):
+    hasher = ContentHasher()
+    for piece in pieces:
+        hasher.update(piece)
+    return hasher.hexdigest()
+
+
+def test_digest_does_not_depend_on_the_split():
+    whole = digest(DATA)
+    assert digest(DATA[:10], DATA[10:HASH_BLOCK + 1], DATA[HASH_BLOCK + 1:]) == whole
+    assert digest(*(DATA[i:i + 4096] for i in range(0, len(DATA), 4096))) == whole
+
+
+def test_digest_covers_length_and_content():
+    assert digest(b"") != digest(b"\0")
+    assert digest(DATA) != digest(DATA[:-1])
+    assert digest(DATA[:HASH_BLOCK]) != digest(DATA[:HASH_BLOCK] + b"\0")
+
+
+def test_state_resumes_in_a_new_hasher():
+    first = ContentHasher()
+    first.update(DATA[:2 * HASH_BLOCK + 500])
+    chain, offset = first.state()
+    assert offset == 2 * HASH_BLOCK
+    # Another process picks up from the saved state and re-reads the bytes after `offset`
+    resumed = ContentHasher(chain, offset)
+    resumed.update(DATA[offset:])
+    assert resumed.size == len(DATA)
+    assert resumed.hexdigest() == digest(DATA)
+
+
+def test_save_stream_with_hash(tmp_path):
+    path = tmp_path / "upload.bin"
+    content_hash, size = save_stream_with_hash(io.BytesIO(DATA), str(path), chunk_size=70000)
+    assert (content_hash, size) == (digest(DATA), len(DATA))
+    assert path.read_bytes() == DATA
@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+import uuid
+
+from services.jobs import JOB_COMPLETED, JOB_FAILED, JOB_RUNNING, JobQueue, JobSnapshot, fail_orphaned_jobs
+
+
+# Submit and wait until the worker has finished with the job, history included
+def run(queue, func):
+    job = queue.submit(func)
+    queue._queue.join()
+    return job
+
+
+def test_other_processes_read_the_snapshot(tmp_path):
+    owner = JobQueue(workers=1, state_dir=str(tmp_path))
+
+    def work(job):
+        job.set_stage('whisper')
+        job.set_progress(30, 60)
+        return {'ok': True}
+
+    job = run(owner, work)
+    # A queue in another process has no such job in memory
+    other = JobQueue(workers=1, state_dir=str(tmp_path))
+    snapshot = other.get(job.id)
+    assert isinstance(snapshot, JobSnapshot)
+    assert snapshot.done
+    data = snapshot.to_dict()
+    assert data['status'] == JOB_COMPLETED
+    assert data['result'] == {'ok': True}
+    assert 'pid' not in data and 'events' not in data
+    assert [e['event'] for e in snapshot.wait_events()] == ['status', 'stage', 'progress', 'completed']
+    assert [e['event'] for e in snapshot.wait_events(after=3)] == ['completed']
+
+
+def test_unknown_or_malformed_ids_are_not_found(tmp_path):
+    queue = JobQueue(workers=1, state_dir=str(tmp_path))
+    assert queue.get(str(uuid.uuid4())) is None
+    assert queue.get('../../etc/passwd') is None
+
+
+def test_finished_jobs_beyond_the_history_drop_their_snapshots(tmp_path):
+    queue = JobQueue(workers=1, history_limit=1, state_dir=str(tmp_path))
+    first = run(queue, lambda job: 1)
+    second = run(queue, lambda job: 2)
+    assert queue.get(first.id) is None
+    assert queue.get(second.id) is second
+    assert os.listdir(tmp_path) == [f"{second.id}.json"]
+
+
+def write_state(state_dir, pid, finished=False):
+    job_id = str(uuid.uuid4())
+    data = {'job_id': job_id, 'status': JOB_COMPLETED if finished else JOB_RUNNING, 'pid': pid,
+            'stage': 'whisper', 'progress': {'done': 1, 'total': 2},
+            'finished_at': 1.0 if finished else None,
+            'events': [{'id': 1, 'event': 'status', 'data': {'status': JOB_RUNNING}}]}
+    with open(os.path.join(state_dir, f"{job_id}.json"), 'w') as f:
+        json.dump(data, f)
+    return job_id
+
+
+def read_state(state_dir, job_id):
+    with open(os.path.join(state_dir, f"{job_id}.json")) as f:
+        return json.load(f)
+
+
+def test_orphaned_jobs_of_a_dead_worker_fail(tmp_path):
+    state_dir = str(tmp_path)
+    orphan = write_state(state_dir, pid=101)
+    finished = write_state(state_dir, pid=101, finished=True)
+    alive = write_state(state_dir, pid=102)
+
+    assert fail_orphaned_jobs(state_dir, 101, error="worker died") == 1
+    data = read_state(state_dir, orphan)
+    assert data['status'] == JOB_FAILED
+    assert data['error'] == "worker died"
+    assert data['stage'] is None and data['progress'] is None
+    assert data['finished_at'] is not None
+    assert data['events'][-1] == {'id': 2, 'event': 'failed',
+                                  'data': {'status': JOB_FAILED, 'error': "worker died"}}
+    assert read_state(state_dir, finished)['status'] == JOB_COMPLETED
+    assert read_state(state_dir, alive)['status'] == JOB_RUNNING
+    # Streams waiting on the orphan see the failure
+    snapshot = JobSnapshot(os.path.join(state_dir, f"{orphan}.json"))
+    assert snapshot.wait_events(after=1, timeout=0)[-1]['event'] == 'failed'
+
+
+def test_waiting_on_a_snapshot_sees_later_events(tmp_path):
+    queue = JobQueue(workers=1, state_dir=str(tmp_path))
+    release = threading.Event()
+    job = queue.submit(lambda job: release.wait(5))
+    snapshot = JobSnapshot(queue._state_path(job.id), poll_interval=0.01)
+    release.set()
+    events = []
+    while not snapshot.done:
+        events += snapshot.wait_events(after=events[-1]['id'] if events else 0, timeout=5)
+    assert events[-1]['event'] == 'completed'
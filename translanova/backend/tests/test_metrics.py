@@ -0,0 +1,68 @@
+import os
+
+from services.metrics import RETIRED_FILE, Registry
+
+
+def registry(state_dir):
+    metrics = Registry(state_dir=state_dir)
+    jobs = metrics.counter("jobs_total", "Jobs", ["status"])
+    depth = metrics.gauge("queue_depth", "Queued jobs")
+    seconds = metrics.histogram("stage_seconds", "Stage time", ["stage"], buckets=(1, 10))
+    return metrics, jobs, depth, seconds
+
+
+# Snapshot of a worker process that is about to exit
+def worker_snapshot(state_dir, pid, jobs_done, depth_value, stage_time):
+    metrics, jobs, depth, seconds = registry(state_dir)
+    jobs.inc(jobs_done, status="completed")
+    depth.set(depth_value)
+    seconds.observe(stage_time, stage="whisper")
+    metrics._write(metrics._path(pid), metrics._collect())
+    return metrics
+
+
+def lines(metrics):
+    return set(metrics.render().splitlines())
+
+
+def test_retired_counters_and_histograms_are_kept(tmp_path):
+    state_dir = str(tmp_path)
+    master, *_ = registry(state_dir)
+    worker_snapshot(state_dir, 101, 2, 5, 0.5)
+    worker_snapshot(state_dir, 102, 3, 7, 4.0)
+    before = lines(master)
+    assert 'jobs_total{status="completed"} 5' in before
+    assert 'queue_depth{pid="101"} 5' in before
+
+    master.retire_snapshot(101)
+    master.retire_snapshot(102)
+    assert sorted(os.listdir(state_dir)) == sorted([RETIRED_FILE, f"metrics_{os.getpid()}.json"])
+    after = lines(master)
+    assert 'jobs_total{status="completed"} 5' in after
+    assert 'stage_seconds_bucket{stage="whisper",le="1"} 1' in after
+    assert 'stage_seconds_bucket{stage="whisper",le="10"} 2' in after
+    assert 'stage_seconds_count{stage="whisper"} 2' in after
+    assert 'stage_seconds_sum{stage="whisper"} 4.5' in after
+    # Gauges of exited workers are dropped
+    assert not any('pid="101"' in line or 'pid="102"' in line for line in after)
+
+
+def test_retiring_twice_does_not_double_count(tmp_path):
+    state_dir = str(tmp_path)
+    master, *_ = registry(state_dir)
+    worker_snapshot(state_dir, 101, 2, 0, 0.5)
+    master.retire_snapshot(101)
+    master.retire_snapshot(101)
+    assert 'jobs_total{status="completed"} 2' in lines(master)
+
+
+def test_retired_totals_add_to_live_workers(tmp_path):
+    state_dir = str(tmp_path)
+    master, jobs, _, _ = registry(state_dir)
+    jobs.inc(status="completed")
+    worker_snapshot(state_dir, 101, 2, 0, 0.5)
+    master.retire_snapshot(101)
+    worker_snapshot(state_dir, 103, 4, 1, 0.5)
+    rendered = lines(master)
+    assert 'jobs_total{status="completed"} 7' in rendered
+    assert 'queue_depth{pid="103"} 1' in rendered
@@ -0,0 +1,112 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from services.result_cache import ResultCache, cache_key  # noqa: E402
+
+
+class Cursor(list):
+    def sort(self, field, direction):
+        return Cursor(sorted(self, key=lambda doc: doc[field], reverse=direction < 0))
+
+
+# Just enough of a pymongo collection for ResultCache
+class Collection:
+    def __init__(self):
+        self.docs = {}
+
+    def create_index(self, keys):
+        pass
+
+    def find_one_and_update(self, query, update):
+        doc = self.docs.get(query['_id'])
+        if doc is None:
+            return None
+        before = dict(doc)
+        doc.update(update.get('$set', {}))
+        for field, amount in update.get('$inc', {}).items():
+            doc[field] = doc.get(field, 0) + amount
+        return before
+
+    def update_one(self, query, update, upsert=False):
+        doc = self.docs.get(query['_id'])
+        if doc is None:
+            doc = self.docs[query['_id']] = dict(query, **update.get('$setOnInsert', {}))
+        doc.update(update.get('$set', {}))
+
+    def find(self, query, projection=None):
+        return Cursor(dict(doc) for doc in self.docs.values())
+
+    def delete_one(self, query):
+        self.docs.pop(query['_id'], None)
+
+
+def write(path, size):
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(Collection(), files_dir=str(tmp_path), max_bytes=250)
+
+
+def put(cache, key, output_filename, size, accessed):
+    write(os.path.join(cache.files_dir, output_filename), size)
+    cache.put(key, {'output': output_filename}, output_filename)
+    cache.collection.docs[key]['last_access'] = accessed
+
+
+def test_key_covers_translator_tts_and_voice():
+    base = cache_key('abc', 'hi', 'base', 'google', 'gtts', 'default')
+    assert base == cache_key('abc', 'hi', 'base', 'google', 'gtts', 'default')
+    assert base != cache_key('abc', 'hi', 'base', 'stub', 'gtts', 'default')
+    assert base != cache_key('abc', 'hi', 'base', 'google', 'stub', 'default')
+    assert base != cache_key('abc', 'hi', 'base', 'google', 'gtts', 'other')
+    assert base != cache_key('abc', 'hi', 'base', 'google', 'gtts', 'default', variant='quality')
+
+
+def test_hit_links_the_output_for_the_new_record(cache):
+    put(cache, 'k1', 'first.mp3', 100, datetime.utcnow())
+    assert cache.get('k1', 'second.mp3') == {'output': 'first.mp3'}
+    second = os.path.join(cache.files_dir, 'second.mp3')
+    assert os.path.getsize(second) == 100
+    assert os.stat(second).st_nlink == 3
+    assert cache.collection.docs['k1']['hits'] == 1
+
+
+def test_miss_when_the_cached_file_is_gone(cache):
+    put(cache, 'k1', 'first.mp3', 100, datetime.utcnow())
+    os.remove(os.path.join(cache.cache_dir, 'k1.mp3'))
+    assert cache.get('k1', 'second.mp3') is None
+    assert 'k1' not in cache.collection.docs
+
+
+def test_budget_counts_only_outputs_the_cache_keeps_alive(cache):
+    now = datetime.utcnow()
+    put(cache, 'old', 'old.mp3', 100, now - timedelta(minutes=3))
+    put(cache, 'shared', 'shared.mp3', 200, now - timedelta(minutes=2))
+    put(cache, 'new', 'new.mp3', 100, now - timedelta(minutes=1))
+    # The history dropped these records; 'shared' is still linked by its record
+    os.remove(os.path.join(cache.files_dir, 'old.mp3'))
+    os.remove(os.path.join(cache.files_dir, 'new.mp3'))
+
+    cache.evict()
+    # 200 exclusive bytes fit into 250; the shared entry is not counted
+    assert set(cache.collection.docs) == {'old', 'shared', 'new'}
+
+    cache.max_bytes = 150
+    cache.evict()
+    assert set(cache.collection.docs) == {'shared', 'new'}
+    assert not os.path.exists(os.path.join(cache.cache_dir, 'old.mp3'))
+    assert os.path.exists(os.path.join(cache.files_dir, 'shared.mp3'))
+
+
+def test_evict_drops_entries_without_a_file(cache):
+    put(cache, 'k1', 'first.mp3', 10, datetime.utcnow())
+    os.remove(os.path.join(cache.cache_dir, 'k1.mp3'))
+    cache.evict()
+    assert cache.collection.docs == {}
@@ -0,0 +1,71 @@
+import pytest
+
+pytest.importorskip("ffmpeg")
+np = pytest.importorskip("numpy")
+
+from services.streaming import SAMPLE_RATE, LocalAgreement, StreamingTranscriber  # noqa: E402
+
+
+def words(*items):
+    return [(start, start + 0.4, word) for start, word in items]
+
+
+def test_commits_the_prefix_two_hypotheses_agree_on():
+    agreement = LocalAgreement()
+    assert agreement.insert(words((0.0, "Hello"), (0.5, "wor"))) == []
+    committed = agreement.insert(words((0.0, "hello,"), (0.5, "world"), (1.0, "again")))
+    assert [w for _, _, w in committed] == ["hello,"]
+    assert [w for _, _, w in agreement.previous] == ["world", "again"]
+    assert agreement.last_end == 0.4
+
+
+def test_committed_words_repeated_by_the_window_are_dropped():
+    agreement = LocalAgreement()
+    agreement.insert(words((0.0, "one"), (0.5, "two")))
+    agreement.insert(words((0.0, "one"), (0.5, "two"), (1.0, "three")))
+    # The next window still starts with the committed words
+    committed = agreement.insert(words((0.3, "two"), (1.0, "three"), (1.5, "four")))
+    assert [w for _, _, w in agreement.committed] == ["one", "two", "three"]
+    assert [w for _, _, w in committed] == ["three"]
+
+
+def test_flush_commits_the_tentative_tail():
+    agreement = LocalAgreement()
+    agreement.insert(words((0.0, "one"), (0.5, "two")))
+    assert [w for _, _, w in agreement.flush()] == ["one", "two"]
+    assert agreement.previous == []
+    assert agreement.last_end == 0.9
+
+
+# Recognizes the word spoken in each second of the stream, "w<second>",
+# timed within the buffer it is given
+class Recognizer:
+    def __init__(self):
+        self.lengths = []
+
+    def __call__(self, audio, language, prompt):
+        self.lengths.append(len(audio) / SAMPLE_RATE)
+        return "en", [(p / SAMPLE_RATE + 0.1, p / SAMPLE_RATE + 0.9, f" w{round(audio[p] * 1000) - 1}")
+                      for p in np.flatnonzero(audio)]
+
+
+def second(index):
+    # A marker sample at the start of each second stands in for its word
+    audio = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    audio[0] = (index + 1) / 1000
+    return audio
+
+
+def test_window_stays_bounded_on_a_long_stream():
+    recognizer = Recognizer()
+    transcriber = StreamingTranscriber(recognizer, step=1.0, window=4.0)
+    committed = []
+    for i in range(20):
+        transcriber.feed(second(i))
+        assert transcriber.ready()
+        new, _ = transcriber.process()
+        committed += [w for _, _, w in new]
+    committed += [w for _, _, w in transcriber.finish()]
+    assert committed == [f" w{i}" for i in range(20)]
+    assert transcriber.language == "en"
+    assert max(recognizer.lengths) <= 5.0
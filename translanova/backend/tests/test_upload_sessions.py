@@ -0,0 +1,58 @@
+import io
+import os
+
+import pytest
+
+pytest.importorskip("ffmpeg")
+
+from services.upload_sessions import OffsetMismatch, UploadSessionStore  # noqa: E402
+from utils.file_helpers import HASH_BLOCK, ContentHasher  # noqa: E402
+
+DATA = os.urandom(HASH_BLOCK + HASH_BLOCK // 2)
+
+
+def digest(data):
+    hasher = ContentHasher()
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+def test_chunks_on_different_processes_hash_like_one_upload(tmp_path):
+    # Two stores on one spool directory stand in for two server processes
+    first, second = UploadSessionStore(str(tmp_path)), UploadSessionStore(str(tmp_path))
+    session = first.create("clip.wav", len(DATA))
+    cut_a, cut_b = HASH_BLOCK // 3, HASH_BLOCK + 100
+    assert first.append(session, 0, io.BytesIO(DATA[:cut_a])) == cut_a
+    other = second.get(session.id)
+    assert other.offset == cut_a
+    assert second.append(other, cut_a, io.BytesIO(DATA[cut_a:cut_b])) == cut_b
+    session = first.get(session.id)
+    assert session.offset == cut_b
+    assert first.append(session, cut_b, io.BytesIO(DATA[cut_b:])) == len(DATA)
+
+    path, content_hash, size, _ = second.finalize(second.get(session.id))
+    assert (content_hash, size) == (digest(DATA), len(DATA))
+    with open(path, 'rb') as f:
+        assert f.read() == DATA
+
+
+def test_session_survives_a_restart(tmp_path):
+    store = UploadSessionStore(str(tmp_path))
+    session = store.create("clip.wav")
+    store.append(session, 0, io.BytesIO(DATA[:HASH_BLOCK + 7]))
+    restarted = UploadSessionStore(str(tmp_path))
+    session = restarted.get(session.id)
+    assert session.offset == HASH_BLOCK + 7
+    restarted.append(session, session.offset, io.BytesIO(DATA[HASH_BLOCK + 7:]))
+    assert restarted.finalize(session)[1] == digest(DATA)
+
+
+def test_appends_must_continue_at_the_stored_offset(tmp_path):
+    store = UploadSessionStore(str(tmp_path))
+    session = store.create("clip.wav", len(DATA))
+    store.append(session, 0, io.BytesIO(DATA[:100]))
+    with pytest.raises(OffsetMismatch) as error:
+        store.append(session, 50, io.BytesIO(DATA[50:200]))
+    assert error.value.expected == 100
+    with pytest.raises(ValueError):
+        store.append(session, 100, io.BytesIO(DATA[100:] + b"extra"))
@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("whisper")
+
+from services.whisper_decode import consumed_frames, window_segments  # noqa: E402
+
+TS = 1000
+# Timestamp tokens are 0.02 s apart, two mel frames each
+STRIDE = 2
+
+
+class Tokenizer:
+    timestamp_begin = TS
+
+    def decode(self, tokens):
+        return " ".join(f"w{t}" for t in tokens)
+
+
+def ts(seconds):
+    return TS + round(seconds / 0.02)
+
+
+def result(tokens, no_speech_prob=0.0, avg_logprob=-0.1):
+    return SimpleNamespace(tokens=tokens, no_speech_prob=no_speech_prob, avg_logprob=avg_logprob)
+
+
+def test_consumed_frames_stops_at_last_complete_segment():
+    # Two complete segments, then an unfinished one cut off by the window end
+    tokens = [ts(0), 1, 2, ts(4), ts(4), 3, 4, ts(9.5), ts(9.5), 5, 6]
+    assert consumed_frames(Tokenizer(), result(tokens), 3000, STRIDE) == 950
+
+
+def test_consumed_frames_takes_whole_window_on_single_timestamp_ending():
+    tokens = [ts(0), 1, 2, ts(4), ts(4), 3, 4, ts(9.5)]
+    assert consumed_frames(Tokenizer(), result(tokens), 3000, STRIDE) == 3000
+
+
+def test_consumed_frames_takes_whole_window_without_boundaries():
+    assert consumed_frames(Tokenizer(), result([1, 2, 3]), 3000, STRIDE) == 3000
+    assert consumed_frames(Tokenizer(), result([ts(0), 1, 2, ts(3)]), 3000, STRIDE) == 3000
+
+
+def test_consumed_frames_ignores_timestamp_past_the_window():
+    # A last window shorter than 30 s: a boundary beyond its content is not trusted
+    tokens = [ts(0), 1, ts(12), ts(12), 2]
+    assert consumed_frames(Tokenizer(), result(tokens), 800, STRIDE) == 800
+
+
+def test_window_segments_drops_the_unfinished_tail():
+    tokens = [ts(0), 1, 2, ts(4), ts(4), 3, 4, ts(9.5), ts(9.5), 5, 6]
+    kept, consumed = window_segments(Tokenizer(), result(tokens), 3000, 9000, 90.0, STRIDE)
+    assert consumed == 950
+    assert [(s['start'], s['end'], s['text']) for s in kept] == [
+        (30.0, 34.0, "w1 w2"),
+        (34.0, 39.5, "w3 w4"),
+    ]
+
+
+def test_window_segments_clamps_the_last_window_to_the_duration():
+    # 10 s of content left at seek 3000 (30 s); the decode ends on a single timestamp
+    tokens = [ts(0), 1, ts(6), ts(6), 2, ts(12)]
+    kept, consumed = window_segments(Tokenizer(), result(tokens), 3000, 4000, 40.0, STRIDE)
+    assert consumed == 1000
+    assert [(s['start'], s['end'], s['text']) for s in kept] == [
+        (30.0, 36.0, "w1"),
+        (36.0, 40.0, "w2"),
+    ]
+
+
+def test_window_segments_skips_silence():
+    silent = result([ts(0), 1, ts(2)], no_speech_prob=0.9, avg_logprob=-1.5)
+    assert window_segments(Tokenizer(), silent, 0, 9000, 90.0, STRIDE) == ([], 3000)
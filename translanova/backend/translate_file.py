@@ -2,13 +2,26 @@
 """
 Simple translation script that processes files and returns translated versions.
 This script can be called from the React frontend.
+
+Batch mode takes a directory or glob and several target languages and
+spreads the files over a pool of worker processes, each of which loads
+the speech model once. A JSON manifest records every file's status per
+language, so an interrupted run picks up where it stopped:
+
+    python translate_file.py "media/**/*.mp4" --langs hi,es --workers 4
 """
 
 import os
 import sys
+import argparse
+import glob
+import hashlib
+import multiprocessing
+import shutil
 import tempfile
-import whisper
-from deep_translator import GoogleTranslator
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
 from gtts import gTTS
 import pyttsx3
 import ffmpeg
@@ -17,6 +30,9 @@ import json
 import uuid
 from pathlib import Path
 import traceback
+from services.translation_memory import TranslationMemory, SqliteStore
+from services.translation_engine import TranslationEngine, make_backend
+from services.asr_backends import load_backend
 
 # Set UTF-8 encoding for Windows
 if sys.platform.startswith('win'):
@@ -26,9 +42,24 @@ if sys.platform.startswith('win'):
 
 # Auto-detect GPU
 USE_GPU = torch.cuda.is_available()
-MODEL_NAME = "large-v3" if USE_GPU else "small"
-print(f"Loading Whisper model: {MODEL_NAME} (GPU: {USE_GPU})")
-model = whisper.load_model(MODEL_NAME)
+# ASR_BACKEND / ASR_MODEL choose the engine and checkpoint (see services.asr_backends).
+# Loaded on first use, so batch workers each load it once and the batch
+# parent never does.
+asr = None
+
+def load_asr(threads=None):
+    global asr
+    if asr is None:
+        asr = load_backend(threads=threads)
+        print(f"Whisper model: {asr.model_name} via {asr.name} (GPU: {USE_GPU}, pid {os.getpid()})")
+    return asr
+
+MEDIA_EXTENSIONS = (".mp3", ".wav", ".m4a", ".flac", ".ogg", ".aac", ".mp4", ".mov", ".mkv", ".webm")
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv")
+
+# Sentence-level translation memory, persisted in SQLite between runs
+translation_memory = TranslationMemory(SqliteStore(os.getenv('TM_DB_PATH', 'translation_memory.db')))
+translation_engine = TranslationEngine(make_backend(), max_workers=int(os.getenv('TRANSLATION_CONCURRENCY', '4')))
 
 # Translation function (Google)
 def translate_google(text, lang="hi"):
@@ -36,19 +67,16 @@ def translate_google(text, lang="hi"):
         # Clean the text to avoid Unicode issues
         text = text.encode('ascii', 'ignore').decode('ascii')
         
-        sentences = text.split(". ")
-        translated_sentences = []
-        
-        for s in sentences:
-            if s.strip():
-                try:
-                    translated = GoogleTranslator(source="en", target=lang).translate(s)
-                    # Clean the translated text
-                    translated = translated.encode('ascii', 'ignore').decode('ascii')
-                    translated_sentences.append(translated)
-                except Exception as e:
-                    # If translation fails, use original text
-                    translated_sentences.append(s)
+        sentences = [s for s in text.split(". ") if s.strip()]
+
+        # Only sentences missing from the translation memory reach Google;
+        # sentences that fail to translate keep the original text
+        translated_sentences = translation_memory.translate(
+            sentences, "en", lang,
+            lambda misses: translation_engine.translate_sentences(misses, "en", lang)
+        )
+        # Clean the translated text
+        translated_sentences = [t.encode('ascii', 'ignore').decode('ascii') for t in translated_sentences]
         
         return ". ".join(translated_sentences)
     except Exception as e:
@@ -81,11 +109,11 @@ def extract_audio(path):
 
 # Whisper: transcribe in same language
 def whisper_transcribe(path):
-    return model.transcribe(path, task="transcribe", fp16=USE_GPU)["text"]
+    return load_asr().transcribe(path, task="transcribe")["text"]
 
 # Whisper: translate to English
 def whisper_translate(path):
-    return model.transcribe(path, task="translate", fp16=USE_GPU)["text"]
+    return load_asr().transcribe(path, task="translate")["text"]
 
 # TTS
 def tts(text, lang="hi"):
@@ -158,33 +186,9 @@ def merge_audio_video(video_path, audio_path):
     )
     return output
 
-def translate_file(input_file, target_language="hi"):
-    """Main translation function"""
+# Steps 5-7 for one target language, from the shared English transcript
+def render_language(input_file, is_video, whisper_english, target_language, output_path=None):
     try:
-        print(f"Processing: {input_file}")
-        print(f"Target language: {target_language}")
-        
-        # Check if it's video or audio
-        is_video = input_file.lower().endswith((".mp4", ".mov", ".mkv"))
-        
-        # Step 1: Extract audio if video
-        raw_audio = extract_audio(input_file) if is_video else input_file
-        print("Audio extracted")
-
-        # Step 2: Clean audio
-        cleaned_audio = clean_audio(raw_audio)
-        print("Audio cleaned")
-
-        # Step 3: Whisper transcription (same language)
-        print("Transcribing original language...")
-        original_transcript = whisper_transcribe(cleaned_audio)
-        print(f"Original: {original_transcript[:100].encode('ascii', 'ignore').decode('ascii')}...")
-
-        # Step 4: Whisper English translation
-        print("Translating to English...")
-        whisper_english = whisper_translate(cleaned_audio)
-        print(f"English: {whisper_english[:100].encode('ascii', 'ignore').decode('ascii')}...")
-
         # Step 5: Google translation from English to target
         print(f"Translating to {target_language}...")
         final_translation = translate_google(whisper_english, lang=target_language)
@@ -195,6 +199,7 @@ def translate_file(input_file, target_language="hi"):
         tts_path = tts(final_translation, lang=target_language)
 
         # Step 7: Process result
+        synced_audio = None
         if is_video:
             print("Processing video...")
             duration = get_duration(input_file)
@@ -205,29 +210,81 @@ def translate_file(input_file, target_language="hi"):
             final_output = tts_path
             output_filename = f"translated_audio_{uuid.uuid4().hex[:8]}.mp3"
 
-        # Move to translated_files directory
-        os.makedirs("translated_files", exist_ok=True)
-        final_path = os.path.join("translated_files", output_filename)
-        os.rename(final_output, final_path)
-        print(f"Translation complete: {output_filename}")
+        # Move to translated_files directory (or the given output path)
+        if output_path is None:
+            output_path = os.path.join("translated_files", output_filename)
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        shutil.move(final_output, output_path)
+        print(f"Translation complete: {output_path}")
 
         # Cleanup temp files
-        if os.path.exists(input_file):
-            os.remove(input_file)
-        if raw_audio != input_file:
-            os.remove(raw_audio)
-        os.remove(cleaned_audio)
-        if is_video:
-            os.remove(synced_audio)
+        for path in {tts_path, synced_audio}:
+            if path and path != final_output and os.path.exists(path):
+                os.remove(path)
 
         return {
             'success': True,
-            'audio_file' if not is_video else 'video_file': output_filename,
+            'audio_file' if not is_video else 'video_file': os.path.basename(output_path),
+            'output_path': output_path,
+            'final_translation': final_translation,
+            'target_language': target_language,
+        }
+
+    except Exception as e:
+        tb = traceback.format_exc()
+        print(f"Error ({target_language}): {e}")
+        print(tb)
+        return {'success': False, 'target_language': target_language, 'error': str(e), 'traceback': tb}
+
+def translate_file(input_file, target_language="hi", delete_input=True, output_paths=None):
+    """Main translation function. `target_language` may be a list; the audio is transcribed once for all of them."""
+    languages = [target_language] if isinstance(target_language, str) else list(target_language)
+    output_paths = output_paths or {}
+    raw_audio = None
+    cleaned_audio = None
+    try:
+        print(f"Processing: {input_file}")
+        print(f"Target language: {', '.join(languages)}")
+        
+        # Check if it's video or audio
+        is_video = input_file.lower().endswith(VIDEO_EXTENSIONS)
+        
+        # Step 1: Extract audio if video
+        raw_audio = extract_audio(input_file) if is_video else input_file
+        print("Audio extracted")
+
+        # Step 2: Clean audio
+        cleaned_audio = clean_audio(raw_audio)
+        print("Audio cleaned")
+
+        # Step 3: Whisper transcription (same language)
+        print("Transcribing original language...")
+        original_transcript = whisper_transcribe(cleaned_audio)
+        print(f"Original: {original_transcript[:100].encode('ascii', 'ignore').decode('ascii')}...")
+
+        # Step 4: Whisper English translation
+        print("Translating to English...")
+        whisper_english = whisper_translate(cleaned_audio)
+        print(f"English: {whisper_english[:100].encode('ascii', 'ignore').decode('ascii')}...")
+
+        # Steps 5-7 per target language
+        results = {
+            lang: render_language(input_file, is_video, whisper_english, lang, output_paths.get(lang))
+            for lang in languages
+        }
+
+        # Cleanup temp files; batch runs keep their inputs
+        if delete_input and os.path.exists(input_file):
+            os.remove(input_file)
+
+        shared = {
             'original_transcript': original_transcript,
             'whisper_english': whisper_english,
-            'final_translation': final_translation,
-            'target_language': target_language
+            'asr': load_asr().stats()
         }
+        if isinstance(target_language, str):
+            return dict(results[target_language], **shared)
+        return dict(shared, success=all(r['success'] for r in results.values()), results=results)
 
     except Exception as e:
         tb = traceback.format_exc()
@@ -235,20 +292,192 @@ def translate_file(input_file, target_language="hi"):
         print(tb)
         return {'success': False, 'error': str(e), 'traceback': tb}
 
+    finally:
+        for path in (raw_audio, cleaned_audio):
+            if path and path != input_file and os.path.exists(path):
+                os.remove(path)
+
+
+# Batch mode
+
+def find_inputs(pattern):
+    """Media files under a directory (recursively) or matching a glob, sorted."""
+    if os.path.isdir(pattern):
+        paths = [os.path.join(root, name) for root, _, names in os.walk(pattern) for name in names]
+    else:
+        paths = glob.glob(pattern, recursive=True)
+    return sorted(os.path.abspath(p) for p in paths
+                  if os.path.isfile(p) and p.lower().endswith(MEDIA_EXTENSIONS))
+
+# Outputs are named <input stem>_<lang>.<ext>; inputs sharing a stem get a
+# hash of their path added so they do not overwrite each other
+def output_paths_for(inputs, languages, output_dir):
+    names = {}
+    for path in inputs:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        extension = "mp4" if path.lower().endswith(VIDEO_EXTENSIONS) else "mp3"
+        names.setdefault((stem, extension), []).append(path)
+    paths = {}
+    for (stem, extension), group in names.items():
+        for path in group:
+            name = stem if len(group) == 1 else f"{stem}_{hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]}"
+            paths[path] = {lang: os.path.join(output_dir, f"{name}_{lang}.{extension}") for lang in languages}
+    return paths
+
+def load_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'files': {}}
+
+# Written after every finished file; atomic, so an interrupted run never
+# leaves a half-written manifest behind
+def save_manifest(path, manifest):
+    manifest['updated_at'] = datetime.now().isoformat()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+# Languages of a manifest entry that still need work: not done yet or
+# whose output has gone missing
+def pending_languages(entry, languages):
+    done = entry['languages']
+    return [lang for lang in languages
+            if done.get(lang, {}).get('status') != 'done' or not os.path.exists(done[lang].get('output', ''))]
+
+# Runs once in every worker process: one speech model per worker, with
+# the CPU cores split between the workers
+def _init_worker(threads):
+    if not USE_GPU:
+        torch.set_num_threads(threads)
+    load_asr(threads=threads)
+
+def _translate_batch_item(input_file, languages, output_paths):
+    start = time.time()
+    result = translate_file(input_file, languages, delete_input=False, output_paths=output_paths)
+    result['seconds'] = round(time.time() - start, 2)
+    return result
+
+def run_batch(pattern, languages, workers=None, manifest_path=None, output_dir="translated_files"):
+    inputs = find_inputs(pattern)
+    if not inputs:
+        print(f"No media files match {pattern}")
+        return 1
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = manifest_path or os.path.join(output_dir, "manifest.json")
+    manifest = load_manifest(manifest_path)
+    outputs = output_paths_for(inputs, languages, output_dir)
+
+    todo = {}
+    for path in inputs:
+        stat = os.stat(path)
+        entry = manifest['files'].get(path)
+        # A new or changed input starts over
+        if entry is None or entry.get('size') != stat.st_size or entry.get('mtime') != stat.st_mtime:
+            entry = manifest['files'][path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'languages': {}}
+        pending = pending_languages(entry, languages)
+        for lang in pending:
+            entry['languages'][lang] = {'status': 'pending', 'output': outputs[path][lang]}
+        if pending:
+            todo[path] = pending
+    manifest['languages'] = sorted(set(manifest.get('languages', [])) | set(languages))
+    save_manifest(manifest_path, manifest)
+
+    print(f"{len(inputs)} files, {len(inputs) - len(todo)} already done, {len(todo)} to translate "
+          f"into {', '.join(languages)}")
+    if not todo:
+        return 0
+
+    # One process per GPU is enough; on CPU every worker gets its share of the cores
+    cpus = os.cpu_count() or 1
+    workers = workers or (1 if USE_GPU else max(1, cpus // 2))
+    workers = min(workers, len(todo))
+    threads = max(1, cpus // workers)
+    print(f"Starting {workers} workers with {threads} threads each")
+
+    failed = 0
+    start = time.time()
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(threads,)
+    )
+    try:
+        # Largest files first, so a long file does not start last and leave
+        # the other workers idle at the end
+        order = sorted(todo, key=lambda p: manifest['files'][p]['size'], reverse=True)
+        futures = {
+            pool.submit(_translate_batch_item, path, todo[path], {lang: outputs[path][lang] for lang in todo[path]}): path
+            for path in order
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            path = futures[future]
+            entry = manifest['files'][path]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'success': False, 'error': f"Worker failed: {e}"}
+            results = result.get('results', {})
+            for lang in todo[path]:
+                lang_result = results.get(lang) or {'success': False, 'error': result.get('error')}
+                entry['languages'][lang] = {
+                    'status': 'done' if lang_result['success'] else 'failed',
+                    'output': outputs[path][lang],
+                    'error': None if lang_result['success'] else lang_result.get('error'),
+                    'finished_at': datetime.now().isoformat(),
+                }
+            entry['seconds'] = result.get('seconds')
+            if result.get('success'):
+                entry.pop('error', None)
+            else:
+                entry['error'] = result.get('error') or "Some languages failed"
+                failed += 1
+            save_manifest(manifest_path, manifest)
+            status = "ok" if result.get('success') else f"FAILED ({entry['error']})"
+            print(f"[{done}/{len(futures)}] {path}: {status} in {result.get('seconds')}s")
+    except KeyboardInterrupt:
+        print(f"Interrupted; finished files are recorded in {manifest_path}, rerun to resume")
+        pool.shutdown(wait=False, cancel_futures=True)
+        return 130
+    pool.shutdown()
+
+    elapsed = time.time() - start
+    print(f"Translated {len(todo) - failed} files in {elapsed:.1f}s "
+          f"({len(todo) / elapsed * 3600:.0f} files/hour), {failed} failed. Manifest: {manifest_path}")
+    return 1 if failed else 0
+
+def is_batch_input(path):
+    return os.path.isdir(path) or any(c in path for c in "*?[")
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python translate_file.py <input_file> [target_language]")
-        print("Example: python translate_file.py audio.mp3 hi")
-        sys.exit(1)
-    
-    input_file = sys.argv[1]
-    target_language = sys.argv[2] if len(sys.argv) > 2 else "hi"
-    
+    parser = argparse.ArgumentParser(
+        description="Translate one media file, or a directory or glob of them in batch mode.",
+        epilog="Examples: python translate_file.py audio.mp3 hi | "
+               "python translate_file.py media/ --langs hi,es --workers 4"
+    )
+    parser.add_argument("input", help="media file, directory or glob pattern (quote it)")
+    parser.add_argument("target_language", nargs="?", default="hi", help="target language (default hi)")
+    parser.add_argument("--langs", help="comma-separated target languages; overrides target_language")
+    parser.add_argument("--workers", type=int, help="batch worker processes, each loads the model once "
+                                                    "(default CPU cores / 2, 1 with a GPU)")
+    parser.add_argument("--manifest", help="batch manifest path (default <output-dir>/manifest.json)")
+    parser.add_argument("--output-dir", default="translated_files", help="batch output directory")
+    args = parser.parse_args()
+
+    languages = [l.strip() for l in args.langs.split(",") if l.strip()] if args.langs else [args.target_language]
+
+    if is_batch_input(args.input) or args.langs:
+        sys.exit(run_batch(args.input, languages, args.workers, args.manifest, args.output_dir))
+
+    input_file = args.input
     if not os.path.exists(input_file):
         print(f"File not found: {input_file}")
         sys.exit(1)
     
-    result = translate_file(input_file, target_language)
+    result = translate_file(input_file, languages[0])
     print("\n" + "="*50)
     print("RESULT:")
     print(json.dumps(result, indent=2))
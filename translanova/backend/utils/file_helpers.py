@@ -0,0 +1,59 @@
+import hashlib
+
+CHUNK_SIZE = 1024 * 1024
+# Content hashes fold the data in blocks of this size
+HASH_BLOCK = 1024 * 1024
+
+
+# SHA-256 chained over fixed-size blocks: chain = sha256(chain + block).
+# Between blocks the whole state is the 32-byte chain and the offset, so a
+# partly hashed upload can be saved to disk and resumed in another process
+# after re-reading at most one block. The digest does not depend on how the
+# data was split into update() calls.
+class ContentHasher:
+    def __init__(self, chain=None, offset=0):
+        self.chain = bytes.fromhex(chain) if chain else bytes(32)
+        # Bytes folded into the chain; always a multiple of HASH_BLOCK
+        self.offset = offset
+        self._pending = bytearray()
+
+    def update(self, data):
+        self._pending += data
+        if len(self._pending) < HASH_BLOCK:
+            return
+        view = memoryview(self._pending)
+        folded = 0
+        while len(view) - folded >= HASH_BLOCK:
+            self.chain = hashlib.sha256(self.chain + view[folded:folded + HASH_BLOCK]).digest()
+            folded += HASH_BLOCK
+        view.release()
+        del self._pending[:folded]
+        self.offset += folded
+
+    def state(self):
+        """(chain hex, offset) of the complete blocks; the caller keeps the bytes after `offset`."""
+        return self.chain.hex(), self.offset
+
+    @property
+    def size(self):
+        return self.offset + len(self._pending)
+
+    def hexdigest(self):
+        tail = hashlib.sha256(self.chain + bytes(self._pending)).digest()
+        return hashlib.sha256(tail + self.size.to_bytes(8, 'big')).hexdigest()
+
+
+# Write an uploaded file stream to `path`, hashing it on the way so the
+# content never has to be read a second time. Returns (content hash, size).
+def save_stream_with_hash(stream, path, chunk_size=CHUNK_SIZE):
+    digest = ContentHasher()
+    size = 0
+    with open(path, 'wb') as out:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
@@ -1,14 +1,44 @@
 import React from 'react';
 import './ProgressBar.css';
 
-const ProgressBar = ({ step }) => {
+// Readable names for the backend pipeline stages
+const STAGE_LABELS = {
+  audio_preprocessing: 'Preparing audio',
+  transcription: 'Transcribing',
+  google_translation: 'Translating',
+  dubbing: 'Dubbing segments',
+  tts_generation: 'Generating speech',
+  video_processing: 'Processing video',
+  rendering: 'Rendering languages',
+  saving: 'Saving',
+};
+
+const ProgressBar = ({ step, jobProgress }) => {
+  const percent = jobProgress && jobProgress.total
+    ? Math.round((jobProgress.done / jobProgress.total) * 100)
+    : null;
   return (
-    <div className="progress-container">
-      <div className={`progress-dot ${step >= 1 ? 'active' : ''}`} />
-      <div className="progress-line" />
-      <div className={`progress-dot ${step >= 2 ? 'active' : ''}`} />
-      <div className="progress-line" />
-      <div className={`progress-dot ${step >= 3 ? 'active' : ''}`} />
+    <div>
+      <div className="progress-container">
+        <div className={`progress-dot ${step >= 1 ? 'active' : ''}`} />
+        <div className="progress-line" />
+        <div className={`progress-dot ${step >= 2 ? 'active' : ''}`} />
+        <div className="progress-line" />
+        <div className={`progress-dot ${step >= 3 ? 'active' : ''}`} />
+      </div>
+      {jobProgress && jobProgress.stage && (
+        <div className="progress-stage">
+          <span>
+            {STAGE_LABELS[jobProgress.stage] || jobProgress.stage}
+            {jobProgress.total ? ` (${jobProgress.done}/${jobProgress.total})` : '...'}
+          </span>
+          {percent !== null && (
+            <div className="progress-stage-track">
+              <div className="progress-stage-fill" style={{ width: `${percent}%` }} />
+            </div>
+          )}
+        </div>
+      )}
     </div>
   );
 };
@@ -28,6 +28,7 @@ function Audio() {
   const [selectedLanguage, setSelectedLanguage] = useState('hi');
   const [languages, setLanguages] = useState({});
   const [isLoading, setIsLoading] = useState(false);
+  const [jobProgress, setJobProgress] = useState(null);
   const [translationResult, setTranslationResult] = useState(null);
   const [error, setError] = useState(null);
   const [originalAudioUrl, setOriginalAudioUrl] = useState(null);
@@ -226,7 +227,7 @@ function Audio() {
     setError(null);
 
     try {
-      const result = await translationService.translateAudio(selectedFile, selectedLanguage);
+      const result = await translationService.translateAudio(selectedFile, selectedLanguage, setJobProgress);
       setTranslationResult(result);
       
       // Extract and display timing and accuracy information
@@ -251,6 +252,7 @@ function Audio() {
       setError(error.response?.data?.error || 'Translation failed. Please try again.');
     } finally {
       setIsLoading(false);
+      setJobProgress(null);
     }
   };
 
@@ -291,7 +293,7 @@ function Audio() {
               <div className="audio_sect2_div1">
                 <Card>
                   <h2>How to translate audio</h2>
-                  <ProgressBar step={currentStep} />
+                  <ProgressBar step={currentStep} jobProgress={jobProgress} />
                   <div className="content-wrapper">
                     <NavButtons onPrev={handlePrev} onNext={handleNext} />
                     <div className="step-content">
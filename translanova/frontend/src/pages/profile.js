@@ -8,6 +8,9 @@ function Profile() {
     const navigate = useNavigate();
     const [user, setUser] = useState(null);
     const [translations, setTranslations] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [stats, setStats] = useState(null);
+    const [isLoadingMore, setIsLoadingMore] = useState(false);
     const [isEditing, setIsEditing] = useState(false);
     const [isLoading, setIsLoading] = useState(true);
     const [error, setError] = useState(null);
@@ -55,21 +58,18 @@ function Profile() {
 
             try {
                 // Load user profile and translations in parallel using authApi
-                const [profileRes, translationsRes] = await Promise.all([
+                const [profileRes, translationsRes, statsRes] = await Promise.all([
                     authService.getUserProfile(),
-                    authService.getUserTranslations()
+                    authService.getUserTranslations(),
+                    // The dashboard still renders without totals
+                    authService.getUserStats().catch(() => null)
                 ]);
 
                 if (profileRes && typeof profileRes === 'object') {
                     setUser(profileRes);
-                    // Normalize translation entries for frontend compatibility
-                    const raw = Array.isArray(translationsRes) ? translationsRes : [];
-                    const normalized = raw.map(t => ({
-                        ...t,
-                        originalFile: t.originalFile || t.original_filename || t.filename || null,
-                        translatedFile: t.translatedFile || t.translated_filename || t.translated_filename || null,
-                    }));
-                    setTranslations(normalized);
+                    setTranslations(normalizeTranslations(translationsRes.translations));
+                    setNextCursor(translationsRes.nextCursor);
+                    setStats(statsRes);
                 } else {
                     throw new Error('Invalid profile data received');
                 }
@@ -93,6 +93,30 @@ function Profile() {
         }
     };
 
+    // Normalize translation entries for frontend compatibility
+    const normalizeTranslations = (raw) => (Array.isArray(raw) ? raw : []).map(t => ({
+        ...t,
+        originalFile: t.originalFile || t.original_filename || t.filename || null,
+        translatedFile: t.translatedFile || t.translated_filename || null,
+        targetLanguage: t.targetLanguage || t.target_language,
+        createdAt: t.createdAt || t.timestamp,
+    }));
+
+    const loadMoreTranslations = async () => {
+        if (!nextCursor) return;
+        try {
+            setIsLoadingMore(true);
+            const page = await authService.getUserTranslations({ after: nextCursor });
+            setTranslations(prev => [...prev, ...normalizeTranslations(page.translations)]);
+            setNextCursor(page.nextCursor);
+        } catch (err) {
+            console.error('Error loading more translations:', err);
+            setError(typeof err === 'string' ? err : 'Failed to load more translations');
+        } finally {
+            setIsLoadingMore(false);
+        }
+    };
+
     const handleEditSubmit = async (e) => {
         e.preventDefault();
         if (editForm.password !== editForm.confirmPassword) {
@@ -246,17 +270,29 @@ function Profile() {
                                     <div className="profile-card-right">
                                         <div className="profile-stats">
                                             <div className="stat">
-                                                <div className="stat-value">{translations.length}</div>
+                                                <div className="stat-value">{stats ? stats.translations : translations.length}</div>
                                                 <div className="stat-label">Translations</div>
                                             </div>
                                             <div className="stat">
-                                                <div className="stat-value">{translations.filter(t=>isAudioFile(t.originalFile)||isAudioFile(t.translatedFile)).length}</div>
+                                                <div className="stat-value">{stats ? stats.audio : translations.filter(t=>isAudioFile(t.originalFile)||isAudioFile(t.translatedFile)).length}</div>
                                                 <div className="stat-label">Audio</div>
                                             </div>
                                             <div className="stat">
-                                                <div className="stat-value">{translations.filter(t=>isVideoFile(t.originalFile)||isVideoFile(t.translatedFile)).length}</div>
+                                                <div className="stat-value">{stats ? stats.video : translations.filter(t=>isVideoFile(t.originalFile)||isVideoFile(t.translatedFile)).length}</div>
                                                 <div className="stat-label">Video</div>
                                             </div>
+                                            {stats && stats.avg_translation_time != null && (
+                                                <div className="stat">
+                                                    <div className="stat-value">{stats.avg_translation_time}s</div>
+                                                    <div className="stat-label">Avg. time</div>
+                                                </div>
+                                            )}
+                                            {stats && stats.avg_accuracy != null && (
+                                                <div className="stat">
+                                                    <div className="stat-value">{stats.avg_accuracy}%</div>
+                                                    <div className="stat-label">Avg. accuracy</div>
+                                                </div>
+                                            )}
                                         </div>
                                         <div className="profile-actions">
                                             <button className="btn btn-primary" onClick={() => setIsEditing(true)}>Edit Profile</button>
@@ -413,6 +449,14 @@ function Profile() {
                                         ))}
                                     </div>
                                 )}
+
+                                {nextCursor && (
+                                    <div className="load-more">
+                                        <button className="btn btn-secondary" onClick={loadMoreTranslations} disabled={isLoadingMore}>
+                                            {isLoadingMore ? 'Loading...' : 'Load more'}
+                                        </button>
+                                    </div>
+                                )}
                             </div>
                         )}
                     </main>
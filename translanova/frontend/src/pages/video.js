@@ -28,6 +28,7 @@ function Video() {
   const [selectedLanguage, setSelectedLanguage] = useState('hi');
   const [languages, setLanguages] = useState({});
   const [isLoading, setIsLoading] = useState(false);
+  const [jobProgress, setJobProgress] = useState(null);
   const [translationResult, setTranslationResult] = useState(null);
   const [error, setError] = useState(null);
   const [originalVideoUrl, setOriginalVideoUrl] = useState(null);
@@ -244,7 +245,7 @@ function Video() {
     setError(null);
 
     try {
-      const result = await translationService.translateVideo(selectedFile, selectedLanguage);
+      const result = await translationService.translateVideo(selectedFile, selectedLanguage, setJobProgress);
       setTranslationResult(result);
       
       // Extract and display timing and accuracy information
@@ -270,6 +271,7 @@ function Video() {
       setError(error.response?.data?.error || 'Translation failed. Please try again.');
     } finally {
       setIsLoading(false);
+      setJobProgress(null);
     }
   };
 
@@ -310,7 +312,7 @@ function Video() {
               <div className="vid_sect2_div1">
                 <Card>
                   <h2>How to translate video</h2>
-                  <ProgressBar step={currentStep} />
+                  <ProgressBar step={currentStep} jobProgress={jobProgress} />
                   <div className="content-wrapper">
                     <NavButtons onPrev={handlePrev} onNext={handleNext} />
                     <div className="step-content">
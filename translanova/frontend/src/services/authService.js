@@ -89,19 +89,39 @@ export const saveTranslation = async (translationData) => {
   }
 };
 
-export const getUserTranslations = async () => {
+// One page of history, newest first; pass the returned nextCursor as `after`
+// to load the next page
+export const getUserTranslations = async ({ after, limit } = {}) => {
   try {
     // Provide user_id via query param because backend no longer requires JWT
     const user = getCurrentUser();
     const params = {};
     if (user && user.id) params.user_id = user.id;
+    if (after) params.after = after;
+    if (limit) params.limit = limit;
     const response = await authApi.get('/user/translations', { params });
-    return response.data.translations || [];
+    return {
+      translations: response.data.translations || [],
+      nextCursor: response.data.next_cursor || null,
+    };
   } catch (error) {
     throw error.response?.data?.error || 'Failed to fetch translations';
   }
 };
 
+// Precomputed totals for the profile dashboard
+export const getUserStats = async () => {
+  try {
+    const user = getCurrentUser();
+    const params = {};
+    if (user && user.id) params.user_id = user.id;
+    const response = await authApi.get('/user/stats', { params });
+    return response.data;
+  } catch (error) {
+    throw error.response?.data?.error || 'Failed to fetch usage stats';
+  }
+};
+
 export const getUserProfile = async () => {
   try {
     console.log('Fetching user profile...');
@@ -158,6 +178,7 @@ export default {
   isAuthenticated,
   saveTranslation,
   getUserTranslations,
+  getUserStats,
   getUserProfile,
   updateProfile,
 };
\ No newline at end of file
@@ -51,8 +51,63 @@ export const getLanguages = async () => {
     return SUPPORTED_LANGUAGES;
   }
 };
+// Poll a queued translation job until it finishes
+const JOB_POLL_INTERVAL = 2000;
+
+export const waitForJob = async (jobId) => {
+  while (true) {
+    const response = await fetch(`${BACKEND_URL}/jobs/${jobId}`);
+    if (!response.ok) {
+      throw new Error(`Job status failed: ${response.status} ${response.statusText}`);
+    }
+    const job = await response.json();
+    if (job.status === 'completed') {
+      return job.result;
+    }
+    if (job.status === 'failed') {
+      throw new Error(`Translation failed: ${job.error}`);
+    }
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL));
+  }
+};
+
+// Follow a job over Server-Sent Events; falls back to polling when the
+// stream cannot be opened. `onProgress` receives {stage, done, total}.
+export const watchJob = (jobId, onProgress) => {
+  if (typeof EventSource === 'undefined') {
+    return waitForJob(jobId);
+  }
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(`${BACKEND_URL}/jobs/${jobId}/events`);
+    let received = false;
+    const report = (event) => {
+      received = true;
+      if (onProgress) {
+        onProgress(JSON.parse(event.data));
+      }
+    };
+    source.addEventListener('stage', report);
+    source.addEventListener('progress', report);
+    source.addEventListener('completed', (event) => {
+      source.close();
+      resolve(JSON.parse(event.data).result);
+    });
+    source.addEventListener('failed', (event) => {
+      source.close();
+      reject(new Error(`Translation failed: ${JSON.parse(event.data).error}`));
+    });
+    source.onerror = () => {
+      // EventSource reconnects by itself once it has been connected
+      if (!received) {
+        source.close();
+        waitForJob(jobId).then(resolve, reject);
+      }
+    };
+  });
+};
+
 // Real audio translation using Python backend
-export const translateAudio = async (file, targetLanguage) => {
+export const translateAudio = async (file, targetLanguage, onProgress) => {
   try {
     // Create FormData to send to Python backend
     const formData = new FormData();
@@ -80,7 +135,9 @@ export const translateAudio = async (file, targetLanguage) => {
       throw new Error(`Translation failed: ${response.status} ${response.statusText}`);
     }
     
-    const result = await response.json();
+    const job = await response.json();
+    // Cached results come back completed without a job to poll
+    const result = job.status === 'completed' ? job.result : await watchJob(job.job_id, onProgress);
 
     // Save translation to MongoDB if user is authenticated
     try {
@@ -113,7 +170,7 @@ export const translateAudio = async (file, targetLanguage) => {
 };
 
 // Real video translation using Python backend
-export const translateVideo = async (file, targetLanguage) => {
+export const translateVideo = async (file, targetLanguage, onProgress) => {
   try {
     // Create FormData to send to Python backend
     const formData = new FormData();
@@ -141,7 +198,9 @@ export const translateVideo = async (file, targetLanguage) => {
       throw new Error(`Translation failed: ${response.status} ${response.statusText}`);
     }
     
-    const result = await response.json();
+    const job = await response.json();
+    // Cached results come back completed without a job to poll
+    const result = job.status === 'completed' ? job.result : await watchJob(job.job_id, onProgress);
 
     // Save translation to MongoDB if user is authenticated
     try {
@@ -201,6 +260,8 @@ export default {
   getLanguages,
   translateAudio,
   translateVideo,
+  waitForJob,
+  watchJob,
   downloadFile,
   healthCheck,
 };